@@ -0,0 +1,187 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from transformation import filter_melt_date_columns
+
+# Periods of the rollup tables as pandas period frequencies. Each period is represented by its first day,
+# i.e. weeks by their Monday and months by their first day.
+ROLLUP_FREQUENCIES = {
+    'daily': 'D',
+    'weekly': 'W-SUN',
+    'monthly': 'M',
+}
+
+def _spread_over_days(starts, ends, deaths):
+    """
+    Helper function to spread the deaths of rows covering several days (e.g. a monthly total) evenly over their days.
+    The deaths are split into whole deaths, the days at the start of a period get the remainder of the division.
+
+    Parameters:
+    starts (pd.Series): The first day of every row.
+    ends (pd.Series): The last day of every row. Rows ending before they start cover their first day only.
+    deaths (pd.Series): The number of deaths of every row.
+
+    Returns:
+    tuple: The dates and the number of deaths per day, as pd.Series.
+    """
+    days = ((ends - starts).dt.days.clip(lower=0) + 1).to_numpy(dtype='int64')
+    rows = np.repeat(np.arange(len(days)), days)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(days) - days, days)
+    deaths = deaths.to_numpy(dtype='int64')[rows]
+    deaths = deaths // days[rows] + (offsets < deaths % days[rows])
+    dates = starts.to_numpy()[rows] + offsets.astype('timedelta64[D]')
+    return pd.Series(dates, name=starts.name), pd.Series(deaths, name='deaths')
+
+
+def daily_counts(df, date_column, deaths_column=None, row_filters=None, melt=False, end_column=None):
+    """
+    Count the deaths per day of a cleaned dataset.
+    Registries with one row per death are counted, datasets with a death count per date are summed up. The death
+    counts of datasets with one row per period (e.g. monthly totals) are spread evenly over the days of the period,
+    so that the daily and weekly rollups do not attribute the deaths of a whole period to its first day.
+
+    Parameters:
+    df (pd.DataFrame): The cleaned dataset, or a chunk of it.
+    date_column (str): The name of the datetime column, see transformation.filter_transform_to_datetime.
+    deaths_column (str): The name of the column holding the number of deaths per row. Default behaviour is to count the rows.
+    row_filters (dict): Maps a column name to the value or list of values of the rows to include, e.g. {'group': 'All'}.
+    melt (bool): Flag indicating that the dataset may have one column per date, which is melted into the date and deaths columns first.
+    end_column (str): The name of the datetime column holding the last day of the period of every row, with date_column
+                      holding its first day. Default behaviour is that every row covers a single day.
+
+    Returns:
+    pd.Series: The number of deaths, indexed by date.
+    """
+
+    if melt and date_column not in df.columns:
+        df = filter_melt_date_columns(df, date_name=date_column, value_name=deaths_column)
+
+    if row_filters:
+        mask = pd.Series(True, index=df.index)
+        for column, values in row_filters.items():
+            mask &= df[column].isin(values if isinstance(values, list) else [values])
+        df = df[mask]
+
+    dates = df[date_column]
+    if end_column is not None:
+        deaths = df[deaths_column] if deaths_column is not None else pd.Series(1, index=df.index)
+        dates, deaths = _spread_over_days(dates, df[end_column], deaths)
+        counts = deaths.groupby(dates).sum()
+    elif deaths_column is None:
+        counts = dates.groupby(dates).size()
+    else:
+        counts = df[deaths_column].groupby(dates).sum()
+    return counts.rename_axis('date').rename('deaths')
+
+
+def combine_counts(counts):
+    """
+    Sum up partial daily counts, e.g. of the chunks of a dataset.
+
+    Parameters:
+    counts (list): The partial counts as returned by daily_counts.
+
+    Returns:
+    pd.Series: The total number of deaths, indexed by date.
+    """
+    counts = [partial for partial in counts if len(partial) > 0]
+    if not counts:
+        return pd.Series([], index=pd.DatetimeIndex([], name='date'), name='deaths', dtype='int64')
+    return pd.concat(counts).groupby(level=0).sum().rename('deaths')
+
+
+def merge_daily_counts(daily, country, counts, append=False):
+    """
+    Merge the daily counts of a country into a table of daily counts for all countries.
+
+    Parameters:
+    daily (pd.DataFrame): The table with the columns 'country', 'date' and 'deaths', e.g. from a previous run, or None.
+    country (str): The country the counts belong to.
+    counts (pd.Series): The number of deaths, indexed by date.
+    append (bool): Flag indicating that the counts are added to the existing counts of the country (e.g. the new rows
+                   of an incremental run) instead of replacing them.
+
+    Returns:
+    pd.DataFrame: The merged table, sorted by country and date.
+    """
+    new = counts.rename_axis('date').rename('deaths').reset_index()
+    new.insert(0, 'country', country)
+    if daily is None:
+        return new
+
+    daily = daily[['country', 'date', 'deaths']]
+    others = daily[daily['country'] != country]
+    if append:
+        new = pd.concat([daily[daily['country'] == country], new]).groupby(['country', 'date'], as_index=False)['deaths'].sum()
+    return pd.concat([others, new], ignore_index=True).sort_values(['country', 'date'], ignore_index=True)
+
+
+def population_by_year(population_df, country_column='Country Name'):
+    """
+    Reshape the world population table with one column per year into one row per country and year.
+
+    Parameters:
+    population_df (pd.DataFrame): The population table, e.g. world_population_total.
+    country_column (str): The name of the country column.
+
+    Returns:
+    pd.DataFrame: DataFrame with the columns 'country', 'year' and 'population'.
+    """
+    year_columns = [col for col in population_df.columns if str(col).isdigit()]
+    population = population_df.melt(id_vars=[country_column], value_vars=year_columns, var_name='year',
+                                    value_name='population')
+    population = population.rename(columns={country_column: 'country'})
+    population['year'] = population['year'].astype(int)
+    return population
+
+
+def add_population_rates(rollup, population):
+    """
+    Join the population of each country and year to a rollup table and compute the deaths per 100k inhabitants.
+    Dates outside the years covered by the population table use the population of the nearest covered year.
+
+    Parameters:
+    rollup (pd.DataFrame): The rollup table with the columns 'country', 'date' and 'deaths'.
+    population (pd.DataFrame): The population per country and year, see population_by_year. None leaves the rates empty.
+
+    Returns:
+    pd.DataFrame: The rollup table with the additional columns 'population' and 'deaths_per_100k'.
+    """
+    if population is None:
+        return rollup.assign(population=float('nan'), deaths_per_100k=float('nan'))
+
+    years = rollup['date'].dt.year
+    bounds = population.groupby('country')['year'].agg(['min', 'max'])
+    lower = rollup['country'].map(bounds['min'])
+    upper = rollup['country'].map(bounds['max'])
+    years = years.clip(lower=lower.fillna(years), upper=upper.fillna(years)).astype(int)
+
+    rates = rollup.assign(year=years).merge(population, on=['country', 'year'], how='left').drop(columns='year')
+    rates['deaths_per_100k'] = rates['deaths'] * 100_000 / rates['population']
+    missing = rates.loc[rates['population'].isna(), 'country'].unique().tolist()
+    if missing:
+        logging.warning(f"No population available for {missing}, their rates per 100k are left empty")
+    return rates
+
+
+def build_rollups(daily, population=None, frequencies=None):
+    """
+    Aggregate the daily death counts of all countries into one compact table per period length.
+
+    Parameters:
+    daily (pd.DataFrame): The daily counts with the columns 'country', 'date' and 'deaths'.
+    population (pd.DataFrame): The population per country and year, see population_by_year. None leaves the rates empty.
+    frequencies (dict): Maps the name of each rollup to its pandas period frequency. Default behaviour is ROLLUP_FREQUENCIES.
+
+    Returns:
+    dict: Maps the name of each rollup to a DataFrame with the columns 'country', 'date', 'deaths', 'population'
+          and 'deaths_per_100k', with one row per country and period.
+    """
+    rollups = {}
+    for name, frequency in (frequencies or ROLLUP_FREQUENCIES).items():
+        periods = daily['date'].dt.to_period(frequency).dt.start_time.rename('date')
+        rollup = daily.groupby([daily['country'], periods])['deaths'].sum().reset_index()
+        rollups[name] = add_population_rates(rollup, population)
+        logging.info(f"Rolled up {len(daily)} daily counts into {len(rollup)} {name} counts")
+    return rollups
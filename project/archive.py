@@ -0,0 +1,318 @@
+import collections
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Codecs of the raw archive with their file endings. Zstandard requires the pyarrow package, gzip the standard library only.
+ARCHIVE_CODECS = {'zstd': '.zst', 'gzip': '.gz'}
+# Size of the blocks of a payload that are compressed concurrently, each into an independent zstd frame or gzip member.
+# Both formats allow concatenated frames, so the archived file is decompressed as one stream.
+ARCHIVE_BLOCK_SIZE = 4 * 1024 * 1024
+# Compression level of the gzip members, trading a little compression ratio for speed.
+GZIP_LEVEL = 6
+# Number of versions kept per dataset by default.
+ARCHIVE_KEEP_VERSIONS = 5
+
+
+class ArchiveMissError(LookupError):
+    """
+    Raised when a dataset is to be re-transformed, but no archived payload is available for it.
+    """
+
+
+def _compressor(codec):
+    """
+    Helper function to get the function compressing one block of a payload with the given codec.
+
+    Parameters:
+    codec (str): The codec, see ARCHIVE_CODECS.
+
+    Returns:
+    function: Maps a bytes-like block to its compressed frame.
+    """
+    if codec == 'gzip':
+        return lambda block: gzip.compress(block, compresslevel=GZIP_LEVEL, mtime=0)
+    import pyarrow as pa
+
+    return lambda block: pa.compress(block, codec='zstd', asbytes=True)
+
+
+def _payload_blocks(payload):
+    """
+    Helper function to split a payload, as returned by extraction.extract_dataset, into blocks.
+
+    Parameters:
+    payload (str/file): The decoded payload or a binary file object positioned at the start.
+
+    Returns:
+    iterator: The blocks as bytes-like objects.
+    """
+    if isinstance(payload, str):
+        data = memoryview(payload.encode('utf-8'))
+        return (data[start:start + ARCHIVE_BLOCK_SIZE] for start in range(0, len(data), ARCHIVE_BLOCK_SIZE))
+    return iter(lambda: payload.read(ARCHIVE_BLOCK_SIZE), b'')
+
+
+def compress_blocks(blocks, codec='zstd', threads=None):
+    """
+    Compress a stream of blocks on a thread pool, yielding the compressed frames in the order of the blocks.
+    At most two blocks per thread are in flight, so that memory usage does not depend on the size of the payload.
+
+    Parameters:
+    blocks (iterable): The bytes-like blocks to compress.
+    codec (str): The codec, see ARCHIVE_CODECS.
+    threads (int): Number of compression threads. Default behaviour is one per CPU.
+
+    Returns:
+    iterator: The compressed frames.
+    """
+    compress = _compressor(codec)
+    threads = threads or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = collections.deque()
+        for block in blocks:
+            pending.append(executor.submit(compress, block))
+            if len(pending) >= 2 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class RawArchive:
+    """
+    Compressed, versioned store of the raw payloads of every dataset, from which the outputs can be rebuilt without
+    network access, e.g. after a change to the transformation chain.
+
+    Every distinct payload of a dataset is stored as a new version, compressed block by block on several threads.
+    A payload identical to the latest version of its dataset is not stored again. The retention limits keep at most
+    keep_versions versions per dataset and remove the oldest versions once all versions exceed max_size bytes, but
+    the latest version of a dataset is always kept. In re-transform mode the datasets are read from the archive
+    instead of being downloaded, see etl_pipeline.extract_step.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, archive_dir='../archive/', codec='zstd', keep_versions=ARCHIVE_KEEP_VERSIONS, max_size=None,
+                 threads=None, retransform=False, as_of=None):
+        """
+        Parameters:
+        archive_dir (str): Directory in which the payloads and the archive index are stored.
+        codec (str): The codec new versions are compressed with, see ARCHIVE_CODECS.
+        keep_versions (int): Maximum number of versions per dataset. Default behaviour is ARCHIVE_KEEP_VERSIONS.
+        max_size (int): Maximum total size of all compressed versions in bytes. Default behaviour is no size limit.
+        threads (int): Number of compression threads. Default behaviour is one per CPU.
+        retransform (bool): Flag indicating that the datasets are read from the archive instead of being downloaded.
+        as_of (str): Date (YYYY-MM-DD) of the versions to re-transform, i.e. the latest version archived on or
+                     before that day. Default behaviour is the latest version.
+        """
+        if codec not in ARCHIVE_CODECS:
+            raise ValueError(f"Unknown archive codec '{codec}', expected one of {list(ARCHIVE_CODECS)}")
+        self.archive_dir = archive_dir
+        self.codec = codec
+        self.keep_versions = keep_versions
+        self.max_size = max_size
+        self.threads = threads
+        self.retransform = retransform
+        self.as_of = datetime.date.fromisoformat(as_of) if isinstance(as_of, str) else as_of
+        self._lock = threading.Lock()  # The archive is shared by the concurrent extraction threads
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._index = self._read_index()
+
+    def _read_index(self):
+        index_path = os.path.join(self.archive_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {}
+        try:
+            with open(index_path, 'r') as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Archive index '{index_path}' could not be read, starting with an empty archive: {e}")
+            return {}
+
+    def _write_index(self):
+        # Must hold the lock. Written to a temporary file first, so that an interrupted run never corrupts the index.
+        index_path = os.path.join(self.archive_dir, self.INDEX_FILE)
+        fd, temp_path = tempfile.mkstemp(dir=self.archive_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as index_file:
+            json.dump(self._index, index_file, indent=2)
+        os.replace(temp_path, index_path)
+
+    def _path(self, entry):
+        return os.path.join(self.archive_dir, entry['file'])
+
+    def versions(self, dataset):
+        """
+        List the archived versions of a dataset.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+
+        Returns:
+        list: The entries with the keys 'version', 'file', 'codec', 'sha256', 'size', 'compressed_size', 'archived'
+              and 'url', the oldest version first.
+        """
+        with self._lock:
+            return [dict(entry) for entry in self._index.get(dataset, [])]
+
+    def entry(self, dataset, version=None):
+        """
+        Look up an archived version of a dataset.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        version (int): The version number. Default behaviour is the latest version, or the latest version archived
+                       on or before the as_of date of the archive.
+
+        Returns:
+        dict: The entry of the version (see versions), or None if there is no such version.
+        """
+        with self._lock:
+            entries = self._index.get(dataset, [])
+            if version is not None:
+                entries = [entry for entry in entries if entry['version'] == version]
+            elif self.as_of is not None:
+                entries = [entry for entry in entries
+                           if datetime.datetime.fromisoformat(entry['archived']).date() <= self.as_of]
+            entries = [entry for entry in entries if os.path.exists(self._path(entry))]
+            return dict(entries[-1]) if entries else None
+
+    def open(self, dataset, version=None, stream=False):
+        """
+        Open an archived payload, decompressing it while it is being read.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        version (int): The version number, see entry.
+        stream (bool): Flag indicating that the payload is returned as a binary file object instead of being decoded
+                       into a string as a whole, as for extraction.extract_dataset.
+
+        Returns:
+        str/file: The payload.
+        """
+        entry = self.entry(dataset, version)
+        if entry is None:
+            raise ArchiveMissError(f"No archived payload available for dataset '{dataset}'"
+                                   + (f" in version {version}" if version is not None else ""))
+        path = self._path(entry)
+        if entry['codec'] == 'gzip':
+            payload = gzip.open(path, 'rb')
+        else:
+            import pyarrow as pa
+
+            payload = pa.input_stream(path, compression='zstd')
+        if stream:
+            return payload
+        with payload:
+            return payload.read().decode('utf-8')
+
+    def store(self, dataset, payload, sha256=None, url=None):
+        """
+        Archive the payload of a dataset as a new version, unless it is identical to the latest version.
+        File objects are rewound to the start afterwards, so that they can still be parsed. Failing to archive a
+        payload does not fail the dataset, the error is logged instead.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        payload (str/file): The decoded payload or a binary file object positioned at the start, as returned by
+                            extraction.extract_dataset.
+        sha256 (str): The SHA-256 hash of the payload, if already known (see manifest.hash_payload). An unchanged
+                      payload is then not read at all.
+        url (str): The URL the payload was downloaded from.
+
+        Returns:
+        dict: The entry of the archived (or unchanged latest) version, or None if the payload could not be archived.
+        """
+        latest = self.entry(dataset)
+        if sha256 is not None and latest is not None and latest['sha256'] == sha256:
+            logging.info(f"Payload of dataset '{dataset}' is unchanged since version {latest['version']}, not archived again")
+            return latest
+
+        directory = os.path.join(self.archive_dir, dataset)
+        temp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            digest = hashlib.sha256()
+            size = compressed_size = 0
+
+            def hashed(blocks):
+                nonlocal size
+                for block in blocks:
+                    digest.update(block)
+                    size += len(block)
+                    yield block
+
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as archive_file:
+                for frame in compress_blocks(hashed(_payload_blocks(payload)), self.codec, self.threads):
+                    archive_file.write(frame)
+                    compressed_size += len(frame)
+            if not isinstance(payload, str):
+                payload.seek(0)
+
+            if latest is not None and latest['sha256'] == digest.hexdigest():
+                logging.info(f"Payload of dataset '{dataset}' is unchanged since version {latest['version']}, not archived again")
+                return latest
+
+            with self._lock:
+                entries = self._index.setdefault(dataset, [])
+                version = entries[-1]['version'] + 1 if entries else 1
+                entry = {
+                    'version': version,
+                    'file': f"{dataset}/v{version}.csv{ARCHIVE_CODECS[self.codec]}",
+                    'codec': self.codec,
+                    'sha256': digest.hexdigest(),
+                    'size': size,
+                    'compressed_size': compressed_size,
+                    'archived': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    'url': url,
+                }
+                os.replace(temp_path, self._path(entry))
+                temp_path = None
+                entries.append(entry)
+                self._apply_retention()
+                self._write_index()
+            logging.info(f"Archived version {version} of dataset '{dataset}': {size} bytes compressed to {compressed_size} bytes")
+            return dict(entry)
+        except ImportError as e:
+            logging.error(f"The '{self.codec}' codec requires the pyarrow package, payload of '{dataset}' not archived: {e}")
+        except Exception as e:
+            logging.error(f"Unexpected error while archiving the payload of '{dataset}': {e}")
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+        if not isinstance(payload, str):
+            payload.seek(0)
+        return None
+
+    def _remove(self, dataset, entry):
+        # Must hold the lock
+        try:
+            os.remove(self._path(entry))
+        except FileNotFoundError:
+            pass
+        self._index[dataset].remove(entry)
+        logging.info(f"Removed version {entry['version']} of dataset '{dataset}' from the archive "
+                     f"({entry['compressed_size']} bytes)")
+
+    def _apply_retention(self):
+        # Remove the versions beyond the retention limits, but never the latest version of a dataset. Must hold the lock.
+        for dataset, entries in self._index.items():
+            for entry in entries[:max(len(entries) - max(self.keep_versions or 1, 1), 0)]:
+                self._remove(dataset, entry)
+
+        if self.max_size is None:
+            return
+        total_size = sum(entry['compressed_size'] for entries in self._index.values() for entry in entries)
+        removable = [(entry['archived'], dataset, entry) for dataset, entries in self._index.items() for entry in entries[:-1]]
+        for _, dataset, entry in sorted(removable, key=lambda item: item[0]):
+            if total_size <= self.max_size:
+                break
+            self._remove(dataset, entry)
+            total_size -= entry['compressed_size']
@@ -0,0 +1,211 @@
+########################################################################################################################
+# Benchmark suite for the parsing engines, the raw archive, the transformation filters and the loaders
+#
+# Every benchmark is run on mock datasets (see test_helper.create_mock_dataframe) of several sizes and missing-value
+# ratios. The parsing engines are run on mock CSV payloads in the layouts of the per-row datasets (see
+# test_helper.create_mock_csv_payload), with the parse arguments of the pipeline, and the payloads are archived with
+# every codec of the raw archive. The throughput (rows per second, best of several repeats) is compared against the stored baselines in
+# benchmark_baseline.json, and the run fails if a benchmark falls more than the tolerance below its baseline.
+#
+# Usage:
+#   python3 benchmarks.py                               Compare against the stored baselines
+#   python3 benchmarks.py --sizes 10000000              Benchmark 10M-row frames
+#   python3 benchmarks.py --only missing_values         Run only the benchmarks whose name contains the given text
+#   python3 benchmarks.py --only extract_into_df        Compare the parsing engines on the layouts of the datasets
+#   python3 benchmarks.py --only archive                Compare the codecs of the raw archive
+#   python3 benchmarks.py --update-baseline             Store the measured throughput as the new baselines
+#
+# Baselines are machine dependent, so update them when benchmarking on a different machine.
+########################################################################################################################
+
+import argparse
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from archive import ARCHIVE_CODECS, RawArchive
+from etl_pipeline import DATASETS
+from extraction import ENGINES, extract_into_df
+from loading import load_df, load_df_to_csv
+from test_helper import create_mock_csv_payload, create_mock_dataframe
+from transformation import *
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_MISSING_RATIOS = [0.0, 0.1, 0.5]
+# Datasets whose layout the parsing engines are benchmarked on
+PARSE_DATASETS = ['chile', 'colombia', 'usa']
+
+
+def _benchmarks(output_dir):
+    """
+    Helper function to define the benchmarks. Each benchmark is a function of the mock DataFrame.
+
+    Parameters:
+    output_dir (str): Directory the loader benchmarks write to.
+
+    Returns:
+    dict: Maps the benchmark name to its function.
+    """
+    benchmarks = {
+        'filter_drop_columns': lambda df: filter_drop_columns(df, ['date_of_death', 'diag']),
+        'filter_rows_by_values': lambda df: filter_rows_by_values(df, 'diag', 'U071'),
+        'filter_rows_by_predicates': lambda df: filter_rows_by_predicates(
+            df, {'diag': {'values': 'U071'}, 'gender': {'values': ['f']}, 'id': {'min': 100, 'notna': True}}),
+        'filter_transform_to_datetime': lambda df: filter_transform_to_datetime(df, column='date_of_death'),
+        'filter_transform_to_datetime_format': lambda df: filter_transform_to_datetime(df, column='date_of_death',
+                                                                                       date_format='%d:%m:%Y'),
+        'filter_optimize_dtypes': lambda df: filter_optimize_dtypes(df),
+        'filter_handle_missing_values_multi_column': lambda df: filter_handle_missing_values(
+            df, ['id', 'region'], strategy=Strategy.DROP_ROW),
+        'load_df_to_csv': lambda df: load_df_to_csv(df, 'benchmark', file_path=output_dir, overwrite=True),
+        'load_df_parquet': lambda df: load_df(df, 'benchmark', file_path=output_dir, overwrite=True,
+                                              file_format='parquet'),
+        'load_df_csv_gzip': lambda df: load_df(df, 'benchmark', file_path=output_dir, overwrite=True,
+                                               file_format='csv.gz'),
+    }
+    for strategy in Strategy:
+        benchmarks[f'filter_handle_missing_values_{strategy.name.lower()}'] = \
+            lambda df, strategy=strategy: filter_handle_missing_values(df, 'id', strategy=strategy)
+    return benchmarks
+
+
+def _parse_benchmarks(output_dir):
+    """
+    Helper function to define the parsing and archiving benchmarks. Each benchmark is a function of the raw payload of
+    its dataset.
+
+    Parameters:
+    output_dir (str): Directory the archive benchmarks write to.
+
+    Returns:
+    dict: Maps the benchmark name to the dataset and the function.
+    """
+    benchmarks = {}
+    for codec in ARCHIVE_CODECS:
+        # Every repeat archives the payload under a new name, as unchanged payloads are not compressed again
+        archive = RawArchive(os.path.join(output_dir, f'archive_{codec}'), codec=codec)
+        benchmarks[f'archive_store_{codec}'] = ('chile', lambda payload, archive=archive, runs=itertools.count():
+                                                archive.store(f'benchmark_{next(runs)}', io.BytesIO(payload)))
+    for dataset in PARSE_DATASETS:
+        parse_args = {key: value for key, value in DATASETS[dataset]['parse'].items() if key != 'engine'}
+        for engine in ENGINES:
+            benchmarks[f'extract_into_df_{engine}_{dataset}'] = (dataset, lambda payload, engine=engine, parse_args=parse_args:
+                                                                 extract_into_df(io.BytesIO(payload), engine=engine, **parse_args))
+    return benchmarks
+
+
+def _best_time(func, arg, repeats):
+    """
+    Helper function to time a benchmark.
+
+    Parameters:
+    func (callable): The benchmark.
+    arg: The argument of the benchmark, e.g. the mock DataFrame.
+    repeats (int): Number of repetitions.
+
+    Returns:
+    float: The fastest time in seconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmarks(sizes, missing_ratios, only=None, repeats=3):
+    """
+    Run all benchmarks on mock datasets of the given sizes and missing-value ratios.
+
+    Parameters:
+    sizes (list): Numbers of rows of the mock datasets.
+    missing_ratios (list): Ratios (0-1) of missing values in the 'id' and 'region' columns.
+    only (str): If given, only benchmarks whose name contains this text are run.
+    repeats (int): Number of repetitions per benchmark, of which the fastest one is reported.
+
+    Returns:
+    dict: Maps the result key 'benchmark|rows|missing_ratio' to the throughput in rows per second.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        benchmarks = {name: func for name, func in _benchmarks(output_dir).items() if only is None or only in name}
+        parse_benchmarks = {name: benchmark for name, benchmark in _parse_benchmarks(output_dir).items()
+                            if only is None or only in name}
+        for size in sizes:
+            for missing_ratio in missing_ratios:
+                runs = []
+                if benchmarks:
+                    df = create_mock_dataframe(size, missing_ratio=missing_ratio, seed=0)
+                    runs += [(name, func, df) for name, func in benchmarks.items()]
+                payloads = {dataset: create_mock_csv_payload(dataset, size, missing_ratio=missing_ratio, seed=0)
+                            for dataset in {dataset for dataset, _ in parse_benchmarks.values()}}
+                runs += [(name, func, payloads[dataset]) for name, (dataset, func) in parse_benchmarks.items()]
+                for name, func, arg in runs:
+                    key = f"{name}|{size}|{missing_ratio}"
+                    results[key] = size / _best_time(func, arg, repeats)
+                    print(f"{key:<70} {results[key]:>16,.0f} rows/s")
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Compare the measured throughput to the baselines.
+
+    Parameters:
+    results (dict): The measured throughput per result key.
+    baseline (dict): The baseline throughput per result key.
+    tolerance (float): Allowed relative slowdown (0-1) before a benchmark counts as a regression.
+
+    Returns:
+    list: The keys of all benchmarks that regressed.
+    """
+    regressions = []
+    for key, throughput in results.items():
+        if key not in baseline:
+            print(f"No baseline for {key}")
+            continue
+        change = throughput / baseline[key] - 1
+        if change < -tolerance:
+            regressions.append(key)
+            print(f"REGRESSION {key}: {throughput:,.0f} rows/s is {-change:.0%} below the baseline of {baseline[key]:,.0f} rows/s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the parsing engines, transformation filters and loaders.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of rows of the mock datasets.")
+    parser.add_argument("--missing-ratios", type=float, nargs="+", default=DEFAULT_MISSING_RATIOS,
+                        help="Ratios of missing values in the mock datasets.")
+    parser.add_argument("--only", default=None, help="Run only the benchmarks whose name contains this text.")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetitions per benchmark, the fastest one counts.")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Allowed slowdown relative to the baseline before the run fails (default: 0.3).")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baselines.")
+    args = parser.parse_args()
+
+    # The filters log every call, which would distort the measurements
+    logging.disable(logging.CRITICAL)
+    enable_copy_on_write()
+
+    results = run_benchmarks(args.sizes, args.missing_ratios, only=args.only, repeats=args.repeats)
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if args.update_baseline:
+        baseline.update({key: round(value) for key, value in results.items()})
+        with open(BASELINE_FILE, 'w') as baseline_file:
+            json.dump(dict(sorted(baseline.items())), baseline_file, indent=2)
+        print(f"Baselines saved to {BASELINE_FILE}")
+    elif compare_to_baseline(results, baseline, args.tolerance):
+        sys.exit(1)
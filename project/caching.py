@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+class CacheMissError(LookupError):
+    """
+    Raised when a dataset is requested in offline mode, but no cached payload is available for its URL.
+    """
+
+
+class DownloadCache:
+    """
+    Persistent on-disk cache for downloaded datasets, keyed by URL.
+
+    For every URL the raw payload is stored together with its ETag, Last-Modified header, SHA-256 hash and size.
+    The validators are used to issue conditional requests, so that unchanged datasets are served from the cache.
+    When the cache grows beyond max_size bytes, the least recently used payloads are evicted.
+    In offline mode no requests are made at all and every dataset is served from the cache.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir='../cache/', max_size=None, offline=False):
+        """
+        Parameters:
+        cache_dir (str): Directory in which the payloads and the cache index are stored.
+        max_size (int): Maximum total size of all cached payloads in bytes. Default behaviour is no size limit.
+        offline (bool): Flag indicating that all datasets are to be served from the cache without network access.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.offline = offline
+        self._lock = threading.Lock()  # The cache is shared by the concurrent extraction threads
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._read_index()
+
+    def _read_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return {}
+        try:
+            with open(index_path, 'r') as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cache index '{index_path}' could not be read, starting with an empty cache: {e}")
+            return {}
+
+    def _write_index(self):
+        # Write to a temporary file first, so that an interrupted run never leaves a corrupted index behind.
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as index_file:
+            json.dump(self._index, index_file, indent=2)
+        os.replace(temp_path, index_path)
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _payload_path(self, key):
+        return os.path.join(self.cache_dir, key + '.payload')
+
+    def get(self, url):
+        """
+        Look up the cache entry of a URL.
+
+        Parameters:
+        url (str): The dataset URL.
+
+        Returns:
+        dict: The cache entry with the keys 'url', 'etag', 'last_modified', 'sha256', 'size' and 'last_access',
+              or None if the URL is not cached.
+        """
+        with self._lock:
+            entry = self._index.get(self._key(url))
+            if entry is not None and not os.path.exists(self._payload_path(self._key(url))):
+                return None
+            return dict(entry) if entry is not None else None
+
+    def conditional_headers(self, url):
+        """
+        Build the headers for a conditional request, based on the validators of the cached payload.
+
+        Parameters:
+        url (str): The dataset URL.
+
+        Returns:
+        dict: The If-None-Match and If-Modified-Since headers, empty if the URL is not cached.
+        """
+        entry = self.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def open(self, url):
+        """
+        Open the cached payload of a URL and mark it as recently used.
+
+        Parameters:
+        url (str): The dataset URL.
+
+        Returns:
+        file: The payload as a binary file object.
+        """
+        key = self._key(url)
+        with self._lock:
+            if key not in self._index or not os.path.exists(self._payload_path(key)):
+                raise CacheMissError(f"No cached payload available for {url}")
+            self._index[key]['last_access'] = time.time()
+            self._write_index()
+            return open(self._payload_path(key), 'rb')
+
+    def store(self, url, chunks, etag=None, last_modified=None):
+        """
+        Store a payload in the cache, replacing any previous payload of the URL.
+
+        Parameters:
+        url (str): The dataset URL.
+        chunks (iterable): The payload as an iterable of bytes chunks, e.g. response.iter_content().
+        etag (str): The ETag header of the response.
+        last_modified (str): The Last-Modified header of the response.
+
+        Returns:
+        dict: The new cache entry.
+        """
+        key = self._key(url)
+        sha256 = hashlib.sha256()
+        size = 0
+
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as payload_file:
+                for chunk in chunks:
+                    payload_file.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'sha256': sha256.hexdigest(),
+            'size': size,
+            'last_access': time.time(),
+        }
+
+        with self._lock:
+            os.replace(temp_path, self._payload_path(key))
+            self._index[key] = entry
+            self._evict(keep=key)
+            self._write_index()
+
+        logging.info(f"Cached {size} bytes for {url}")
+        return dict(entry)
+
+    def _evict(self, keep=None):
+        # Remove the least recently used payloads until the cache fits into max_size again. Must hold the lock.
+        if self.max_size is None:
+            return
+
+        total_size = sum(entry['size'] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+            if total_size <= self.max_size:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self._payload_path(key))
+            except FileNotFoundError:
+                pass
+            del self._index[key]
+            total_size -= entry['size']
+            logging.info(f"Evicted cached payload for {entry['url']} ({entry['size']} bytes)")
+
+    def clear(self):
+        """
+        Remove all cached payloads.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._index = {}
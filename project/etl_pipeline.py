@@ -31,184 +31,844 @@
 #   1.1 For Extract Step in ETL
 #   1.2 For Transform Step in ETL
 #   1.3 For Load Step in ETL
-# 2. Pipeline with 5 Datasets
+# 2. Declarative specification of the 5 Datasets
+# 3. Pipeline as a DAG of extract, transform and load tasks
 ########################################################################################################################
 
+import argparse
+import os
 import time
+from functools import partial
 
 # Import ETL functions
+from aggregation import *
+from archive import ARCHIVE_CODECS, ARCHIVE_KEEP_VERSIONS, RawArchive
+from caching import DownloadCache
 from extraction import *
-from loading import load_df_to_csv
+from incremental import HighWaterMarks
+from instrumentation import RunReport
+from loading import FORMATS, append_df, load_chunks, load_df, output_exists, read_df
+from manifest import RunManifest, hash_config, hash_payload
+from orchestration import Task, TaskStatus, run_dag
+from parallel import apply_filters_parallel
+from validation import Validator
 from transformation import *
 
 # Configure the logging system
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Let the transformation filters work on shallow copies instead of deep copies of the DataFrames
+enable_copy_on_write()
+
 ########################################################################################################################
-################ PIPELINE START ########################################################################################
+################ DATASET SPECIFICATIONS ################################################################################
 ########################################################################################################################
 
-# # Applying the ETL Pipeline to the datasets
-skip = False # Flag indicating whether the next dataset is to be skipped, for instance, when the data download was unsuccessful.
-start_time = time.time() # Measure the pipeling execution time.
-
-# ### Chile Covid Mortality Dataset
-chile_url = "https://datos.gob.cl/dataset/8982a05a-91f7-422d-97bc-3eee08fde784/resource/8e5539b7-10b2-409b-ae5a-36dae4faf817/download/defunciones_covid19_2020_2024.csv"
-
-try:
-    # Extract the dataset into a data-frame
-    data = extract_dataset(chile_url, timeout=(200, 200))
-    chile_df = extract_into_df(data, separator=";")
-except Exception as e:
-    skip = True
-    logging.error("Unexpected error when loading dataset. Skipping the pipeline to the next dataset in the script.")
-
-if skip:
-    logging.warning("Skipping dataset")
-    skip = False # Reset the flag indicating whether the next dataset is to be skipped.
-else: # Perform transformations
-
-    # Required fields for analysis are the death-date and the diagnosis (COVID-19)
-    chile_df = filter_drop_columns(chile_df, ["FECHA_DEF", "DIAG1"])
-
-    # Transform the date-fields into datetime objects
-    chile_df = filter_transform_to_datetime(chile_df, "FECHA_DEF")
-
-    # No missing values are imputed, as there are not enough missing values in the dataset
-    for column in chile_df.columns:
-        chile_df = filter_handle_missing_values(chile_df, column=column, strategy=Strategy.DROP_ROW)
+# Mexico: Keep the nombre column and all date columns as they will all be required for the analysis.
+# The date columns are selected by their range instead of enumerating them in a whitelist.
+mexico_date_range = ("2020-03-17", "2023-06-23")
+
+# World Population: Keep the data for the years 2020-2023 and the country name as an identifier
+world_pop_white_list = [str(x) for x in range(2020, 2024)]
+world_pop_white_list.append("Country Name")
+
+# Declarative specification of every dataset, similar to the blocks of a jayvee pipeline:
+# - url, extract: Source of the dataset and the keyword arguments for extraction.extract_dataset
+# - parse: Keyword arguments for extraction.extract_into_df. Only the columns and rows required by the filters are read.
+# - filters: Ordered chain of transformation filters, see transformation.apply_filters
+# - load: Keyword arguments for loading.load_df. CSV is kept as the default format, as it is expected by the analysis.
+# - sqlite: Table options for the 'sqlite' output format, see loading.load_df_to_sqlite.
+#           Datasets with a natural key are upserted, the per-death registries without a key are replaced as a whole.
+# - schema: Declarative schema the transformed dataset is validated against, see validation.check_schema. Depending on
+#           'on_error', violating rows fail the dataset or are quarantined into '<file_name>_quarantine.csv'.
+# - chunkable: Flag indicating that all filters are row-local (missing values are imputed across chunks, see
+#              transformation.StreamingImputer), so that the dataset can be processed in chunks.
+# - incremental: Date column holding the high-water mark for incremental runs. Only given for the datasets that grow by
+#                appending recent dates, rows after the mark are transformed and appended to the existing output.
+# - rollup: How the dataset contributes to the rollup tables (see aggregation.py): the country and date column of the
+#           death counts, optionally the column holding the deaths per row, the last day of rows covering a period and
+#           row filters, or the population table.
+DATASETS = {
+    # ### Chile Covid Mortality Dataset
+    "chile": {
+        "url": "https://datos.gob.cl/dataset/8982a05a-91f7-422d-97bc-3eee08fde784/resource/8e5539b7-10b2-409b-ae5a-36dae4faf817/download/defunciones_covid19_2020_2024.csv",
+        "extract": {"timeout": (200, 200), "stream": True},
+        # The registry of the Chilean health ministry is Latin-1 encoded, its death dates are given in ISO 8601
+        "parse": {"separator": ";", "encoding": "latin-1", "usecols": ["FECHA_DEF", "DIAG1"], "dtype": {"DIAG1": str},
+                  "date_columns": ["FECHA_DEF"]},
+        "filters": [
+            # Required fields for analysis are the death-date and the diagnosis (COVID-19)
+            (filter_drop_columns, {"white_list": ["FECHA_DEF", "DIAG1"]}),
+            # Transform the date-fields into datetime objects
+            (filter_transform_to_datetime, {"column": "FECHA_DEF", "inplace": True}),
+            # No missing values are imputed, as there are not enough missing values in the dataset
+            (filter_handle_missing_values, {"column": ["FECHA_DEF", "DIAG1"], "strategy": Strategy.DROP_ROW, "inplace": True}),
+            # The diagnosis codes only take a few distinct values. The column is given explicitly, so that all chunks get the same dtypes.
+            (filter_optimize_dtypes, {"categorical_columns": ["DIAG1"], "integer_columns": [], "inplace": True}),
+        ],
+        "load": {"file_name": "chile_covid_mortality", "file_format": "csv"},
+        "sqlite": {"if_exists": "replace", "index_columns": ["FECHA_DEF"]},
+        # Deaths of confirmed (U071) and suspected (U072) COVID-19 cases. Rows with other codes or implausible dates are quarantined.
+        "schema": {
+            "columns": {"FECHA_DEF": {"dtype": "datetime", "nullable": False, "min": "2020-01-01"},
+                        "DIAG1": {"dtype": "string", "nullable": False, "allowed": ["U071", "U072"]}},
+            "rows": {"min": 1},
+            "on_error": "quarantine",
+        },
+        "chunkable": True,
+        "incremental": {"date_column": "FECHA_DEF"},
+        # Every row is a death
+        "rollup": {"country": "Chile", "date_column": "FECHA_DEF"},
+    },
+    # ### USA Covid Mortality Dataset
+    "usa": {
+        "url": "https://data.cdc.gov/api/views/exs3-hbne/rows.csv?fourfour=exs3-hbne&cacheBust=1729520760&date=20241106&accessType=DOWNLOAD",
+        "extract": {"timeout": (200, 200), "stream": True},
+        "parse": {"usecols": ["jurisdiction_residence", "data_period_start", "data_period_end", "group", "subgroup1",
+                              "covid_deaths", "crude_rate"],
+                  "row_filters": {"jurisdiction_residence": "United States"}},
+        "filters": [
+            # This dataset has duplicate values, therefore drop all rows for the different regions in the US and keep only the total US rows.
+            (filter_rows_by_values, {"column_name": "jurisdiction_residence", "column_values": "United States"}),
+            # Keep only required fields for analysis
+            (filter_drop_columns, {"white_list": ["data_period_start", "data_period_end", "group", "subgroup1", "covid_deaths", "crude_rate"]}),
+            # Transform the date-fields into datetime objects. This also works for the american M/D/Y date format.
+            (filter_transform_to_datetime, {"column": "data_period_start", "inplace": True}),
+            (filter_transform_to_datetime, {"column": "data_period_end", "inplace": True}),
+            # Drop the rows for which there is no data about covid mortality
+            (filter_handle_missing_values, {"column": ["data_period_start", "data_period_end", "group", "subgroup1", "covid_deaths", "crude_rate"],
+                                            "strategy": Strategy.DROP_ROW, "inplace": True}),
+            # Store the groups as categories and the death counts as small integers
+            (filter_optimize_dtypes, {"categorical_columns": ["group", "subgroup1"], "integer_columns": ["covid_deaths"],
+                                      "inplace": True}),
+        ],
+        "load": {"file_name": "usa_covid_mortality", "file_format": "csv"},
+        "sqlite": {"if_exists": "upsert", "key_columns": ["data_period_start", "data_period_end", "group", "subgroup1"],
+                   "index_columns": ["data_period_start", "group"]},
+        "schema": {
+            "columns": {"data_period_start": {"dtype": "datetime", "min": "2020-01-01"},
+                        "data_period_end": {"dtype": "datetime", "min": "2020-01-01"},
+                        "group": {"dtype": "string"}, "subgroup1": {"dtype": "string"},
+                        "covid_deaths": {"dtype": "numeric", "min": 0}, "crude_rate": {"dtype": "numeric", "min": 0}},
+            "nullable": False,
+            "rows": {"min": 1},
+            "on_error": "fail",
+        },
+        "chunkable": True,
+        "incremental": {"date_column": "data_period_end"},
+        # The group 'All' holds the total deaths per period, the other groups break them down by age, sex and race.
+        # Every row covers a whole period (usually a month), whose deaths are spread over its days.
+        "rollup": {"country": "United States", "date_column": "data_period_start", "end_column": "data_period_end",
+                   "deaths_column": "covid_deaths", "row_filters": {"group": "All"}},
+    },
+    # ### Colombia Covid Mortality Dataset
+    "colombia": {
+        "url": "https://www.datos.gov.co/api/views/jp5m-e7yr/rows.csv?fourfour=jp5m-e7yr&cacheBust=1705599009&date=20241106&accessType=DOWNLOAD",
+        "extract": {"timeout": (200, 200), "stream": True},
+        "parse": {"usecols": ["Fecha de muerte", "Recuperado"], "dtype": {"Fecha de muerte": str, "Recuperado": str}},
+        "filters": [
+            # Keep only required fields for analysis
+            (filter_drop_columns, {"white_list": ["Fecha de muerte", "Recuperado"]}),
+            # Transform the date-fields into datetime objects.
+            (filter_transform_to_datetime, {"column": "Fecha de muerte", "inplace": True}),
+            # No missing values are imputed, as there are not enough missing values in the dataset
+            (filter_handle_missing_values, {"column": ["Fecha de muerte", "Recuperado"], "strategy": Strategy.MEDIAN, "inplace": True}),
+            (filter_optimize_dtypes, {"categorical_columns": ["Recuperado"], "integer_columns": [], "inplace": True}),
+        ],
+        "load": {"file_name": "colombia_covid_mortality", "file_format": "csv"},
+        "sqlite": {"if_exists": "replace", "index_columns": ["Fecha de muerte"]},
+        # Rows with implausible death dates are quarantined
+        "schema": {
+            "columns": {"Fecha de muerte": {"dtype": "datetime", "nullable": False, "min": "2020-01-01"},
+                        "Recuperado": {"dtype": "string"}},
+            "rows": {"min": 1},
+            "on_error": "quarantine",
+        },
+        "chunkable": True,
+        # Rows without a death date are imputed in full runs, but skipped by incremental runs
+        "incremental": {"date_column": "Fecha de muerte"},
+        # Every row is a death
+        "rollup": {"country": "Colombia", "date_column": "Fecha de muerte"},
+    },
+    # ### Mexico Covid Mortality Dataset
+    "mexico": {
+        "url": "https://datos.covid-19.conacyt.mx/Downloads/Files/Casos_Diarios_Estado_Nacional_Defunciones_20230625.csv",
+        "extract": {"timeout": (200, 200), "stream": True},
+        "parse": {},
+        "filters": [
+            # Transform the date column names into datetime format. The column names are given as day-month-year.
+            (filter_transform_to_datetime, {"do_columns": True, "inplace": True, "date_format": "%d-%m-%Y"}),
+            (filter_drop_columns, {"white_list": ["nombre"], "date_range": mexico_date_range}),
+            # Leave only the row containing national mortality in order to avoid having duplicate values.
+            (filter_rows_by_values, {"column_name": "nombre", "column_values": "Nacional"}),
+            # The daily death counts fit into small integers
+            (filter_optimize_dtypes, {"inplace": True}),
+        ],
+        "load": {"file_name": "mexico_covid_mortality", "file_format": "csv"},
+        "sqlite": {"if_exists": "upsert", "key_columns": ["nombre"]},
+        # No missing values need to be imputed, as there are not enough missing values in the dataset
+        "schema": {
+            "columns": {"nombre": {"dtype": "string", "allowed": ["Nacional"]}},
+            "nullable": False,
+            "rows": {"min": 1},
+            "on_error": "fail",
+        },
+        "chunkable": False,
+        # The national deaths per day, melted from one column per day unless the long format is already requested
+        "rollup": {"country": "Mexico", "date_column": "date", "deaths_column": "deaths", "melt": True},
+    },
+    # ### World Population Dataset
+    "world_pop": {
+        "url": "https://api.worldbank.org/v2/en/indicator/SP.POP.TOTL?downloadformat=csv",
+        "extract": {"timeout": (200, 200), "is_zip": True, "stream": True},  # Unzip and identify dataset
+        "parse": {"skiprows": 3},  # Skip first three rows of metadata to get usable dataframe
+        "filters": [
+            (filter_drop_columns, {"white_list": world_pop_white_list}),
+            # Select rows for the countries under analysis
+            (filter_rows_by_values, {"column_name": "Country Name", "column_values": ["Chile", "United States", "Colombia", "Mexico"]}),
+        ],
+        "load": {"file_name": "world_population_total", "file_format": "csv"},
+        "sqlite": {"if_exists": "upsert", "key_columns": ["Country Name"]},
+        # No missing values are imputed, as there are not enough missing values in the dataset
+        "schema": {
+            "columns": {**{year: {"dtype": "numeric", "min": 0} for year in world_pop_white_list[:-1]},
+                        "Country Name": {"dtype": "string"}},
+            "nullable": False,
+            "rows": {"min": 4, "max": 4},
+            "on_error": "fail",
+        },
+        "chunkable": False,
+        "rollup": {"population": True},
+    },
+}
+
+# Rollup stage: Death counts per country and day, week and month with rates per 100k inhabitants, so that the analysis
+# reads a few thousand rows instead of the per-death registries. The tables are recomputed from the daily counts on every run.
+# - file_name: Name pattern of the rollup tables, with the placeholder for 'daily', 'weekly' and 'monthly'
+# - population: The dataset holding the population table
+# - load, sqlite: As for the datasets
+ROLLUP = {
+    "file_name": "covid_mortality_{frequency}",
+    "population": "world_pop",
+    "load": {"file_format": "csv"},
+    "sqlite": {"index_columns": ["country", "date"]},
+}
 
-    # Load the transformed dataframe back into a CSV-database file.
-    load_df_to_csv(chile_df, file_name='chile_covid_mortality', overwrite=False)
+########################################################################################################################
+################ PIPELINE START ########################################################################################
+########################################################################################################################
 
-# ### USA Covid Mortality Dataset
-usa_url = "https://data.cdc.gov/api/views/exs3-hbne/rows.csv?fourfour=exs3-hbne&cacheBust=1729520760&date=20241106&accessType=DOWNLOAD"
-
-# Extract the dataset into a data-frame
-try:
-    data = extract_dataset(usa_url, timeout=(200, 200))
-    usa_df = extract_into_df(data)
-except Exception as e:
-    skip = True
-    logging.error("Unexpected error when loading dataset. Skipping the pipeline to the next dataset in the script.")
-
-if skip:
-    logging.warning("Skipping dataset")
-    skip = False # Reset the flag indicating whether the next dataset is to be skipped.
-else: # Perform transformations
-
-    # This dataset has duplicate values, therefore drop all rows for the different regions in the US and keep only the total US rows.
-    usa_df = filter_rows_by_values(usa_df, "jurisdiction_residence", "United States")
-
-    # Keep only required fields for analysis
-    usa_df = filter_drop_columns(usa_df, ["data_period_start", "data_period_end", "group", "subgroup1", "covid_deaths", "crude_rate"])
-
-    # Transform the date-fields into datetime objects. This also works for the american M/D/Y date format.
-    usa_df = filter_transform_to_datetime(usa_df, "data_period_start")
-    usa_df = filter_transform_to_datetime(usa_df, "data_period_end")
-
-    # Drop the rows for which there is no data about covid mortality
-    for column in usa_df.columns:
-        usa_df = filter_handle_missing_values(usa_df, column=column, strategy=Strategy.DROP_ROW)
-
-    # Load the transformed dataframe back into a CSV-database file.
-    load_df_to_csv(usa_df, file_name='usa_covid_mortality', overwrite=False)
-
-# ### Colombia Covid Mortality Dataset
-colombia_url = "https://www.datos.gov.co/api/views/jp5m-e7yr/rows.csv?fourfour=jp5m-e7yr&cacheBust=1705599009&date=20241106&accessType=DOWNLOAD"
-
-try:
-    # Extract the dataset into a data-frame
-    data = extract_dataset(colombia_url, timeout=(200, 200))
-    colombia_df = extract_into_df(data)
-except Exception as e:
-    skip = True
-    logging.error("Unexpected error when loading dataset. Skipping the pipeline to the next dataset in the script.")
-if skip:
-    logging.warning("Skipping dataset")
-    skip = False # Reset the flag indicating whether the next dataset is to be skipped.
-else: # Perform transformations
-
-    # Keep only required fields for analysis
-    colombia_df = filter_drop_columns(colombia_df, ["Fecha de muerte", "Recuperado"])
-
-    # Transform the date-fields into datetime objects.
-    colombia_df = filter_transform_to_datetime(colombia_df, "Fecha de muerte")
-
-    # No missing values are imputed, as there are not enough missing values in the dataset
-    for column in colombia_df.columns:
-        colombia_df = filter_handle_missing_values(colombia_df, column=column, strategy=Strategy.MEDIAN)
-
-    # Load the transformed dataframe back into a CSV-database file.
-    load_df_to_csv(colombia_df, file_name='colombia_covid_mortality', overwrite=False)
-
-# ### Mexico Covid Mortality Dataset
-mexico_url = "https://datos.covid-19.conacyt.mx/Downloads/Files/Casos_Diarios_Estado_Nacional_Defunciones_20230625.csv"
-
-try:
-    # Extract the dataset into a data-frame
-    data = extract_dataset(mexico_url, timeout=(200, 200))
-    mexico_df = extract_into_df(data)
-except Exception as e:
-    skip = True
-    logging.error("Unexpected error when loading dataset. Skipping the pipeline to the next dataset in the script.")
-
-if skip:
-    logging.warning("Skipping dataset")
-    skip = False # Reset the flag indicating whether the next dataset is to be skipped.
-else: # Perform transformations
-
-    # Transform the date column names into datetime format
-    mexico_df = filter_transform_to_datetime(mexico_df, do_columns=True)
-
-    # Keep the nombre column and all date columns as they will all be required for the analysis.
-    # For this dataset, having to use a whitelist is a bit unfortunate, however we work around this issue by generating all column names automatically.
-    start_date, end_date = '17-03-2020', '23-06-2023' # Define the date range
-    date_range = pd.date_range(start=start_date, end=end_date).date.tolist() # Generate the date range
-    date_range.append("nombre")
-
-    mexico_df = filter_drop_columns(mexico_df, white_list=date_range)
-
-    # Leave only the row containing national mortality in order to avoid having duplicate values.
-    mexico_df = filter_rows_by_values(mexico_df, "nombre", "Nacional")
-
-    # No missing values need to be imputed, as there are not enough missing values in the dataset
-    assert mexico_df.isnull().sum().sum() == 0
-
-    # Load the transformed dataframe back into a CSV-database file.
-    load_df_to_csv(mexico_df, file_name='mexico_covid_mortality', overwrite=False)
-
-# ### World Population Dataset
-world_pop_url = "https://api.worldbank.org/v2/en/indicator/SP.POP.TOTL?downloadformat=csv"
-
-try:
-    # Extract the dataset into a data-frame
-    data = extract_dataset(world_pop_url, timeout=(200, 200), is_zip=True)  # Unzip and identify dataset
-    world_pop_df = extract_into_df(data, skiprows=3)  # Skip first three rows of metadata to get usable dataframe
-except Exception as e:
-    skip = True
-    logging.error("Unexpected error when loading dataset. Skipping the pipeline to the next dataset in the script.")
-
-if skip:
-    logging.warning("Skipping dataset")
-    skip = False # Reset the flag indicating whether the next dataset is to be skipped.
-else: # Perform transformations
-
-    # Keep the data for the years 2020-2023 and the country name as an identifier
-    white_list = [str(x) for x in range(2020, 2024)]
-    white_list.append("Country Name")
-    world_pop_df = filter_drop_columns(world_pop_df, white_list)
-
-    # Select rows for the countries under analysis
-    countries = ["Chile", "United States", "Colombia", "Mexico"]
-    world_pop_df = filter_rows_by_values(world_pop_df, "Country Name", countries)
-
-    # No missing values are imputed, as there are not enough missing values in the dataset
-    assert world_pop_df.isnull().sum().sum() == 0
-
-    # Load the transformed dataframe back into a CSV-database file.
-    load_df_to_csv(world_pop_df, file_name='world_population_total', overwrite=False)
-
-end_time = time.time() # Measure pipeline execution time.
-elapsed_time = end_time - start_time # Calculate elapsed time
-logging.info(f"Pipeline finished in {elapsed_time:.2f} seconds")
\ No newline at end of file
+# Result of the extract and transform steps of a dataset whose payload and configuration are unchanged since its output
+# was saved, so that the remaining steps are skipped
+UNCHANGED = object()
+
+
+def extract_step(name, spec, report, cache=None, chunksize=None, manifest=None, force=False, archive=None):
+    """
+    Extract a dataset into a DataFrame, or into an iterator over DataFrame chunks if a chunksize is given.
+    With a raw archive, the downloaded payload is archived before it is parsed, or, in re-transform mode, the archived
+    payload is parsed instead of downloading the dataset.
+    With a run manifest, the payload is only parsed if it or the configuration of the dataset changed since its output
+    was saved, or if the output does not exist anymore.
+
+    Parameters:
+    name (str): The name of the dataset.
+    spec (dict): The dataset specification.
+    report (RunReport): The report the download and the parsing are recorded in.
+    cache (DownloadCache): Download cache shared by all datasets, or None.
+    chunksize (int): Number of rows per chunk, or None to extract the dataset as a whole.
+    manifest (RunManifest): The manifest of the previous runs, or None to always process the dataset.
+    force (bool): Flag indicating that the dataset is processed even if it is unchanged.
+    archive (RawArchive): Archive of the raw payloads shared by all datasets, or None.
+
+    Returns:
+    pd.DataFrame/iterator: The extracted dataset, or UNCHANGED.
+    """
+    payload_hash = None
+    if archive is not None and archive.retransform:
+        # The archive holds the payloads after unpacking, so they are parsed as they are
+        data = report.measure(name, "archive.open", archive.open, name, stream=spec["extract"].get("stream", False))
+        archived = archive.entry(name)
+        payload_hash = archived["sha256"]
+        report.add(name, "archive.open", version=archived["version"], archived=archived["archived"])
+    else:
+        data = report.measure(name, "extract_dataset", extract_dataset, spec["url"], cache=cache, **spec["extract"])
+        download_stats = get_download_report().get(spec["url"])
+        if download_stats is not None:
+            report.add(name, "extract_dataset", **download_stats)
+
+        # The cache already knows the hash of the payload, otherwise the payload is hashed before it is parsed.
+        # Zipped payloads are always hashed after unpacking, so that the hash does not depend on the cache being used.
+        entry = cache.get(spec["url"]) if cache is not None and not spec["extract"].get("is_zip") else None
+        payload_hash = entry["sha256"] if entry is not None and entry.get("sha256") else None
+        if archive is not None:
+            archived = report.measure(name, "archive", archive.store, name, data, sha256=payload_hash, url=spec["url"])
+            if archived is not None:
+                payload_hash = archived["sha256"]
+                report.add(name, "archive", version=archived["version"], compressed_bytes=archived["compressed_size"])
+
+    if manifest is not None:
+        payload_hash = payload_hash or hash_payload(data)
+        config_hash = hash_config(spec)
+        load = spec["load"]
+        if (not force and manifest.unchanged(name, payload_hash, config_hash)
+                and output_exists(load["file_name"], load.get("file_path", "../data/"), load.get("file_format", "csv"))):
+            logging.info(f"Dataset '{name}' is unchanged since its output was saved, skipping parse, transform and load")
+            report.add(name, "extract_dataset", unchanged=True)
+            if hasattr(data, "close"):
+                data.close()
+            return UNCHANGED
+        manifest.stage(name, payload_hash, config_hash)
+
+    parse_args = dict(spec["parse"])
+    if chunksize is not None:
+        parse_args["chunksize"] = chunksize
+    return report.measure(name, "extract_into_df", extract_into_df, data, **parse_args)
+
+
+def transform_step(name, spec, report, df, workers=None):
+    """
+    Apply the filter chain of a dataset, measuring every filter separately.
+    With worker processes, large DataFrames are transformed in parallel and the filter chain is measured as a whole.
+
+    Parameters:
+    name (str): The name of the dataset.
+    spec (dict): The dataset specification.
+    report (RunReport): The report the filters are recorded in.
+    df (pd.DataFrame/iterator): The extracted dataset.
+    workers (int): Number of worker processes for the transformation, see parallel.apply_filters_parallel. Default behaviour is to transform serially.
+
+    Returns:
+    pd.DataFrame/iterator: The transformed dataset.
+    """
+    if df is UNCHANGED:
+        return df
+    if workers and workers > 1 and isinstance(df, pd.DataFrame):
+        df = report.measure(name, "transform.parallel", apply_filters_parallel, df, spec["filters"], workers=workers)
+    else:
+        df = apply_filters(df, report.wrap_filters(name, spec["filters"]))
+    return validate_step(name, spec, report, df) if "schema" in spec else df
+
+
+def _validate_chunks(chunks, validate, finish):
+    """
+    Helper function to validate a stream of chunks and to finish the validation at the end of the stream.
+
+    Parameters:
+    chunks (iterator): The DataFrame chunks.
+    validate (callable): The function validating a chunk.
+    finish (callable): The function called once all chunks are validated.
+
+    Returns:
+    iterator: The validated chunks.
+    """
+    for chunk in chunks:
+        yield validate(chunk)
+    finish()
+
+
+def validate_step(name, spec, report, df):
+    """
+    Validate a transformed dataset against its schema, see validation.Validator.
+    The quality report is added to the run report and the quarantined rows are written next to the output of the
+    dataset. Chunked datasets are validated lazily, chunk by chunk.
+
+    Parameters:
+    name (str): The name of the dataset.
+    spec (dict): The dataset specification.
+    report (RunReport): The report the validation is recorded in.
+    df (pd.DataFrame/iterator): The transformed dataset.
+
+    Returns:
+    pd.DataFrame/iterator: The validated dataset, without the quarantined rows.
+    """
+    validator = Validator(spec["schema"], name)
+    load = spec["load"]
+    quarantine_name = f"{load['file_name']}_quarantine"
+    file_path = load.get("file_path", "../data/")
+
+    def finish():
+        try:
+            validator.finish()
+        finally:
+            report.add(name, "validate", quality=validator.report())
+        quarantined = validator.quarantined()
+        if len(quarantined):
+            logging.warning(f"Dataset '{name}': {len(quarantined)} rows quarantined into '{quarantine_name}.csv'")
+            load_df(quarantined, quarantine_name, file_path=file_path, overwrite=True)
+        elif os.path.exists(os.path.join(file_path, f"{quarantine_name}.csv")):
+            # Do not leave the quarantined rows of a previous run behind
+            os.remove(os.path.join(file_path, f"{quarantine_name}.csv"))
+
+    validate = report.wrap(name, "validate", validator.validate)
+    if not isinstance(df, pd.DataFrame):
+        return _validate_chunks(df, validate, finish)
+    df = validate(df)
+    finish()
+    return df
+
+
+def _tap_chunks(chunks, func):
+    """
+    Helper function to pass on a stream of chunks, while calling a function on every chunk, e.g. to collect statistics.
+
+    Parameters:
+    chunks (iterator): The DataFrame chunks.
+    func (callable): The function called with every chunk.
+
+    Returns:
+    iterator: The unchanged chunks.
+    """
+    for chunk in chunks:
+        func(chunk)
+        yield chunk
+
+
+def load_step(name, spec, report, df, marks=None, append=False, manifest=None):
+    """
+    Load a transformed dataset into its output file or table.
+    In incremental runs the high-water mark of the dataset is advanced to the latest loaded date afterwards, but only
+    if the rows were saved, so that a failed run is repeated from the previous mark.
+    While the rows are loaded, the daily death counts for the rollup stage are collected, so that chunked datasets
+    do not have to be read twice.
+
+    Parameters:
+    name (str): The name of the dataset.
+    spec (dict): The dataset specification.
+    report (RunReport): The report the loading is recorded in.
+    df (pd.DataFrame/iterator): The transformed dataset.
+    marks (HighWaterMarks): The high-water marks of an incremental run, or None for a regular run.
+    append (bool): Flag indicating that df only holds the rows after the high-water mark, which are appended to the output.
+    manifest (RunManifest): The manifest the hashes of the dataset are recorded in once its output is saved, or None.
+
+    Returns:
+    dict: The input of the rollup stage, i.e. the daily death counts or the population table of the dataset, or None.
+    """
+    if df is UNCHANGED:
+        return None  # The rollup keeps the counts of the previous run, which match the unchanged output
+    incremental = marks is not None and "incremental" in spec
+    rollup = spec.get("rollup", {})
+    count_deaths = report.wrap(name, "rollup.daily_counts", daily_counts)
+    maxima = []
+    counts = []
+
+    def collect(chunk):
+        if incremental and len(chunk) > 0:
+            maxima.append(chunk[spec["incremental"]["date_column"]].max())
+        if "date_column" in rollup:
+            counts.append(count_deaths(chunk, **{key: value for key, value in rollup.items() if key != "country"}))
+
+    if isinstance(df, pd.DataFrame):
+        collect(df)
+    else:
+        df = _tap_chunks(df, collect)
+
+    if not incremental:
+        # Incremental runs refresh existing outputs, so datasets without a high-water mark replace their output.
+        # With a manifest, the dataset is only processed if its payload or configuration changed, so its output is replaced as well.
+        overwrite = marks is not None or manifest is not None
+        if isinstance(df, pd.DataFrame):
+            saved = report.measure(name, "load", load_df, df, overwrite=overwrite, **spec["load"])
+        else:
+            # Stream the chunks through the transformation chain into the appending loader.
+            # The time of this step therefore includes parsing and transforming the chunks.
+            saved = report.measure(name, "load", load_chunks, df, overwrite=overwrite, **spec["load"])
+        if not saved:
+            return None  # The rollup keeps the counts of the previous run, matching the output that was kept
+        if manifest is not None:
+            manifest.commit(name)
+    else:
+        if append:
+            if not isinstance(df, pd.DataFrame):
+                # Only the rows after the high-water mark are left, so the chunks are combined for one atomic append
+                chunks = list(df)
+                df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+            saved = report.measure(name, "load", append_df, df, **spec["load"])
+        else:
+            # No previous output or mark, so the complete dataset is loaded and replaces any previous output
+            loader = load_df if isinstance(df, pd.DataFrame) else load_chunks
+            saved = report.measure(name, "load", loader, df, overwrite=True, **spec["load"])
+        if not saved:
+            raise RuntimeError(f"Dataset '{name}' could not be saved, its high-water mark is not advanced")
+
+        if manifest is not None:
+            manifest.commit(name)
+
+        maxima = [mark for mark in maxima if pd.notna(mark)]
+        if maxima:
+            marks.set(name, max(maxima))
+        report.add(name, "load", mode="append" if append else "full", high_water_mark=marks.get(name))
+
+    if "date_column" in rollup:
+        return {"country": rollup["country"], "counts": combine_counts(counts), "append": append}
+    if rollup.get("population"):
+        return {"population": population_by_year(df)}
+    return None
+
+
+def rollup_step(spec, datasets, report, *results):
+    """
+    Aggregate the daily death counts of all datasets into daily, weekly and monthly tables with rates per 100k
+    inhabitants and save them.
+    The daily counts of the previous run are read back and only the counts of the datasets processed in this run are
+    replaced (or, for incremental runs, added to), so that datasets which failed or were not selected keep their counts.
+
+    Parameters:
+    spec (dict): The rollup specification, see ROLLUP.
+    datasets (dict): The dataset specifications of the run, used to locate the population table if it was not loaded.
+    report (RunReport): The report the rollup is recorded in.
+    results: The results of the load steps, see load_step. Failed or skipped load steps contribute None.
+
+    Returns:
+    None
+    """
+    load = dict(spec["load"])
+    read_args = {"file_path": load.get("file_path", "../data/"), "file_format": load["file_format"]}
+    if all(result is None for result in results) and all(
+            output_exists(spec["file_name"].format(frequency=frequency), **read_args) for frequency in ROLLUP_FREQUENCIES):
+        # E.g. all datasets are unchanged, see RunManifest
+        logging.info("No death counts were loaded in this run, keeping the existing rollup tables")
+        return None
+
+    daily = read_df(spec["file_name"].format(frequency="daily"), date_columns=["date"], **read_args)
+
+    population = None
+    for result in results:
+        if result is None:
+            continue
+        if "population" in result:
+            population = result["population"]
+        else:
+            daily = report.measure("rollup", "merge_daily_counts", merge_daily_counts, daily, result["country"],
+                                   result["counts"], append=result["append"])
+
+    if daily is None:
+        logging.warning("No daily death counts available, the rollup tables are not saved")
+        return None
+
+    if population is None:
+        # Fall back to the population table of a previous run
+        population_load = datasets.get(spec["population"], DATASETS[spec["population"]])["load"]
+        population_df = read_df(population_load["file_name"], file_path=population_load.get("file_path", "../data/"),
+                                file_format=population_load.get("file_format", "csv"))
+        population = population_by_year(population_df) if population_df is not None else None
+
+    rollups = report.measure("rollup", "build_rollups", build_rollups, daily, population)
+    for frequency, rollup in rollups.items():
+        report.measure("rollup", f"load.{frequency}", load_df, rollup, spec["file_name"].format(frequency=frequency),
+                       overwrite=True, **load)
+    return None
+
+
+def incremental_spec(name, spec, marks):
+    """
+    Adapt the specification of a dataset for an incremental run.
+    If the dataset has a high-water mark and its output exists, a filter keeping only the rows after the mark is
+    inserted right after the date column is converted, so that the remaining filters only process the new rows.
+
+    Parameters:
+    name (str): The name of the dataset.
+    spec (dict): The dataset specification.
+    marks (HighWaterMarks): The high-water marks of all datasets.
+
+    Returns:
+    (dict, pd.Timestamp): The adapted specification and the high-water mark, which is None if the dataset has to be loaded completely.
+    """
+    load = spec["load"]
+    if not output_exists(load["file_name"], load.get("file_path", "../data/"), load.get("file_format", "csv")):
+        return spec, None
+    mark = marks.get(name)
+    if mark is None:
+        return spec, None
+
+    date_column = spec["incremental"]["date_column"]
+    filters = list(spec["filters"])
+    position = next((i + 1 for i, (func, filter_args) in enumerate(filters)
+                     if func is filter_transform_to_datetime and filter_args.get("column") == date_column), None)
+    if position is None:
+        raise ValueError(f"Dataset '{name}' has no filter converting its high-water mark column '{date_column}' to dates")
+    filters.insert(position, (filter_rows_after, {"column_name": date_column, "high_water_mark": mark}))
+    logging.info(f"Dataset '{name}': Loading only the rows after the high-water mark {mark}")
+    spec = {**spec, "filters": filters}
+    if "schema" in spec:
+        # The bounds of the number of rows apply to the whole dataset, not to the new rows
+        spec["schema"] = {key: value for key, value in spec["schema"].items() if key != "rows"}
+    return spec, mark
+
+
+def build_tasks(datasets, report, cache=None, chunksize=None, marks=None, rollup=None, transform_workers=None,
+                manifest=None, force=False, archive=None):
+    """
+    Build the extract, transform and load tasks for each dataset.
+
+    Parameters:
+    datasets (dict): Maps a dataset name to its specification.
+    report (RunReport): The report all steps are recorded in.
+    cache (DownloadCache): Download cache shared by all datasets, or None.
+    chunksize (int): Number of rows per chunk for the chunkable datasets, or None to process them as a whole.
+    marks (HighWaterMarks): The high-water marks for an incremental run, or None for a regular run.
+    rollup (dict): The rollup specification, or None to skip the rollup stage.
+    transform_workers (int): Number of worker processes for transforming large datasets, or None to transform serially.
+    manifest (RunManifest): The manifest of the previous runs, used to skip unchanged datasets, or None.
+    force (bool): Flag indicating that unchanged datasets are processed as well.
+    archive (RawArchive): Archive of the raw payloads, or None.
+
+    Returns:
+    list: The tasks of the pipeline.
+    """
+    tasks = []
+    for name, spec in datasets.items():
+        mark = None
+        if marks is not None and "incremental" in spec:
+            spec, mark = incremental_spec(name, spec, marks)
+        dataset_chunksize = chunksize if spec.get("chunkable") else None
+        tasks += [
+            Task(f"{name}.extract", partial(extract_step, name, spec, report, cache, dataset_chunksize, manifest, force,
+                                            archive),
+                 retries=1),
+            Task(f"{name}.transform", partial(transform_step, name, spec, report, workers=transform_workers),
+                 depends_on=[f"{name}.extract"]),
+            # A stream of chunks can only be consumed once, so the load step can then not be retried
+            Task(f"{name}.load", partial(load_step, name, spec, report, marks=marks, append=mark is not None,
+                                         manifest=manifest),
+                 depends_on=[f"{name}.transform"], retries=0 if dataset_chunksize else 1),
+        ]
+
+    rollup_inputs = [f"{name}.load" for name, spec in datasets.items() if "rollup" in spec]
+    if rollup is not None and rollup_inputs:
+        # The rollup also runs if some datasets failed, keeping their counts of the previous run
+        tasks.append(Task("rollup", partial(rollup_step, rollup, datasets, report), depends_on=rollup_inputs,
+                          tolerate_failures=True))
+    return tasks
+
+
+def run_pipeline(datasets=None, max_workers=None, cache=None, chunksize=None, report_path=None, profile=False,
+                 marks=None, rollup=ROLLUP, transform_workers=None, manifest=None, force=False, archive=None):
+    """
+    Run the ETL pipeline as a DAG of extract, transform and load tasks on a worker pool.
+    All datasets are processed concurrently and each one is transformed and loaded as soon as its download finishes.
+    If a task fails, the remaining tasks of that dataset are skipped while the other datasets continue.
+    If a chunksize is given, the chunkable datasets are parsed, transformed and appended to their output chunk by chunk,
+    so that memory usage is proportional to the chunk size instead of the size of the download.
+    If high-water marks are given, the datasets with a date column for incremental runs only transform the rows after
+    their mark and append them to the existing output, while all other datasets replace their output.
+    Once all datasets are loaded, their daily death counts are rolled up into daily, weekly and monthly tables.
+
+    Parameters:
+    datasets (dict): Maps a dataset name to its specification. Default behaviour is all DATASETS.
+    max_workers (int): Maximum number of concurrently running tasks. Default behaviour is the ThreadPoolExecutor default.
+    cache (DownloadCache): Download cache shared by all datasets. Default behaviour is to download without caching.
+    chunksize (int): Number of rows per chunk for the chunkable datasets. Default behaviour is to process them as a whole.
+    report_path (str): Path of the JSON run report with the time, memory and row counts of every step. Default behaviour is to not write a report.
+    profile (bool): Flag indicating if a cProfile and tracemalloc profile is to be written next to the run report.
+    marks (HighWaterMarks): The high-water marks for an incremental run. Default behaviour is a regular run.
+    rollup (dict): The rollup specification. Default behaviour is ROLLUP, None skips the rollup stage.
+    transform_workers (int): Number of worker processes for transforming the large datasets, see parallel.apply_filters_parallel.
+                             Default behaviour is to transform every dataset serially.
+    manifest (RunManifest): The manifest of the previous runs. Datasets whose payload and configuration are unchanged
+                            since their output was saved are skipped after the download. Default behaviour is to
+                            process all datasets.
+    force (bool): Flag indicating that unchanged datasets are processed as well.
+    archive (RawArchive): Archive the raw payloads are stored in, or, in re-transform mode, read from without any
+                          network access. Default behaviour is to not archive the payloads.
+
+    Returns:
+    dict: Maps each task name to its TaskStatus.
+    """
+
+    start_time = time.time() # Measure the pipeling execution time.
+    datasets = DATASETS if datasets is None else datasets
+    report = RunReport(profile=profile)
+
+    status = run_dag(build_tasks(datasets, report, cache=cache, chunksize=chunksize, marks=marks, rollup=rollup,
+                                 transform_workers=transform_workers, manifest=manifest, force=force, archive=archive),
+                     max_workers=max_workers)
+
+    # Report how resilient each download had to be
+    download_report = get_download_report()
+    for name, spec in datasets.items():
+        if spec["url"] in download_report:
+            stats = download_report[spec["url"]]
+            logging.info(f"Dataset '{name}': {stats['retries']} retries, {stats['resumes']} resumed downloads, "
+                         f"{stats['bytes']} bytes transferred")
+
+    failed = sorted({task.split(".")[0] for task, task_status in status.items()
+                     if task_status != TaskStatus.SUCCEEDED and task != "rollup"})
+    if failed:
+        logging.warning(f"Datasets not completed: {failed}. Rerun them with '--datasets {' '.join(failed)}'")
+
+    end_time = time.time() # Measure pipeline execution time.
+    elapsed_time = end_time - start_time # Calculate elapsed time
+    logging.info(f"Pipeline finished in {elapsed_time:.2f} seconds")
+
+    if report_path:
+        report.write(report_path)
+    return status
+
+
+def configure_datasets(args, parser):
+    """
+    Select the datasets of a run and apply the command line options to their specifications.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line arguments.
+    parser (argparse.ArgumentParser): The parser, used to report invalid arguments.
+
+    Returns:
+    dict: Maps each selected dataset name to its (copied) specification.
+    """
+    names = args.datasets or list(DATASETS)
+    datasets = {name: {**DATASETS[name], "load": dict(DATASETS[name]["load"]), "filters": list(DATASETS[name]["filters"])}
+                for name in names}
+
+    for output_format in args.output_format:
+        name, _, file_format = output_format.rpartition("=")
+        if file_format not in FORMATS or (name and name not in DATASETS):
+            parser.error(f"Invalid output format '{output_format}'")
+        for dataset in ([name] if name else datasets):
+            if dataset not in datasets:
+                continue
+            datasets[dataset]["load"]["file_format"] = file_format
+            if file_format == "sqlite":
+                datasets[dataset]["load"].update(datasets[dataset]["sqlite"])
+    if args.compression:
+        for spec in datasets.values():
+            if spec["load"]["file_format"] in ("parquet", "feather"):
+                spec["load"]["compression"] = args.compression
+
+    for source_url in args.source_url:
+        name, _, url = source_url.partition("=")
+        if name not in DATASETS or not url:
+            parser.error(f"Invalid source URL '{source_url}'")
+        if name in datasets:
+            datasets[name]["url"] = url
+    if args.output_dir:
+        for spec in datasets.values():
+            spec["load"]["file_path"] = args.output_dir
+
+    if args.parse_engine:
+        for spec in datasets.values():
+            spec["parse"] = {**spec["parse"], "engine": args.parse_engine}
+
+    if args.mexico_long_format and "mexico" in datasets:
+        # Store one row per day instead of one column per day
+        datasets["mexico"]["filters"].append((filter_melt_date_columns, {"date_name": "date", "value_name": "deaths"}))
+        if datasets["mexico"]["load"]["file_format"] == "sqlite":
+            datasets["mexico"]["load"].update(key_columns=["nombre", "date"], index_columns=["date"])
+
+    return datasets
+
+
+def configure_rollup(args):
+    """
+    Apply the command line options to the rollup specification. Output formats given for all datasets also apply to
+    the rollup tables.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line arguments, as validated by configure_datasets.
+
+    Returns:
+    dict: The (copied) rollup specification, or None if the rollup stage is disabled.
+    """
+    if args.no_rollup:
+        return None
+
+    rollup = {**ROLLUP, "load": dict(ROLLUP["load"])}
+    if args.output_dir:
+        rollup["load"]["file_path"] = args.output_dir
+    for output_format in args.output_format:
+        name, _, file_format = output_format.rpartition("=")
+        if not name:
+            rollup["load"]["file_format"] = file_format
+            if file_format == "sqlite":
+                rollup["load"].update(rollup["sqlite"])
+    if args.compression and rollup["load"]["file_format"] in ("parquet", "feather"):
+        rollup["load"]["compression"] = args.compression
+    return rollup
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL pipeline for the COVID-19 mortality datasets.")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=None,
+                        help="Run the pipeline only for these datasets (default: all datasets).")
+    parser.add_argument("--source-url", action="append", default=[], metavar="DATASET=URL",
+                        help="Download a dataset from this URL instead of its data portal, e.g. from a local replay "
+                             "server (see replay_server.py). Can be given multiple times.")
+    parser.add_argument("--max-workers", type=int, default=None,
+                        help="Maximum number of concurrently running pipeline tasks.")
+    parser.add_argument("--cache-dir", default="../cache/",
+                        help="Directory of the persistent download cache (default: ../cache/).")
+    parser.add_argument("--cache-max-size", type=int, default=None,
+                        help="Maximum size of the download cache in MB, least recently used payloads are evicted first.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Download every dataset from scratch without using the download cache.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Run the pipeline from the cached payloads only, without any network access.")
+    parser.add_argument("--archive", action="store_true",
+                        help="Archive the raw payloads as compressed versions, from which --retransform rebuilds the outputs.")
+    parser.add_argument("--archive-dir", default="../archive/",
+                        help="Directory of the compressed, versioned archive of the raw payloads (default: ../archive/).")
+    parser.add_argument("--archive-codec", choices=list(ARCHIVE_CODECS), default="zstd",
+                        help="Codec the raw payloads are archived with (default: zstd).")
+    parser.add_argument("--archive-keep", type=int, default=ARCHIVE_KEEP_VERSIONS,
+                        help=f"Number of archived versions kept per dataset (default: {ARCHIVE_KEEP_VERSIONS}).")
+    parser.add_argument("--archive-max-size", type=int, default=None,
+                        help="Maximum size of the archive in MB, the oldest versions are removed first.")
+    parser.add_argument("--retransform", action="store_true",
+                        help="Rebuild the outputs from the archived raw payloads without any network access. Datasets "
+                             "whose configuration and code are unchanged are skipped, unless --force is given.")
+    parser.add_argument("--as-of", default=None, metavar="YYYY-MM-DD",
+                        help="With --retransform, use the latest payloads archived on or before this day.")
+    parser.add_argument("--output-format", action="append", default=[], metavar="[DATASET=]FORMAT",
+                        help=f"Output format {list(FORMATS)} for all datasets or, if prefixed with a dataset name, "
+                             f"for a single dataset. Can be given multiple times.")
+    parser.add_argument("--output-dir", default=None,
+                        help="Directory of the output files and the quarantined rows (default: ../data/).")
+    parser.add_argument("--compression", default=None,
+                        help="Compression codec for the columnar output formats, e.g. snappy, zstd or lz4.")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Process the chunkable datasets in chunks of this many rows to bound memory usage.")
+    parser.add_argument("--parse-engine", choices=ENGINES, default=None,
+                        help="CSV parsing engine: the pandas C parser (default) or the multithreaded Arrow reader ('pyarrow').")
+    parser.add_argument("--transform-workers", type=int, default=None,
+                        help="Transform large datasets (not processed in chunks) in parallel with this many worker processes.")
+    parser.add_argument("--mexico-long-format", action="store_true",
+                        help="Melt the Mexico dataset into one row per day instead of one column per day.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only transform the rows after the high-water mark of the previous run and append them to "
+                             "the existing output (Chile, USA and Colombia). All other datasets replace their output.")
+    parser.add_argument("--state-file", default="../data/high_water_marks.json",
+                        help="Path of the high-water marks of incremental runs (default: ../data/high_water_marks.json).")
+    parser.add_argument("--no-rollup", action="store_true",
+                        help="Skip the rollup of the death counts into daily, weekly and monthly tables.")
+    parser.add_argument("--manifest", default="../data/run_manifest.json",
+                        help="Path of the run manifest recording the payload and configuration hash of every output "
+                             "(default: ../data/run_manifest.json). Pass an empty string to disable it.")
+    parser.add_argument("--force", action="store_true",
+                        help="Process all datasets, even if their payload and configuration are unchanged.")
+    parser.add_argument("--report", default="../data/run_report.json",
+                        help="Path of the JSON run report with per-step timings, memory and row counts "
+                             "(default: ../data/run_report.json). Pass an empty string to disable it.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Additionally write a cProfile and tracemalloc profile next to the run report.")
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        max_size = args.cache_max_size * 1024 * 1024 if args.cache_max_size is not None else None
+        cache = DownloadCache(args.cache_dir, max_size=max_size, offline=args.offline)
+    elif args.offline:
+        parser.error("--offline requires the download cache")
+
+    archive = None
+    if args.archive or args.retransform:
+        max_size = args.archive_max_size * 1024 * 1024 if args.archive_max_size is not None else None
+        archive = RawArchive(args.archive_dir, codec=args.archive_codec, keep_versions=args.archive_keep,
+                             max_size=max_size, retransform=args.retransform, as_of=args.as_of)
+
+    marks = HighWaterMarks(args.state_file) if args.incremental else None
+    manifest = RunManifest(args.manifest) if args.manifest else None
+
+    run_pipeline(configure_datasets(args, parser), max_workers=args.max_workers, cache=cache, chunksize=args.chunksize,
+                 report_path=args.report, profile=args.profile, marks=marks, rollup=configure_rollup(args),
+                 transform_workers=args.transform_workers, manifest=manifest, force=args.force, archive=archive)
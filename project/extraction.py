@@ -1,60 +1,597 @@
 import io
 import logging
+import random
+import shutil
+import tempfile
+import threading
+import time
 import zipfile
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 import pandas as pd
 import requests
-from retry import retry
+from requests.adapters import HTTPAdapter
 
-@retry(tries=3, delay=30, logger=logging.getLogger())
-def extract_dataset(dataset_url: str, timeout: (int, int) = (None, None), is_zip: bool = False):
+# Downloads larger than this are spooled from memory to a temporary file on disk.
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+# Size of the chunks in which a download is written to the spooled file.
+CHUNK_SIZE = 1024 * 1024
+# Number of rows read at once when row filters are pushed down into the reader.
+FILTER_CHUNK_SIZE = 100000
+# Parsing engines of extract_into_df: the single-threaded pandas C parser, and the multithreaded Arrow CSV reader,
+# which requires the pyarrow package and returns Arrow-backed DataFrames.
+ENGINES = ('c', 'pyarrow')
+# Size of the blocks of a dataset the Arrow CSV reader parses concurrently.
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Retry behaviour of the downloader: exponential backoff with full jitter, capped at BACKOFF_MAX seconds.
+MAX_TRIES = 5
+BACKOFF_BASE = 2
+BACKOFF_MAX = 120
+# Server-side errors that are worth retrying, as opposed to e.g. 404 Not Found.
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+_sessions = {}  # One pooled requests.Session per host, shared by all extraction threads
+_download_report = {}  # Retry and resume counts per dataset URL
+_lock = threading.Lock()
+
+
+class RetryableHTTPError(requests.exceptions.HTTPError):
+    """
+    Raised for HTTP responses with a transient error status, carrying the delay requested via Retry-After (if any).
+    """
+
+    def __init__(self, message, retry_after=None, response=None):
+        super().__init__(message, response=response)
+        self.retry_after = retry_after
+
+
+def _select_csv_member(zip_file):
+    """
+    Helper function to pick out the csv dataset file which is not metadata (as identified by file-name).
+
+    Parameters:
+    zip_file (zipfile.ZipFile): The opened zip archive.
+
+    Returns:
+    str: The name of the csv dataset file in the archive.
+    """
+    csv_files = [f for f in zip_file.namelist() if f.endswith('.csv') and 'metadata' not in f.lower()]
+    if len(csv_files) == 1:  # Ensure that there is only a singular csv dataset file
+        return csv_files[0]
+    else:
+        raise ValueError(f"Expected exactly one CSV file without 'metadata' in the name, found: {csv_files}")
+
+
+def _get_session(dataset_url):
+    """
+    Helper function to get the shared session for the host of a URL, so that connections are pooled and reused.
+
+    Parameters:
+    dataset_url (str): URL of a dataset.
+
+    Returns:
+    requests.Session: The session for the host of the URL.
+    """
+    host = urlsplit(dataset_url).netloc
+    with _lock:
+        if host not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[host] = session
+        return _sessions[host]
+
+
+def _parse_retry_after(value):
+    """
+    Helper function to convert a Retry-After header, given either in seconds or as an HTTP date, to seconds.
+
+    Parameters:
+    value (str): The value of the Retry-After header.
+
+    Returns:
+    float: The number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt):
+    """
+    Helper function to compute the exponential backoff delay with full jitter for a failed attempt.
+
+    Parameters:
+    attempt (int): The number of failed attempts so far, starting at 1.
+
+    Returns:
+    float: The number of seconds to wait before the next attempt.
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+def _resumable(response_headers):
+    """
+    Helper function to check if an interrupted download can be resumed with a range request.
+    The received bytes are counted after the content encoding (e.g. gzip) has been decoded, so they are no valid
+    offset into an encoded response. Resuming also requires a strong ETag for the If-Range header, as weak ETags and
+    Last-Modified dates cannot guarantee that the missing bytes belong to the same representation (RFC 7233).
+
+    Parameters:
+    response_headers (dict): The headers of the interrupted response.
+
+    Returns:
+    bool: True if the download can be resumed.
+    """
+    etag = response_headers.get('ETag') or ''
+    encoding = (response_headers.get('Content-Encoding') or 'identity').strip().lower()
+    return etag.startswith('"') and encoding == 'identity'
+
+
+def get_download_report():
+    """
+    Get the number of retries, resumed downloads and transferred bytes for every dataset URL downloaded so far.
+
+    Returns:
+    dict: Maps a dataset URL to a dict with the keys 'retries', 'resumes' and 'bytes'.
+    """
+    with _lock:
+        return {url: dict(stats) for url, stats in _download_report.items()}
+
+
+def _download(dataset_url, timeout, cache, max_tries=MAX_TRIES):
+    """
+    Helper function to download a dataset into a spooled temporary file.
+    Transient failures are retried with exponential backoff and jitter, respecting Retry-After headers.
+    If the connection drops during the transfer, the download is resumed with an HTTP Range request
+    instead of being restarted from the first byte, provided that it can be resumed safely (see _resumable).
+
+    Parameters:
+    dataset_url (str): URL of a dataset.
+    timeout ((int, int)): The connection and read timeout for the HTTP request in seconds.
+    cache (DownloadCache): Cache to issue a conditional request against and to store the payload in, or None.
+    max_tries (int): Maximum number of attempts before giving up.
+
+    Returns:
+    file: The payload as a binary file object positioned at the start.
+    """
+
+    session = _get_session(dataset_url)
+    conditional_headers = cache.conditional_headers(dataset_url) if cache is not None else {}
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    received = 0  # Number of bytes of the body written to the buffer so far
+    response_headers = {}
+    attempt = retries = resumes = transferred = 0
+
+    try:
+        while True:
+            if received and _resumable(response_headers):
+                # Ask only for the missing bytes, provided the dataset has not changed in the meantime.
+                # The missing bytes have to be sent without content encoding as well, so that they can be appended.
+                headers = {'Range': f'bytes={received}-', 'If-Range': response_headers['ETag'],
+                           'Accept-Encoding': 'identity'}
+            else:
+                if received:
+                    logging.warning(f"Download of {dataset_url} cannot be resumed safely, restarting download")
+                    buffer.seek(0)
+                    buffer.truncate()
+                    received = 0
+                headers = dict(conditional_headers)
+
+            try:
+                response = session.get(dataset_url, timeout=timeout, stream=True, headers=headers)
+                with response:
+                    if response.status_code == 304 and cache is not None:
+                        logging.info(f"Dataset at {dataset_url} has not been modified, serving it from the cache")
+                        buffer.close()
+                        return cache.open(dataset_url)
+
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        raise RetryableHTTPError(f"{response.status_code} Error for url: {dataset_url}",
+                                                 retry_after=_parse_retry_after(response.headers.get('Retry-After')),
+                                                 response=response)
+                    response.raise_for_status()  # Raise an exception for all other HTTP errors
+
+                    if received and response.status_code == 206:
+                        resumes += 1
+                        logging.info(f"Resuming download of {dataset_url} at byte {received}")
+                    else:
+                        if received:
+                            logging.warning(f"Server does not support resuming {dataset_url}, restarting download")
+                            buffer.seek(0)
+                            buffer.truncate()
+                            received = 0
+                        response_headers = requests.structures.CaseInsensitiveDict(response.headers)
+
+                    # Write the body chunk by chunk, so that at most SPOOL_MAX_SIZE bytes are held in memory.
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        buffer.write(chunk)
+                        received += len(chunk)
+                        transferred += len(chunk)
+                break
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError, RetryableHTTPError) as e:
+                attempt += 1
+                if attempt >= max_tries:
+                    logging.error(f"Giving up on {dataset_url} after {attempt} attempts: {e}")
+                    raise
+                delay = getattr(e, 'retry_after', None)
+                delay = _backoff_delay(attempt) if delay is None else min(delay, BACKOFF_MAX)
+                retries += 1
+                logging.warning(f"Attempt {attempt} for {dataset_url} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    except BaseException:
+        buffer.close()
+        raise
+    finally:
+        with _lock:
+            _download_report[dataset_url] = {'retries': retries, 'resumes': resumes, 'bytes': transferred}
+
+    buffer.seek(0)
+    if cache is not None:
+        with buffer:
+            cache.store(dataset_url, iter(lambda: buffer.read(CHUNK_SIZE), b''),
+                        etag=response_headers.get('ETag'), last_modified=response_headers.get('Last-Modified'))
+        return cache.open(dataset_url)
+    return buffer
+
+
+def extract_dataset(dataset_url: str, timeout: (int, int) = (None, None), is_zip: bool = False, stream: bool = False,
+                    cache=None):
     """
     Download datasets via HTTP request.
-    Retry three times, after waiting for 30s each, if unsuccessful.
+    Transient failures are retried with exponential backoff and interrupted downloads are resumed where they stopped.
 
     Parameters:
     dataset_url: (str): URL of a dataset in the csv-file format.
     timeout: (int, int): The timeout for the HTTP request in seconds. First tuple value is connection timeout, second tuple value is read timeout. Default behaviour is, that no time-out is applied
     is_zip: (bool): Flag indicating if the dataset is a zip file containing multiple CSV files.
+    stream: (bool): Flag indicating if the downloaded data is to be returned as a binary file object instead of being decoded into a string as a whole.
+    cache: (DownloadCache): Optional download cache. Cached datasets are only downloaded again if they were modified, and in offline mode they are served without any network access.
 
     Returns:
-    response: The decoded response content
+    response: The decoded response content, or a binary file object positioned at the start of the csv data if stream is set
     """
 
-    logging.info(f"Attempting to fetch data from {dataset_url}")
-    response = requests.get(dataset_url, timeout=timeout)
-    response.raise_for_status()  # Raise an exception for HTTP errors
-    logging.info(f"Successfully fetched data from {dataset_url}")
+    if cache is not None and cache.offline:
+        logging.info(f"Offline mode: serving {dataset_url} from the cache")
+        payload = cache.open(dataset_url)
+    else:
+        logging.info(f"Attempting to fetch data from {dataset_url}")
+        payload = _download(dataset_url, timeout, cache)
+        logging.info(f"Successfully fetched data from {dataset_url}")
 
     # Pick out the csv dataset file which is not metadata (as identified by file-name).
     if is_zip:
-        with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
-            csv_files = [f for f in zip_file.namelist() if f.endswith('.csv') and 'metadata' not in f.lower()]
-            if len(csv_files) == 1:  # Ensure that there is only a singular csv dataset file
-                with zip_file.open(csv_files[0]) as csv_file:
-                    return csv_file.read().decode('utf-8')
+        with payload, zipfile.ZipFile(payload) as zip_file, zip_file.open(_select_csv_member(zip_file)) as csv_file:
+            if stream:
+                # The archive member is unpacked into a spooled file of its own, so that the archive can be closed.
+                member = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+                try:
+                    shutil.copyfileobj(csv_file, member, CHUNK_SIZE)
+                except BaseException:
+                    member.close()
+                    raise
+                member.seek(0)
+                return member
+            return csv_file.read().decode('utf-8')
+
+    if stream:
+        return payload
+    with payload:
+        return payload.read().decode('utf-8')
+
+
+def _filter_chunk(df, row_filters):
+    """
+    Helper function to apply the row filters pushed down into the reader to a single chunk.
+
+    Parameters:
+    df (pd.DataFrame): The chunk to filter.
+    row_filters (dict): Maps a column name to the value or list of values of the rows to keep.
+
+    Returns:
+    pd.DataFrame: The chunk with only the matching rows.
+    """
+    if not row_filters:
+        return df
+    mask = None
+    for column_name, column_values in row_filters.items():
+        if not isinstance(column_values, list):
+            column_values = [column_values]
+        column_mask = df[column_name].isin(column_values)
+        mask = column_mask if mask is None else mask & column_mask
+    return df[mask]
+
+
+def _read_chunks(csv_data, row_filters, read_args):
+    """
+    Helper function to lazily read a csv dataset chunk by chunk, applying the row filters to every chunk.
+
+    Parameters:
+    csv_data: The dataset as a file object.
+    row_filters (dict): Maps a column name to the value or list of values of the rows to keep.
+    read_args (dict): Keyword arguments for pd.read_csv, including the chunksize.
+
+    Yields:
+    pd.DataFrame: The filtered chunks.
+    """
+    rows = 0
+    with csv_data, pd.read_csv(csv_data, **read_args) as reader:
+        for chunk in reader:
+            chunk = _filter_chunk(chunk, row_filters)
+            rows += len(chunk)
+            yield chunk
+    logging.info(f"Successfully streamed {rows} rows in chunks of {read_args['chunksize']} rows")
+
+
+def _arrow_type(dtype):
+    """
+    Helper function to convert a pandas dtype hint (e.g. str or 'category') to the corresponding Arrow type.
+
+    Parameters:
+    dtype: The dtype hint.
+
+    Returns:
+    pa.DataType: The Arrow type.
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    if dtype in (str, object, 'str', 'string', 'object'):
+        return pa.string()
+    if dtype == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _filter_table(table, row_filters):
+    """
+    Helper function to apply the row filters to an Arrow table, before it is converted to a DataFrame.
+
+    Parameters:
+    table (pa.Table): The parsed rows.
+    row_filters (dict): Maps a column name to the value or list of values of the rows to keep.
+
+    Returns:
+    pa.Table: The table with only the matching rows.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not row_filters:
+        return table
+    mask = None
+    for column_name, column_values in row_filters.items():
+        if not isinstance(column_values, list):
+            column_values = [column_values]
+        column = table[column_name]
+        value_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        column_mask = pc.is_in(column, value_set=pa.array(column_values, type=value_type))
+        mask = column_mask if mask is None else pc.and_(mask, column_mask)
+    return table.filter(mask)
+
+
+def _parse_arrow_dates(table, date_columns, date_format):
+    """
+    Helper function to convert the date columns of an Arrow table to timestamps.
+    Columns that cannot be converted completely are kept as strings and are left to
+    transformation.filter_transform_to_datetime, which coerces the invalid values.
+
+    Parameters:
+    table (pa.Table): The parsed rows, with the date columns read as strings.
+    date_columns (list): The names of the date columns.
+    date_format (str): The strftime format of the dates, or None for ISO 8601 dates.
+
+    Returns:
+    pa.Table: The table with the converted date columns.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for column_name in date_columns or []:
+        index = table.schema.get_field_index(column_name)
+        if index < 0:
+            continue
+        try:
+            column = table[column_name]
+            if date_format is None:
+                dates = pc.cast(column, pa.timestamp('us'))
             else:
-                raise ValueError(f"Expected exactly one CSV file without 'metadata' in the name, found: {csv_files}")
-    else:
-        return response.content.decode('utf-8')
+                dates = pc.strptime(column, format=date_format, unit='us')
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            logging.warning(f"Column '{column_name}' could not be parsed as dates while reading, keeping it as text: {e}")
+            continue
+        table = table.set_column(index, column_name, dates)
+    return table
 
 
-def extract_into_df(csv_data, separator=",", skiprows=0):
+def _arrow_to_df(table, date_columns, date_format, start=0):
+    """
+    Helper function to convert parsed Arrow rows to an Arrow-backed DataFrame, i.e. without copying the columns into
+    NumPy arrays. Only the date columns are converted to NumPy datetimes and dictionary columns to categories, as
+    expected by the transformation filters.
+
+    Parameters:
+    table (pa.Table): The parsed rows.
+    date_columns (list): The names of the date columns, see _parse_arrow_dates.
+    date_format (str): The strftime format of the dates.
+    start (int): The index of the first row, so that chunks are numbered like the chunks of pd.read_csv.
+
+    Returns:
+    pd.DataFrame: The DataFrame.
+    """
+    import pyarrow as pa
+
+    table = _parse_arrow_dates(table, date_columns, date_format)
+    def types_mapper(arrow_type):
+        if pa.types.is_temporal(arrow_type) or pa.types.is_dictionary(arrow_type):
+            return None  # Default conversion
+        return pd.ArrowDtype(arrow_type)
+
+    df = table.to_pandas(types_mapper=types_mapper, date_as_object=False)
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def _arrow_options(separator, skiprows, encoding, usecols, dtype, date_columns):
+    """
+    Helper function to translate the arguments of extract_into_df into options of the Arrow CSV reader.
+
+    Parameters:
+    See extract_into_df.
+
+    Returns:
+    dict: Keyword arguments for pyarrow.csv.read_csv and pyarrow.csv.open_csv.
+    """
+    import pyarrow.csv as pa_csv
+
+    column_types = {column: _arrow_type(column_dtype) for column, column_dtype in (dtype or {}).items()}
+    # Dates are read as strings and converted afterwards, so that invalid dates do not fail the whole dataset
+    column_types.update({column: _arrow_type(str) for column in date_columns or []})
+    return {
+        'read_options': pa_csv.ReadOptions(skip_rows=skiprows, encoding=encoding, use_threads=True,
+                                           block_size=ARROW_BLOCK_SIZE),
+        'parse_options': pa_csv.ParseOptions(delimiter=separator),
+        'convert_options': pa_csv.ConvertOptions(include_columns=usecols, column_types=column_types,
+                                                 strings_can_be_null=True),
+    }
+
+
+def _read_arrow_chunks(csv_data, row_filters, chunksize, options, date_columns, date_format):
+    """
+    Helper function to lazily read a csv dataset with the Arrow CSV reader, in chunks of the given number of rows.
+    Only the types of the first block are inferred, so the columns whose type could change between blocks should be
+    given explicitly via the dtype hints.
+
+    Parameters:
+    csv_data: The dataset as a file object.
+    row_filters (dict): Maps a column name to the value or list of values of the rows to keep.
+    chunksize (int): The number of rows per chunk.
+    options (dict): The reader options, see _arrow_options.
+    date_columns (list): The names of the date columns, see _parse_arrow_dates.
+    date_format (str): The strftime format of the dates.
+
+    Yields:
+    pd.DataFrame: The filtered chunks.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    rows = 0
+    pending, pending_rows = [], 0  # Filtered rows that do not fill a chunk yet
+    with csv_data:
+        for batch in pa_csv.open_csv(csv_data, **options):
+            table = _filter_table(pa.Table.from_batches([batch]), row_filters)
+            pending.append(table)
+            pending_rows += table.num_rows
+            if pending_rows < chunksize:
+                continue
+            table = pa.concat_tables(pending)
+            offset = 0
+            while table.num_rows - offset >= chunksize:
+                yield _arrow_to_df(table.slice(offset, chunksize), date_columns, date_format, start=rows)
+                rows += chunksize
+                offset += chunksize
+            pending, pending_rows = [table.slice(offset)], table.num_rows - offset
+        if pending_rows:
+            yield _arrow_to_df(pa.concat_tables(pending), date_columns, date_format, start=rows)
+            rows += pending_rows
+    logging.info(f"Successfully streamed {rows} rows in chunks of {chunksize} rows")
+
+
+def _extract_into_df_arrow(csv_data, separator, skiprows, encoding, usecols, dtype, row_filters, chunksize,
+                           date_columns, date_format):
+    """
+    Helper function to load a csv dataset with the multithreaded Arrow CSV reader, see extract_into_df.
+
+    Parameters:
+    See extract_into_df.
+
+    Returns:
+    pd.DataFrame: The resulting Arrow-backed DataFrame, or an iterator over the filtered chunks if chunksize is given
+    """
+    import pyarrow.csv as pa_csv
+
+    if isinstance(csv_data, str):
+        # The payload was already decoded, the reader needs the bytes
+        csv_data, encoding = io.BytesIO(csv_data.encode('utf-8')), 'utf-8'
+    options = _arrow_options(separator, skiprows, encoding, usecols, dtype, date_columns)
+
+    if chunksize is not None:
+        return _read_arrow_chunks(csv_data, row_filters, chunksize, options, date_columns, date_format)
+
+    with csv_data:
+        table = pa_csv.read_csv(csv_data, **options)
+    # Filter before converting, so that only the matching rows are converted to a DataFrame
+    df = _arrow_to_df(_filter_table(table, row_filters), date_columns, date_format)
+    logging.info(f"Successfully loaded data into DataFrame with {len(df)} rows")
+    return df
+
+
+def extract_into_df(csv_data, separator=",", skiprows=0, encoding='utf-8', usecols=None, dtype=None, row_filters=None,
+                    chunksize=None, date_columns=None, date_format=None, engine='c'):
     """
     Load a csv dataset into a pandas dataframe for further transformation.
+    Column selections, dtypes and row filters are pushed down into the reader, so that columns and rows that are not
+    needed are never materialized.
+    With the 'pyarrow' engine, the dataset is parsed by the Arrow CSV reader in blocks on multiple threads, directly
+    from the downloaded bytes, and the columns are kept in Arrow memory (pd.ArrowDtype) instead of NumPy arrays.
 
     Parameters:
-    csv_data: Dataset in CSV format as provided by extract_dataset_function.
+    csv_data: Dataset in CSV format as provided by extract_dataset_function, either as a string or as a binary file object.
     separator: The CSV value separator for this file
     skiprows: The number of rows of metadata that are to be skipped at the beginning of the file
+    encoding: The encoding of the dataset, if it is provided as a binary file object
+    usecols: List of the columns to read. Default behaviour is to read all columns.
+    dtype: Dict mapping column names to their dtypes, which spares pandas the type inference for these columns.
+    row_filters: Dict mapping a column name to the value or list of values of the rows to keep. The columns have to be part of usecols.
+    chunksize: If given, the dataset is read lazily and an iterator over DataFrames of this many rows is returned.
+    date_columns: List of the columns to parse as dates while reading. Columns that cannot be parsed are kept as text.
+    date_format: The strftime format of the date columns. Default behaviour is to expect ISO 8601 dates.
+    engine: The parsing engine, see ENGINES. With the 'pyarrow' engine the columns are returned in the order of usecols.
 
     Returns:
-    pd.DataFrame: The resulting DataFrame
+    pd.DataFrame: The resulting DataFrame, or an iterator over the filtered chunks if chunksize is given
     """
 
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown parsing engine '{engine}', expected one of {ENGINES}")
+
     try:
-        logging.info(f"Attempting to load data into DataFrame")
-        # df = pd.read_csv(io.StringIO(csv_data.content.decode('utf-8')), sep=separator)
-        df = pd.read_csv(io.StringIO(csv_data), sep=separator, skiprows=skiprows)
+        logging.info(f"Attempting to load data into DataFrame with the '{engine}' engine")
+        if engine == 'pyarrow':
+            return _extract_into_df_arrow(csv_data, separator, skiprows, encoding, usecols, dtype, row_filters,
+                                          chunksize, date_columns, date_format)
+        if isinstance(csv_data, str):
+            csv_data = io.StringIO(csv_data)
+        read_args = {'sep': separator, 'skiprows': skiprows, 'usecols': usecols, 'dtype': dtype}
+        if date_columns:
+            read_args.update(parse_dates=date_columns, date_format=date_format)
+        if not isinstance(csv_data, io.StringIO):
+            # Let pandas decode the streamed file directly instead of materializing the decoded string.
+            read_args['encoding'] = encoding
+
+        if chunksize is not None:
+            return _read_chunks(csv_data, row_filters, {**read_args, 'chunksize': chunksize})
+
+        if row_filters:
+            # Filter while reading, so that only the matching rows are held in memory
+            chunks = list(_read_chunks(csv_data, row_filters, {**read_args, 'chunksize': FILTER_CHUNK_SIZE}))
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=usecols)
+        else:
+            with csv_data:
+                df = pd.read_csv(csv_data, **read_args)
         logging.info(f"Successfully loaded data into DataFrame with {len(df)} rows")
         return df
     except requests.exceptions.RequestException as e:
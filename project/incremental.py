@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import pandas as pd
+
+class HighWaterMarks:
+    """
+    Persistent per-dataset high-water marks for incremental pipeline runs.
+
+    The high-water mark of a dataset is the latest date already loaded into its output, e.g. the latest death date.
+    An incremental run only transforms and appends the rows after the mark and then advances the mark.
+    The marks are stored as ISO 8601 strings in a JSON file, which is rewritten atomically on every update.
+    """
+
+    def __init__(self, state_path='../data/high_water_marks.json'):
+        """
+        Parameters:
+        state_path (str): Path of the JSON file the marks are stored in.
+        """
+        self.state_path = state_path
+        self._lock = threading.Lock()  # The datasets are loaded concurrently
+        self._marks = self._read()
+
+    def _read(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r') as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError) as e:
+            # Without marks every dataset is loaded completely again, which is slow but never loses or duplicates rows
+            logging.warning(f"High-water marks '{self.state_path}' could not be read, starting without marks: {e}")
+            return {}
+
+    def _write(self):
+        # Must hold the lock
+        directory = os.path.dirname(self.state_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as state_file:
+            json.dump(self._marks, state_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.state_path)
+
+    def get(self, dataset):
+        """
+        Get the high-water mark of a dataset.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+
+        Returns:
+        pd.Timestamp: The high-water mark, or None if the dataset has not been loaded incrementally before.
+        """
+        with self._lock:
+            mark = self._marks.get(dataset)
+        return pd.Timestamp(mark) if mark is not None else None
+
+    def set(self, dataset, mark):
+        """
+        Set the high-water mark of a dataset and persist all marks.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        mark: The new high-water mark, as a pd.Timestamp or a date string. None removes the mark.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            if mark is None or pd.isna(mark):
+                self._marks.pop(dataset, None)
+            else:
+                self._marks[dataset] = pd.Timestamp(mark).isoformat()
+            self._write()
+        logging.info(f"High-water mark of dataset '{dataset}' set to {mark}")
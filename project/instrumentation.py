@@ -0,0 +1,273 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import pandas as pd
+
+# From Python 3.12 on, cProfile observes all threads of the process and only one profiler can be active at a time.
+# Before, a profiler only observes the thread that enabled it.
+PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+def _peak_rss():
+    """
+    Helper function to get the peak resident set size of the process so far.
+
+    Returns:
+    int: The peak RSS in bytes, or None if it cannot be determined on this platform.
+    """
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Reported in bytes on macOS, in kilobytes on Linux
+
+
+def _shape(obj):
+    """
+    Helper function to get the number of rows and columns of a DataFrame.
+
+    Parameters:
+    obj: Any object, e.g. the input or output of a pipeline step.
+
+    Returns:
+    (int, int): Rows and columns, or (None, None) if obj is not a DataFrame (e.g. a lazy iterator over chunks).
+    """
+    if isinstance(obj, pd.DataFrame):
+        return obj.shape
+    return None, None
+
+
+def _memory(obj):
+    """
+    Helper function to get the memory held by a DataFrame.
+    Only the memory of the column buffers is counted, which is exact for numeric, category and (pyarrow backed) string
+    columns, while the Python objects referenced by object columns are not counted, as this would be slow.
+
+    Parameters:
+    obj: Any object, e.g. the input or output of a pipeline step.
+
+    Returns:
+    int: The memory in bytes, or None if obj is not a DataFrame.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=False).sum())
+    return None
+
+
+class RunReport:
+    """
+    Collects wall time, transferred bytes, row/column counts and DataFrame memory for every step of every dataset in a
+    pipeline run, the peak RSS of the run, and optionally a cProfile and tracemalloc profile of the whole run.
+
+    Steps that are called several times, e.g. a filter applied to every chunk of a chunked dataset, are accumulated
+    into a single record. The peak RSS is only recorded for the whole run, as the peak of the process cannot be
+    attributed to a step while the datasets are processed concurrently.
+
+    Steps can be nested, e.g. the filters of a chunked dataset run lazily within its load step. With Python 3.12 and
+    later, a single profiler observes all threads for the whole run. Before, every thread has its own profiler, which
+    is enabled by the outermost measured step of the thread.
+    """
+
+    def __init__(self, profile=False):
+        """
+        Parameters:
+        profile (bool): Flag indicating if the steps are to be profiled with cProfile and tracemalloc.
+        """
+        self.started = datetime.now(timezone.utc)
+        self.profile = profile
+        self._start_time = time.perf_counter()
+        self._records = {}
+        self._profiles = []
+        self._profiler = None  # The profiler of the whole run, see PROFILE_ALL_THREADS
+        self._local = threading.local()  # Whether a step of the current thread is being profiled
+        self._lock = threading.Lock()  # Steps of different datasets report from different worker threads
+
+        if self.profile and PROFILE_ALL_THREADS:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError as e:  # Another profiler, e.g. of a debugger or coverage tool, is already active
+                logging.warning(f"The run cannot be profiled with cProfile: {e}")
+                self._profiler = None
+            else:
+                self._profiles.append(self._profiler)
+        if self.profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _record(self, dataset, step):
+        # Must hold the lock
+        key = (dataset, step)
+        if key not in self._records:
+            self._records[key] = {'dataset': dataset, 'step': step, 'calls': 0, 'wall_time': 0.0,
+                                  'rows_in': None, 'columns_in': None,
+                                  'rows_out': None, 'columns_out': None, 'memory_in': None, 'memory_out': None}
+        return self._records[key]
+
+    def add(self, dataset, step, **values):
+        """
+        Add further values, e.g. the number of transferred bytes, to the record of a step.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        step (str): The name of the step.
+        values: The values to add to the record.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._record(dataset, step).update(values)
+
+    def measure(self, dataset, step, func, *args, **kwargs):
+        """
+        Call a function and record its wall time and the shape and memory of its first argument and result.
+        When profiling with one profiler per thread, the function is profiled unless an enclosing step of the same
+        thread is already being profiled.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        step (str): The name of the step.
+        func (callable): The function to call.
+        args, kwargs: The arguments of the function.
+
+        Returns:
+        The result of the function.
+        """
+        rows_in, columns_in = _shape(args[0]) if args else (None, None)
+        memory_in = _memory(args[0]) if args else None
+        profiler = None
+        if self.profile and not PROFILE_ALL_THREADS and not getattr(self._local, 'profiling', False):
+            profiler = cProfile.Profile()
+            self._local.profiling = True
+            profiler.enable()
+        start = time.perf_counter()
+
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            wall_time = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._local.profiling = False
+
+            with self._lock:
+                record = self._record(dataset, step)
+                record['calls'] += 1
+                record['wall_time'] += wall_time
+                if profiler is not None:
+                    self._profiles.append(profiler)
+
+        rows_out, columns_out = _shape(result)
+        memory_out = _memory(result)
+        with self._lock:
+            record = self._record(dataset, step)
+            for key, value in (('rows_in', rows_in), ('rows_out', rows_out), ('memory_in', memory_in),
+                               ('memory_out', memory_out)):
+                if value is not None:
+                    record[key] = (record[key] or 0) + value  # Summed up over all chunks
+            for key, value in (('columns_in', columns_in), ('columns_out', columns_out)):
+                if value is not None:
+                    record[key] = value
+        return result
+
+    def wrap(self, dataset, step, func):
+        """
+        Wrap a function, so that every call of it is measured.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        step (str): The name of the step.
+        func (callable): The function to wrap.
+
+        Returns:
+        callable: The wrapped function.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.measure(dataset, step, func, *args, **kwargs)
+        return wrapper
+
+    def wrap_filters(self, dataset, filters):
+        """
+        Wrap every filter of a filter chain (see transformation.apply_filters), so that each filter is measured separately.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        filters (list): Ordered list of (filter function, keyword arguments) tuples.
+
+        Returns:
+        list: The filter chain with wrapped filter functions.
+        """
+        return [(self.wrap(dataset, f"transform.{i}.{getattr(func, '__name__', 'filter')}", func), filter_args)
+                for i, (func, filter_args) in enumerate(filters)]
+
+    def to_dict(self):
+        """
+        Get the report as a JSON serializable dict.
+
+        Returns:
+        dict: The start time, total duration, peak RSS of the process in bytes and the records of all steps.
+        """
+        with self._lock:
+            steps = [dict(record) for record in self._records.values()]
+        for record in steps:
+            record['wall_time'] = round(record['wall_time'], 4)
+        return {
+            'started': self.started.isoformat(),
+            'duration': round(time.perf_counter() - self._start_time, 4),
+            'peak_rss': _peak_rss(),
+            'steps': steps,
+        }
+
+    def write(self, path):
+        """
+        Write the report as JSON, together with the profiles if profiling is enabled. The profiler of the whole run is
+        stopped, so the report is written once at the end of the run.
+        The cProfile statistics are stored next to the report with the ending '.prof' (readable with pstats or
+        snakeviz) and the largest memory allocations as traced by tracemalloc with the ending '.tracemalloc.txt'.
+
+        Parameters:
+        path (str): The path of the JSON report.
+
+        Returns:
+        None
+        """
+        try:
+            directory = os.path.dirname(path) or '.'
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as report_file:
+                json.dump(self.to_dict(), report_file, indent=2, default=str)
+            os.replace(temp_path, path)
+            logging.info(f"Run report saved to {path}")
+
+            if self.profile:
+                if self._profiler is not None:
+                    self._profiler.disable()
+                base_path = os.path.splitext(path)[0]
+                with self._lock:
+                    profiles = list(self._profiles)
+                if profiles:
+                    stats = pstats.Stats(profiles[0])
+                    for profiler in profiles[1:]:
+                        stats.add(profiler)
+                    stats.dump_stats(base_path + '.prof')
+
+                if tracemalloc.is_tracing():
+                    snapshot = tracemalloc.take_snapshot()
+                    current, peak = tracemalloc.get_traced_memory()
+                    with open(base_path + '.tracemalloc.txt', 'w') as trace_file:
+                        trace_file.write(f"Traced memory: current {current} bytes, peak {peak} bytes\n")
+                        for statistic in snapshot.statistics('lineno')[:25]:
+                            trace_file.write(f"{statistic}\n")
+                logging.info(f"Profiles saved next to {path}")
+        except Exception as e:
+            logging.error(f"Unexpected error while saving the run report to {path}: {e}")
@@ -1,40 +1,614 @@
+import gzip
 import logging
 import os
+import sqlite3
+import uuid
+import pandas as pd
 
-def load_df_to_csv(df, file_name, file_path='../data/', overwrite=False):
+# Name of the SQLite database file in the data folder, which holds one table per dataset.
+SQLITE_DB_NAME = 'covid_mortality.sqlite'
+# Compression level of gzipped CSV files, trading a little compression ratio for speed.
+CSV_GZIP_LEVEL = 6
+
+def _string_columns(df):
     """
-    Save a DataFrame to a CSV file.
+    Helper function to convert non-string column names (e.g. the date columns of the Mexico dataset) into strings,
+    as required by the columnar file formats.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to be written.
+
+    Returns:
+    pd.DataFrame: The DataFrame with string column names.
+    """
+    if all(isinstance(col, str) for col in df.columns):
+        return df
+    return df.rename(columns=str)
+
+
+def _temp_file(file_path, file_name):
+    """
+    Helper function to create the temporary file an output is written to before it is renamed into place.
+    Unlike tempfile.mkstemp, which creates files readable by the owner only, the file is created with the permissions
+    of a file created by open(), i.e. as restricted by the umask of the process.
+
+    Parameters:
+    file_path (str): The folder of the output.
+    file_name (str): The name of the output.
+
+    Returns:
+    str: The path of the temporary file.
+    """
+    while True:
+        temp_path = os.path.join(file_path, f'.{file_name}{uuid.uuid4().hex[:8]}.tmp')
+        try:
+            os.close(os.open(temp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+        except FileExistsError:
+            continue  # Name taken by a concurrent write, try another one
+        return temp_path
+
+
+def _write_csv(df, path, compression):
+    df.to_csv(path, index=False, compression=compression)
+
+
+def _write_csv_gzip(df, path, compression):
+    df.to_csv(path, index=False, compression={'method': 'gzip', 'compresslevel': CSV_GZIP_LEVEL, 'mtime': 0})
+
+
+def _gzip_member(df, header=True):
+    """
+    Helper function to serialize a DataFrame into a gzip member of a CSV file. A gzipped CSV file can be extended by
+    appending members, as gzip readers decompress consecutive members as one stream.
+
+    Parameters:
+    df (pd.DataFrame): The rows to serialize.
+    header (bool): Flag indicating if the header line is written.
+
+    Returns:
+    bytes: The compressed member.
+    """
+    return gzip.compress(df.to_csv(index=False, header=header).encode('utf-8'), compresslevel=CSV_GZIP_LEVEL, mtime=0)
+
+
+def _write_parquet(df, path, compression):
+    _string_columns(df).to_parquet(path, index=False, compression=compression or 'snappy')
+
+
+def _chunk_schema(schema):
+    """
+    Helper function to derive the Parquet schema of a dataset loaded in chunks from the schema of its first chunk.
+    Numbers are widened to 64 bit and categories to dictionaries with 32 bit indices, so that chunks whose dtypes
+    were optimized differently (see transformation.filter_optimize_dtypes) can all be cast to the same schema.
+
+    Parameters:
+    schema (pa.Schema): The Arrow schema of the first chunk.
+
+    Returns:
+    pa.Schema: The schema of the Parquet file.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for field in schema:
+        if pa.types.is_signed_integer(field.type) or pa.types.is_unsigned_integer(field.type):
+            field = field.with_type(pa.int64())
+        elif pa.types.is_floating(field.type):
+            field = field.with_type(pa.float64())
+        elif pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _write_feather(df, path, compression):
+    _string_columns(df).reset_index(drop=True).to_feather(path, compression=compression or 'lz4')
+
+
+# Supported output formats, each with its file ending and writer function.
+# 'csv.gz' is a gzipped CSV file, which pandas and most other tools read transparently.
+# Parquet and Feather (Arrow IPC) preserve the dtypes of the DataFrame and require the pyarrow package.
+# The 'sqlite' format is not a file per dataset, but a table in the shared SQLite database, see load_df_to_sqlite.
+FORMATS = {
+    'csv': ('.csv', _write_csv),
+    'csv.gz': ('.csv.gz', _write_csv_gzip),
+    'parquet': ('.parquet', _write_parquet),
+    'feather': ('.feather', _write_feather),
+    'sqlite': (None, None),
+}
+
+
+def load_df(df, file_name, file_path='../data/', overwrite=False, file_format='csv', compression=None, **sqlite_args):
+    """
+    Save a DataFrame to a file in the given format.
+    The file is first written to a temporary file in the target directory and then renamed, so that readers never
+    see a partially written file.
+    For the 'sqlite' format the DataFrame is written to the table file_name of the SQLite database in file_path instead.
 
     Parameters:
     df (pd.DataFrame): The DataFrame to save.
-    file_path (str): The path where the CSV file will be saved. The default path is that to the local /data/ folder, as required by the project specifications.
-    file_name (str): The name of the file to be stored, excluding the file ending, which is hardcoded as '.csv'
+    file_name (str): The name of the file to be stored, excluding the file ending, which is determined by the file format.
+    file_path (str): The path where the file will be saved. The default path is that to the local /data/ folder, as required by the project specifications.
     overwrite (bool): Flag to allow overwriting of existing files.
+    file_format (str): The output format, one of 'csv', 'csv.gz', 'parquet', 'feather' or 'sqlite'.
+    compression (str): The compression codec, e.g. 'snappy', 'zstd' or 'gzip' for Parquet and 'lz4' or 'zstd' for Feather. Default behaviour is the default codec of the format.
+    sqlite_args: Further keyword arguments for load_df_to_sqlite, e.g. if_exists, key_columns and index_columns.
 
     Returns:
-    None
+    bool: True if the DataFrame was saved, False otherwise.
     """
 
+    if file_format not in FORMATS:
+        logging.error(f"Unsupported file format '{file_format}'. Supported formats are: {list(FORMATS)}")
+        return False
+
     if not file_path:  # Check if file_path is an empty string
         file_path = './'  # Default to current working directory
 
-    full_path = os.path.join(file_path, file_name + '.csv')
+    if file_format == 'sqlite':
+        sqlite_args.setdefault('if_exists', 'replace' if overwrite else 'fail')
+        return load_df_to_sqlite(df, table_name=file_name, db_path=os.path.join(file_path, SQLITE_DB_NAME),
+                                 **sqlite_args)
+
+    file_ending, writer = FORMATS[file_format]
+    full_path = os.path.join(file_path, file_name + file_ending)
 
     # Check if the file already exists
     if os.path.exists(full_path):
         if not overwrite:
             logging.error(
                 f"File '{full_path}' already exists. Set overwrite-flag to True in order to perform this action")
-            return
+            return False
         else:
             logging.warning(f"File '{full_path}' is being overwritten as the overwrite-flag is set to True")
 
+    temp_path = None
     try:
-        df.to_csv(full_path, index=False)
+        temp_path = _temp_file(file_path, file_name)
+        writer(df, temp_path, compression)
+        os.replace(temp_path, full_path)
+        temp_path = None
         logging.info(f"DataFrame successfully saved to {full_path}")
+        return True
+    except ImportError as e:
+        logging.error(f"The '{file_format}' format requires the pyarrow package, DataFrame not saved to {full_path}: {e}")
+    except PermissionError as e:
+        logging.error(f"Permission error while trying to save the DataFrame to {full_path}: {e}")
+    except FileNotFoundError as e:
+        logging.error(f"File not found error while trying to save the DataFrame to {full_path}: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error while saving the DataFrame to {full_path}: {e}")
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    return False
+
+
+def load_chunks(chunks, file_name, file_path='../data/', overwrite=False, file_format='csv', compression=None,
+                **sqlite_args):
+    """
+    Save a stream of DataFrame chunks, e.g. as produced by extraction.extract_into_df with a chunksize, as one dataset.
+    Every chunk is appended to the output as soon as it arrives, so that only one chunk is held in memory at a time.
+    Like load_df, the file is written to a temporary file first and only renamed once all chunks have been written.
+
+    Parameters:
+    chunks (iterable): The DataFrame chunks, all with the same columns.
+    file_name (str): The name of the file to be stored, excluding the file ending, which is determined by the file format.
+    file_path (str): The path where the file will be saved. The default path is that to the local /data/ folder, as required by the project specifications.
+    overwrite (bool): Flag to allow overwriting of existing files.
+    file_format (str): The output format, one of 'csv', 'csv.gz', 'parquet' or 'sqlite'. Feather does not support appending.
+    compression (str): The compression codec for the Parquet format. Default behaviour is 'snappy'.
+    sqlite_args: Further keyword arguments for load_df_to_sqlite. The if_exists behaviour applies to the table as a whole.
+
+    Returns:
+    bool: True if all chunks were saved, False otherwise.
+    """
+
+    if file_format not in ('csv', 'csv.gz', 'parquet', 'sqlite'):
+        logging.error(f"File format '{file_format}' does not support loading in chunks")
+        return False
+
+    if not file_path:  # Check if file_path is an empty string
+        file_path = './'  # Default to current working directory
+
+    if file_format == 'sqlite':
+        # All chunks are loaded in one transaction, so that the table is either loaded completely or left untouched
+        sqlite_args.setdefault('if_exists', 'replace' if overwrite else 'fail')
+        return _load_chunks_to_sqlite(chunks, table_name=file_name, db_path=os.path.join(file_path, SQLITE_DB_NAME),
+                                      **sqlite_args)
+
+    full_path = os.path.join(file_path, file_name + FORMATS[file_format][0])
+
+    # Check if the file already exists
+    if os.path.exists(full_path):
+        if not overwrite:
+            logging.error(
+                f"File '{full_path}' already exists. Set overwrite-flag to True in order to perform this action")
+            return False
+        else:
+            logging.warning(f"File '{full_path}' is being overwritten as the overwrite-flag is set to True")
+
+    temp_path = None
+    writer = None
+    rows = 0
+    try:
+        temp_path = _temp_file(file_path, file_name)
+        for i, chunk in enumerate(chunks):
+            if file_format == 'csv':
+                # Only the first chunk writes the header line
+                chunk.to_csv(temp_path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+            elif file_format == 'csv.gz':
+                # Every chunk becomes a gzip member of its own, the members are read back as one stream
+                with open(temp_path, 'wb' if i == 0 else 'ab') as csv_file:
+                    csv_file.write(_gzip_member(chunk, header=i == 0))
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(_string_columns(chunk), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(temp_path, _chunk_schema(table.schema), compression=compression or 'snappy')
+                writer.write_table(table.cast(writer.schema))  # Each chunk becomes a row group
+            rows += len(chunk)
+        if writer is not None:
+            writer.close()
+            writer = None
+        os.replace(temp_path, full_path)
+        temp_path = None
+        logging.info(f"{rows} rows successfully saved to {full_path} in chunks")
+        return True
+    except ImportError as e:
+        logging.error(f"The '{file_format}' format requires the pyarrow package, DataFrame not saved to {full_path}: {e}")
     except PermissionError as e:
         logging.error(f"Permission error while trying to save the DataFrame to {full_path}: {e}")
     except FileNotFoundError as e:
         logging.error(f"File not found error while trying to save the DataFrame to {full_path}: {e}")
     except Exception as e:
         logging.error(f"Unexpected error while saving the DataFrame to {full_path}: {e}")
+    finally:
+        if writer is not None:
+            writer.close()
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    return False
+
+
+def output_exists(file_name, file_path='../data/', file_format='csv'):
+    """
+    Check if the output of a dataset, i.e. its file or its table in the SQLite database, already exists.
+
+    Parameters:
+    file_name (str): The name of the file or table, excluding the file ending.
+    file_path (str): The path of the output folder.
+    file_format (str): The output format, one of 'csv', 'csv.gz', 'parquet', 'feather' or 'sqlite'.
+
+    Returns:
+    bool: True if the output exists.
+    """
+
+    file_path = file_path or './'
+    if file_format == 'sqlite':
+        db_path = os.path.join(file_path, SQLITE_DB_NAME)
+        if not os.path.exists(db_path):
+            return False
+        connection = sqlite3.connect(db_path)
+        try:
+            return connection.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                                      (file_name,)).fetchone() is not None
+        finally:
+            connection.close()
+    return os.path.exists(os.path.join(file_path, file_name + FORMATS[file_format][0]))
+
+
+def read_df(file_name, file_path='../data/', file_format='csv', date_columns=None):
+    """
+    Read the output of a dataset, i.e. its file or its table in the SQLite database, back into a DataFrame.
+
+    Parameters:
+    file_name (str): The name of the file or table, excluding the file ending.
+    file_path (str): The path of the output folder.
+    file_format (str): The output format, one of 'csv', 'csv.gz', 'parquet', 'feather' or 'sqlite'.
+    date_columns (list): Columns to parse as dates, as CSV files and SQLite tables store dates as strings.
+
+    Returns:
+    pd.DataFrame: The loaded DataFrame, or None if the output does not exist or cannot be read.
+    """
+
+    file_path = file_path or './'
+    if file_format not in FORMATS or not output_exists(file_name, file_path, file_format):
+        return None
+
+    try:
+        if file_format == 'sqlite':
+            connection = sqlite3.connect(os.path.join(file_path, SQLITE_DB_NAME))
+            try:
+                df = pd.read_sql(f'SELECT * FROM {_quote(file_name)}', connection)
+            finally:
+                connection.close()
+        else:
+            full_path = os.path.join(file_path, file_name + FORMATS[file_format][0])
+            reader = {'csv': pd.read_csv, 'csv.gz': pd.read_csv, 'parquet': pd.read_parquet,
+                      'feather': pd.read_feather}[file_format]
+            df = reader(full_path)
+        for col in date_columns or []:
+            df[col] = pd.to_datetime(df[col])
+        return df
+    except ImportError as e:
+        logging.error(f"The '{file_format}' format requires the pyarrow package, '{file_name}' not read: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error while reading '{file_name}' from {file_path}: {e}")
+    return None
+
+
+def append_df(df, file_name, file_path='../data/', file_format='csv', compression=None, **sqlite_args):
+    """
+    Append the rows of a DataFrame to the existing output of a dataset, e.g. the new rows of an incremental run.
+    The append is atomic: either all rows are added or the output is left unchanged.
+    - CSV files are appended in place, so that the cost is proportional to the new rows. If writing fails, the file is
+      truncated back to its previous size. The columns are written in the order of the existing header.
+      Gzipped CSV files are appended to with a new gzip member.
+    - Parquet and Feather files cannot be appended to, so they are read, extended and rewritten via load_df.
+    - SQLite tables are appended to (or upserted into, if the table is configured for upserts) in one transaction.
+    If the output does not exist yet, it is created via load_df.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame with the rows to append.
+    file_name (str): The name of the file or table, excluding the file ending.
+    file_path (str): The path of the output folder.
+    file_format (str): The output format, one of 'csv', 'csv.gz', 'parquet', 'feather' or 'sqlite'.
+    compression (str): The compression codec for the Parquet and Feather formats.
+    sqlite_args: Further keyword arguments for load_df_to_sqlite, e.g. key_columns and index_columns.
+
+    Returns:
+    bool: True if the rows were saved, False otherwise.
+    """
+
+    if file_format not in FORMATS:
+        logging.error(f"Unsupported file format '{file_format}'. Supported formats are: {list(FORMATS)}")
+        return False
+
+    file_path = file_path or './'
+    if not output_exists(file_name, file_path, file_format):
+        return load_df(df, file_name, file_path=file_path, file_format=file_format, compression=compression,
+                       **sqlite_args)
+    if len(df) == 0:
+        logging.info(f"No new rows to append to '{file_name}'")
+        return True
+
+    if file_format == 'sqlite':
+        sqlite_args['if_exists'] = 'upsert' if sqlite_args.get('if_exists') == 'upsert' else 'append'
+        return load_df_to_sqlite(df, table_name=file_name, db_path=os.path.join(file_path, SQLITE_DB_NAME),
+                                 **sqlite_args)
+
+    full_path = os.path.join(file_path, file_name + FORMATS[file_format][0])
+    try:
+        if file_format not in ('csv', 'csv.gz'):
+            reader = pd.read_parquet if file_format == 'parquet' else pd.read_feather
+            existing = reader(full_path)
+            return load_df(pd.concat([existing, _string_columns(df)], ignore_index=True), file_name,
+                           file_path=file_path, overwrite=True, file_format=file_format, compression=compression)
+
+        header = pd.read_csv(full_path, nrows=0).columns.tolist()
+        df = _string_columns(df)
+        if sorted(header) != sorted(df.columns):
+            logging.error(f"The columns {list(df.columns)} do not match the columns {header} of '{full_path}'")
+            return False
+
+        size = os.path.getsize(full_path)
+        with open(full_path, 'r+b') as csv_file:
+            try:
+                if file_format == 'csv.gz':
+                    # The previous members end with a line break, as written by pandas
+                    csv_file.seek(size)
+                    csv_file.write(_gzip_member(df[header], header=False))
+                else:
+                    if size > 0:
+                        csv_file.seek(size - 1)
+                        if csv_file.read(1) != b'\n':  # Make sure the new rows start on a line of their own
+                            csv_file.write(b'\n')
+                    csv_file.write(df[header].to_csv(index=False, header=False).encode('utf-8'))
+                csv_file.flush()
+                os.fsync(csv_file.fileno())
+            except BaseException:
+                csv_file.truncate(size)
+                raise
+        logging.info(f"{len(df)} rows successfully appended to {full_path}")
+        return True
+    except ImportError as e:
+        logging.error(f"The '{file_format}' format requires the pyarrow package, rows not appended to {full_path}: {e}")
+    except PermissionError as e:
+        logging.error(f"Permission error while trying to append the rows to {full_path}: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error while appending the rows to {full_path}: {e}")
+    return False
+
+
+def load_df_to_csv(df, file_name, file_path='../data/', overwrite=False):
+    """
+    Save a DataFrame to a CSV file.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to save.
+    file_path (str): The path where the CSV file will be saved. The default path is that to the local /data/ folder, as required by the project specifications.
+    file_name (str): The name of the file to be stored, excluding the file ending, which is hardcoded as '.csv'
+    overwrite (bool): Flag to allow overwriting of existing files.
+
+    Returns:
+    bool: True if the DataFrame was saved, False otherwise.
+    """
+
+    return load_df(df, file_name, file_path=file_path, overwrite=overwrite, file_format='csv')
+
+
+def _sqlite_type(dtype):
+    """
+    Helper function to map a pandas dtype to the SQLite column type.
+
+    Parameters:
+    dtype: The dtype of a DataFrame column.
+
+    Returns:
+    str: The SQLite column type.
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'  # Dates are stored as ISO 8601 strings, which SQLite's date functions understand
+
+
+def _sqlite_values(series):
+    """
+    Helper function to convert a column into a list of values that can be bound by sqlite3, with None for missing values.
+
+    Parameters:
+    series (pd.Series): The column to convert.
+
+    Returns:
+    list: The converted values.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Store days without a time component, as produced by the date transformation, as plain dates
+        values = series.dt.strftime('%Y-%m-%d' if (series.dropna().dt.normalize() == series.dropna()).all()
+                                    else '%Y-%m-%d %H:%M:%S')
+    else:
+        values = series
+    values = values.astype(object)
+    return values.where(values.notna(), None).tolist()
+
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def load_df_to_sqlite(df, table_name, db_path='../data/' + SQLITE_DB_NAME, if_exists='fail', key_columns=None,
+                      index_columns=None, batch_size=50000):
+    """
+    Save a DataFrame to a typed table of a SQLite database.
+    Rows are inserted in batches via executemany inside a single transaction, with the database in WAL mode.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to save.
+    table_name (str): The name of the table.
+    db_path (str): The path of the SQLite database file. The default path is that to the local /data/ folder.
+    if_exists (str): Behaviour if the table already exists:
+                     'fail' leaves the table untouched, 'replace' drops and recreates it, 'append' adds the rows and
+                     'upsert' inserts new rows and updates rows whose key_columns already exist.
+    key_columns (list): Columns that uniquely identify a row, required for 'upsert'. A unique index is created on them.
+    index_columns (list): Columns to create an index on, e.g. the date and country columns used in the analysis.
+    batch_size (int): Number of rows passed to each executemany call.
+
+    Returns:
+    bool: True if the DataFrame was saved, False otherwise.
+    """
+
+    return _load_chunks_to_sqlite([df], table_name, db_path=db_path, if_exists=if_exists, key_columns=key_columns,
+                                  index_columns=index_columns, batch_size=batch_size)
+
+
+def _load_chunks_to_sqlite(chunks, table_name, db_path='../data/' + SQLITE_DB_NAME, if_exists='fail', key_columns=None,
+                           index_columns=None, batch_size=50000):
+    """
+    Helper function to save a stream of DataFrame chunks to a table of a SQLite database, see load_df_to_sqlite.
+    The chunks are first inserted into a temporary table of the connection, which does not lock the database file while
+    the chunks are still being produced. The temporary table is then copied into the table in a single transaction,
+    in which the if_exists behaviour is applied once. If a chunk fails, the table is left as it was.
+
+    Parameters:
+    chunks (iterable): The DataFrame chunks, all with the same columns. The table is created from the first chunk.
+    table_name (str): The name of the table.
+    db_path (str): The path of the SQLite database file.
+    if_exists (str): Behaviour if the table already exists, see load_df_to_sqlite.
+    key_columns (list): Columns that uniquely identify a row, required for 'upsert'.
+    index_columns (list): Columns to create an index on.
+    batch_size (int): Number of rows passed to each executemany call.
+
+    Returns:
+    bool: True if all chunks were saved, False otherwise.
+    """
+
+    if if_exists not in ('fail', 'replace', 'append', 'upsert'):
+        logging.error(f"Invalid value '{if_exists}' for if_exists, expected 'fail', 'replace', 'append' or 'upsert'")
+        return False
+    if if_exists == 'upsert' and not key_columns:
+        logging.error(f"Upserting into table '{table_name}' requires key columns")
+        return False
+
+    key_columns = [str(col) for col in key_columns or []]
+    index_columns = [str(col) for col in index_columns or []]
+    exists_query = "SELECT 1 FROM main.sqlite_master WHERE type='table' AND name=?"
+
+    connection = None
+    try:
+        # Transactions are begun explicitly, as sqlite3 would otherwise commit the DROP and CREATE statements on their own
+        connection = sqlite3.connect(db_path, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        if if_exists == 'fail' and connection.execute(exists_query, (table_name,)).fetchone() is not None:
+            logging.error(f"Table '{table_name}' already exists in '{db_path}'. Set if_exists to 'replace', "
+                          f"'append' or 'upsert' in order to perform this action")
+            return False
+
+        columns = None
+        rows = 0
+        for df in chunks:
+            if columns is None:
+                columns = [str(col) for col in df.columns]
+                column_list = ', '.join(_quote(col) for col in columns)
+                column_definitions = ', '.join(f'{_quote(col)} {_sqlite_type(dtype)}'
+                                               for col, dtype in zip(columns, df.dtypes))
+                connection.execute(f'CREATE TEMP TABLE staging ({column_definitions})')
+            connection.execute('BEGIN')
+            for start in range(0, len(df), batch_size):
+                batch = df.iloc[start:start + batch_size]
+                connection.executemany(f'INSERT INTO temp.staging ({column_list}) VALUES ({", ".join("?" for _ in columns)})',
+                                       zip(*(_sqlite_values(batch[col]) for col in batch.columns)))
+            connection.execute('COMMIT')
+            rows += len(df)
+        if columns is None:
+            logging.info(f"No chunks to save to table '{table_name}' in {db_path}")
+            return True
+
+        connection.execute('BEGIN IMMEDIATE')  # One transaction for the whole table, rolled back on errors
+        try:
+            table_exists = connection.execute(exists_query, (table_name,)).fetchone() is not None
+            if table_exists and if_exists == 'fail':
+                raise sqlite3.IntegrityError(f"Table '{table_name}' was created by another writer in the meantime")
+            if table_exists and if_exists == 'replace':
+                logging.warning(f"Table '{table_name}' in '{db_path}' is being replaced")
+                connection.execute(f'DROP TABLE main.{_quote(table_name)}')
+
+            connection.execute(f'CREATE TABLE IF NOT EXISTS main.{_quote(table_name)} ({column_definitions})')
+            if key_columns:
+                connection.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS main.{_quote("ux_" + table_name)} ON '
+                                   f'{_quote(table_name)} ({", ".join(_quote(col) for col in key_columns)})')
+            for col in index_columns:
+                connection.execute(f'CREATE INDEX IF NOT EXISTS main.{_quote("ix_" + table_name + "_" + col)} ON '
+                                   f'{_quote(table_name)} ({_quote(col)})')
+
+            # The WHERE clause lets SQLite tell the upsert clause apart from a join condition of the SELECT
+            statement = (f'INSERT INTO main.{_quote(table_name)} ({column_list}) '
+                         f'SELECT {column_list} FROM temp.staging WHERE true')
+            if if_exists == 'upsert':
+                updates = ', '.join(f'{_quote(col)}=excluded.{_quote(col)}' for col in columns if col not in key_columns)
+                conflict_target = ', '.join(_quote(col) for col in key_columns)
+                statement += f' ON CONFLICT ({conflict_target}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+            connection.execute(statement)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        logging.info(f"{rows} rows successfully saved to table '{table_name}' in {db_path}")
+        return True
+    except sqlite3.Error as e:
+        logging.error(f"SQLite error while trying to save the DataFrame to table '{table_name}' in {db_path}: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error while saving the DataFrame to table '{table_name}' in {db_path}: {e}")
+    finally:
+        if connection is not None:
+            connection.close()
+    return False
@@ -0,0 +1,184 @@
+import datetime
+import enum
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+# Size of the blocks in which payloads are hashed
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Modules whose code determines the output of every dataset, in addition to the modules of its filter functions
+PIPELINE_MODULES = ['extraction', 'transformation', 'validation', 'loading']
+
+
+class RunManifest:
+    """
+    Persistent record of the inputs every dataset output was produced from, used to skip unchanged datasets.
+
+    For every dataset the SHA-256 hash of its raw payload and a fingerprint of its configuration (the parse, filter,
+    schema and load specification and the source code of the modules involved) are stored once its output has been
+    saved. If a later run downloads an identical payload for an identical configuration and the output still exists,
+    parsing, transforming and loading the dataset can be skipped. The manifest is stored as a JSON file, which is
+    rewritten atomically on every update.
+    """
+
+    def __init__(self, path='../data/run_manifest.json'):
+        """
+        Parameters:
+        path (str): Path of the JSON file the manifest is stored in.
+        """
+        self.path = path
+        self._lock = threading.Lock()  # The datasets are loaded concurrently
+        self._entries = self._read()
+        self._pending = {}  # The hashes of the datasets of the current run, until their output is saved
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError) as e:
+            # Without the manifest every dataset is processed again, which is slow but always correct
+            logging.warning(f"Run manifest '{self.path}' could not be read, processing all datasets: {e}")
+            return {}
+
+    def _write(self):
+        # Must hold the lock
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as manifest_file:
+            json.dump(self._entries, manifest_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def unchanged(self, dataset, payload_hash, config_hash):
+        """
+        Check if a dataset was last produced from the same payload and configuration.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        payload_hash (str): The hash of the raw payload of the current run, see hash_payload.
+        config_hash (str): The fingerprint of the configuration of the current run, see hash_config.
+
+        Returns:
+        bool: True if the recorded hashes match.
+        """
+        with self._lock:
+            entry = self._entries.get(dataset)
+        return (entry is not None and entry.get('payload_sha256') == payload_hash
+                and entry.get('config_sha256') == config_hash)
+
+    def stage(self, dataset, payload_hash, config_hash):
+        """
+        Remember the hashes of a dataset that is being processed, until its output is saved (see commit).
+
+        Parameters:
+        dataset (str): The name of the dataset.
+        payload_hash (str): The hash of the raw payload.
+        config_hash (str): The fingerprint of the configuration.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._pending[dataset] = {'payload_sha256': payload_hash, 'config_sha256': config_hash}
+
+    def commit(self, dataset):
+        """
+        Record the staged hashes of a dataset once its output is saved, and persist the manifest.
+
+        Parameters:
+        dataset (str): The name of the dataset.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            entry = self._pending.pop(dataset, None)
+            if entry is None:
+                return
+            entry['saved'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            self._entries[dataset] = entry
+            self._write()
+
+
+def hash_payload(payload):
+    """
+    Compute the SHA-256 hash of a downloaded payload, as returned by extraction.extract_dataset.
+    File objects are read in blocks and rewound to the start afterwards.
+
+    Parameters:
+    payload (str/file): The decoded payload or a binary file object positioned at the start.
+
+    Returns:
+    str: The hex digest.
+    """
+    if isinstance(payload, str):
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    digest = hashlib.sha256()
+    for block in iter(lambda: payload.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    payload.seek(0)
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    """
+    Helper function to get a stable JSON representation of the values of a dataset specification.
+
+    Parameters:
+    value: A value that is not natively JSON serializable, e.g. a filter function or a Strategy.
+
+    Returns:
+    str: The representation.
+    """
+    if callable(value):
+        func = getattr(value, '__wrapped__', value)
+        return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    if isinstance(value, enum.Enum):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return repr(value)
+
+
+def _module_source_hash(module_name):
+    """
+    Helper function to hash the source file of an imported module.
+
+    Parameters:
+    module_name (str): The name of the module.
+
+    Returns:
+    str: The hex digest, or None if the module has no source file.
+    """
+    module = sys.modules.get(module_name)
+    path = getattr(module, '__file__', None)
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as source_file:
+        return hashlib.sha256(source_file.read()).hexdigest()
+
+
+def hash_config(spec):
+    """
+    Compute the fingerprint of the configuration a dataset output is produced with: the dataset specification except
+    for the download options, and the source code of the pipeline modules and of the modules of its filter functions.
+
+    Parameters:
+    spec (dict): The dataset specification.
+
+    Returns:
+    str: The hex digest.
+    """
+    config = {key: value for key, value in spec.items() if key not in ('url', 'extract')}
+    modules = set(PIPELINE_MODULES)
+    modules.update(getattr(getattr(func, '__wrapped__', func), '__module__', None) for func, _ in spec.get('filters', []))
+    code = {module: _module_source_hash(module) for module in sorted(filter(None, modules))}
+    fingerprint = json.dumps({'config': config, 'code': code}, sort_keys=True, default=_canonical)
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
@@ -0,0 +1,187 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from enum import Enum, auto
+
+class TaskStatus(Enum):
+    """
+    Each enumeration represents the final state of a task in a pipeline run
+    """
+
+    SUCCEEDED = auto()
+    FAILED = auto()
+    SKIPPED = auto()  # Not executed, because a task it depends on did not succeed
+
+
+class Task:
+    """
+    A single step of the pipeline, e.g. the extraction of a dataset.
+    The function of a task is called with the results of the tasks it depends on, in the order of depends_on.
+    """
+
+    def __init__(self, name, func, depends_on=(), retries=0, retry_delay=5, tolerate_failures=False):
+        """
+        Parameters:
+        name (str): Unique name of the task, e.g. 'chile.extract'.
+        func (callable): The function executing the task.
+        depends_on (list): Names of the tasks that have to succeed before this task can run.
+        retries (int): Number of times the task is retried if it raises an exception.
+        retry_delay (float): Seconds to wait before the first retry, doubled for every further retry.
+        tolerate_failures (bool): Flag indicating that the task also runs if tasks it depends on failed or were skipped,
+                                  receiving None as their results. By default the task is skipped in that case.
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.tolerate_failures = tolerate_failures
+
+    def __repr__(self):
+        return f"Task({self.name!r}, depends_on={self.depends_on})"
+
+
+def _check_dag(tasks):
+    """
+    Helper function to make sure that the tasks form a directed acyclic graph.
+
+    Parameters:
+    tasks (dict): Maps a task name to its Task.
+
+    Returns:
+    None
+    """
+    for task in tasks.values():
+        unknown = [dependency for dependency in task.depends_on if dependency not in tasks]
+        if unknown:
+            raise ValueError(f"Task '{task.name}' depends on unknown tasks: {unknown}")
+
+    # Kahn's algorithm: if not all tasks can be ordered, the remaining ones are part of a cycle
+    in_degree = {name: len(task.depends_on) for name, task in tasks.items()}
+    ordered = [name for name, degree in in_degree.items() if degree == 0]
+    for name in ordered:
+        for dependent in tasks.values():
+            if name in dependent.depends_on:
+                in_degree[dependent.name] -= 1
+                if in_degree[dependent.name] == 0:
+                    ordered.append(dependent.name)
+    if len(ordered) < len(tasks):
+        raise ValueError(f"The tasks contain a dependency cycle: {sorted(set(tasks) - set(ordered))}")
+
+
+def _run_task(task, inputs):
+    """
+    Helper function to execute a task inside a worker thread, retrying it with exponential backoff on failure.
+
+    Parameters:
+    task (Task): The task to execute.
+    inputs (list): The results of the tasks it depends on.
+
+    Returns:
+    The result of the task function.
+    """
+    for attempt in range(task.retries + 1):
+        try:
+            logging.info(f"Starting task '{task.name}'")
+            return task.func(*inputs)
+        except Exception as e:
+            if attempt == task.retries:
+                raise
+            delay = task.retry_delay * 2 ** attempt
+            logging.warning(f"Task '{task.name}' failed ({e}), retrying in {delay}s")
+            time.sleep(delay)
+
+
+def run_dag(tasks, max_workers=None):
+    """
+    Execute tasks in dependency order on a pool of worker threads.
+    A task is started as soon as all tasks it depends on have succeeded, so independent tasks run in parallel.
+    If a task fails, all tasks that depend on it are skipped (unless they tolerate failures), while the remaining tasks continue.
+    Results are released as soon as every dependent task has finished, so that large DataFrames are not kept
+    in memory for the whole run.
+
+    Parameters:
+    tasks (list): The tasks to execute.
+    max_workers (int): Maximum number of tasks running at the same time. Default behaviour is the ThreadPoolExecutor default.
+
+    Returns:
+    dict: Maps each task name to its TaskStatus.
+    """
+
+    tasks = {task.name: task for task in tasks}
+    if len(tasks) == 0:
+        return {}
+    _check_dag(tasks)
+
+    dependents = {name: [] for name in tasks}
+    for task in tasks.values():
+        for dependency in task.depends_on:
+            dependents[dependency].append(task.name)
+
+    waiting_for = {name: set(task.depends_on) for name, task in tasks.items()}
+    open_consumers = {name: len(dependents[name]) for name in tasks}
+    results = {}
+    status = {}
+    released = set()
+    finished = set()
+
+    def skip_dependents(name):
+        for dependent in dependents[name]:
+            if dependent not in status and not tasks[dependent].tolerate_failures:
+                status[dependent] = TaskStatus.SKIPPED
+                logging.warning(f"Skipping task '{dependent}', as task '{name}' did not succeed")
+                skip_dependents(dependent)
+
+    def release_inputs(name):
+        if name in released:
+            return
+        released.add(name)
+        for dependency in tasks[name].depends_on:
+            open_consumers[dependency] -= 1
+            if open_consumers[dependency] == 0:
+                results.pop(dependency, None)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def submit(name):
+            inputs = [results.get(dependency) for dependency in tasks[name].depends_on]
+            running[executor.submit(_run_task, tasks[name], inputs)] = name
+
+        def finish(name):
+            # Hand the outcome of a finished or skipped task on to the tasks that depend on it
+            if name in finished:
+                return
+            finished.add(name)
+            release_inputs(name)
+            for dependent in dependents[name]:
+                if status.get(dependent) == TaskStatus.SKIPPED:
+                    # Skipped dependents never consume their inputs, but tasks depending on them may tolerate that
+                    finish(dependent)
+                elif dependent not in status:
+                    waiting_for[dependent].discard(name)
+                    if not waiting_for[dependent]:
+                        submit(dependent)
+
+        for name, dependencies in waiting_for.items():
+            if not dependencies:
+                submit(name)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                    if open_consumers[name] > 0:  # Results nobody depends on are not kept
+                        results[name] = result
+                    status[name] = TaskStatus.SUCCEEDED
+                    logging.info(f"Task '{name}' succeeded")
+                except Exception as e:
+                    status[name] = TaskStatus.FAILED
+                    logging.error(f"Task '{name}' failed: {e}")
+                    skip_dependents(name)
+
+                finish(name)
+
+    return status
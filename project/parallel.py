@@ -0,0 +1,366 @@
+import logging
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import pandas as pd
+
+from transformation import (DATE_SAMPLE_SIZE, Strategy, _infer_datetime_format, _statistic_from_counts, apply_filters,
+                            filter_drop_columns, filter_handle_missing_values, filter_rows_after,
+                            filter_rows_by_predicates, filter_rows_by_values, filter_transform_to_datetime)
+
+# Frames with fewer rows are transformed serially, as starting the worker processes would take longer than the filters.
+PARALLEL_MIN_ROWS = 100_000
+
+# Filters whose result for a row only depends on the row itself, so that they can be applied to every partition of a
+# DataFrame independently. filter_handle_missing_values is row-local once its global statistics are known, see
+# _missing_value_stats, except for grouped imputation and interpolation. All other filters (e.g. filter_optimize_dtypes,
+# which chooses dtypes from the whole column) are applied serially to the reassembled DataFrame.
+ROW_LOCAL_FILTERS = {filter_drop_columns, filter_rows_by_predicates, filter_rows_by_values, filter_rows_after,
+                     filter_transform_to_datetime}
+
+
+def parallel_available():
+    """
+    Check if DataFrames can be transformed in parallel. The partitions are exchanged with the worker processes as Arrow
+    IPC streams in shared memory, which requires the pyarrow package.
+
+    Returns:
+    bool: True if DataFrames can be transformed in parallel.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _start_method():
+    """
+    Helper function to get the start method of the worker processes. The pipeline transforms the datasets on several
+    threads (see etl_pipeline.run_dag), so the workers are not forked from the pipeline process, which could copy a lock
+    held by another thread. They are started by a fork server where available, which imports this module once, so that
+    the workers do not import pandas and pyarrow again. Otherwise they are spawned.
+
+    Returns:
+    str: The start method.
+    """
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _to_shared(df):
+    """
+    Helper function to write a partition as an Arrow IPC stream to a new block of shared memory. The block is unlinked
+    by the process reading it, see _from_shared.
+
+    Parameters:
+    df (pd.DataFrame): The partition.
+
+    Returns:
+    tuple: The name of the shared memory block and the size of the stream in bytes.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    data = sink.getvalue()
+    block = shared_memory.SharedMemory(create=True, size=max(data.size, 1))
+    try:
+        block.buf[:data.size] = memoryview(data).cast('B')
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    block.close()
+    return block.name, data.size
+
+
+def _from_shared(name, size):
+    """
+    Helper function to read a partition written by _to_shared and unlink its block of shared memory.
+
+    Parameters:
+    name (str): The name of the shared memory block.
+    size (int): The size of the stream in bytes.
+
+    Returns:
+    pd.DataFrame: The partition.
+    """
+    import pyarrow as pa
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        # Copied out of the block, as the DataFrame must not reference the shared memory once it is unlinked
+        data = pa.py_buffer(bytes(block.buf[:size]))
+    finally:
+        block.close()
+        block.unlink()
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+def _run_partition(name, size, filters, stats_args):
+    """
+    Helper function executed by the worker processes: apply a filter chain to one partition and compute the partial
+    statistics of the following global filter.
+
+    Parameters:
+    name (str): The name of the shared memory block holding the partition, see _to_shared.
+    size (int): The size of the partition in bytes.
+    filters (list): Ordered list of (filter function, keyword arguments) tuples.
+    stats_args (dict): Keyword arguments of _missing_value_stats, or None if no statistics are required.
+
+    Returns:
+    tuple: The shared memory block and size of the filtered partition, and its partial statistics.
+    """
+    df = apply_filters(_from_shared(name, size), filters)
+    stats = _missing_value_stats(df, **stats_args) if stats_args is not None else None
+    return _to_shared(df), stats
+
+
+def _missing_value_stats(df, columns, strategy):
+    """
+    Helper function to compute the partial statistics of filter_handle_missing_values for one partition: the number of
+    missing values of every column and, depending on the strategy, the value counts (MODE, MEDIAN) or the first and last
+    present value (BFILL, FFILL) of every column.
+
+    Parameters:
+    df (pd.DataFrame): The partition.
+    columns (list): The columns to handle missing values for.
+    strategy (Strategy): Strategy for handling missing values.
+
+    Returns:
+    dict: The partial statistics.
+    """
+    stats = {'rows': len(df), 'missing': df[columns].isnull().sum()}
+    if strategy in (Strategy.MODE, Strategy.MEDIAN):
+        stats['value_counts'] = {col: df[col].value_counts() for col in columns}
+    elif strategy in (Strategy.BFILL, Strategy.FFILL):
+        stats['first'] = {col: df[col].loc[df[col].first_valid_index()] if df[col].first_valid_index() is not None
+                          else None for col in columns}
+        stats['last'] = {col: df[col].loc[df[col].last_valid_index()] if df[col].last_valid_index() is not None
+                         else None for col in columns}
+    return stats
+
+
+def _fill_missing_values(df, fill_values):
+    """
+    Helper function to fill the missing values of a partition with the mode or median of the whole DataFrame.
+
+    Parameters:
+    df (pd.DataFrame): The partition.
+    fill_values (dict): Maps each column to its fill value.
+
+    Returns:
+    pd.DataFrame: The partition with the missing values filled.
+    """
+    return df.fillna(value=fill_values)
+
+
+def _fill_with_neighbours(df, columns, strategy, previous, following):
+    """
+    Helper function to apply a fill strategy to a partition as if it was applied to the whole DataFrame.
+    The last present value of the preceding partitions and the first present value of the following partitions are
+    added as a row before and after the partition, so that values are carried across the partition boundaries.
+
+    Parameters:
+    df (pd.DataFrame): The partition.
+    columns (list): The columns to handle missing values for.
+    strategy (Strategy): Either BFILL or FFILL.
+    previous (dict): Maps each column to the last present value before the partition, or None.
+    following (dict): Maps each column to the first present value after the partition, or None.
+
+    Returns:
+    pd.DataFrame: The partition with the missing values filled.
+    """
+    if df.empty:
+        return df
+    dtypes = df[columns].dtypes
+    framed = pd.concat([pd.DataFrame([previous], columns=columns).astype(dtypes), df[columns],
+                        pd.DataFrame([following], columns=columns).astype(dtypes)], ignore_index=True)
+    filled = filter_handle_missing_values(framed, columns, strategy=strategy, inplace=True)
+    df = df.copy(deep=False)
+    df[columns] = filled.iloc[1:-1].set_axis(df.index)
+    return df
+
+
+def _handle_missing_values(partitions, stats, filter_args):
+    """
+    Helper function to reduce the partial statistics of filter_handle_missing_values and build the row-local filter
+    that applies the strategy to every partition.
+
+    Parameters:
+    partitions (list): The partitions.
+    stats (list): The partial statistics of every partition, see _missing_value_stats.
+    filter_args (dict): The keyword arguments of filter_handle_missing_values.
+
+    Returns:
+    list: The row-local filter of every partition, as (filter function, keyword arguments) tuples, or None if no column
+          exceeds the threshold.
+    """
+    strategy = filter_args.get('strategy', Strategy.DROP_ROW)
+    threshold = filter_args.get('threshold', 0)
+    rows = sum(partial['rows'] for partial in stats)
+    missing = sum(partial['missing'] for partial in stats)
+
+    columns = []
+    for col, count in missing.items():
+        missing_ratio = count / rows if rows else float('nan')
+        if missing_ratio > threshold:
+            logging.info(f"Column '{col}' has {missing_ratio * 100:.2f}% missing values, applying {strategy.name} strategy")
+            columns.append(col)
+        else:
+            logging.info(f"Column '{col}' has {missing_ratio * 100:.2f}% missing values, which is lower than the "
+                         f"threshold of {threshold * 100:.2f}%. Not applying a strategy.")
+    if not columns:
+        return None
+
+    if strategy == Strategy.DROP_ROW:
+        return [(filter_handle_missing_values, {'column': columns, 'strategy': strategy})] * len(partitions)
+
+    if strategy in (Strategy.MODE, Strategy.MEDIAN):
+        fill_values = {}
+        for col in columns:
+            try:
+                counts = pd.concat([partial['value_counts'][col] for partial in stats]).groupby(level=0).sum()
+                fill_values[col] = _statistic_from_counts(counts, strategy)
+            except Exception as e:
+                logging.error(f"Unexpected error while handling missing values in column '{col}' with strategy '{strategy.name}': {e}")
+        for col, value in fill_values.items():
+            logging.info(f"Applied {strategy.name.lower()} imputation to column '{col}' with {strategy.name.lower()} value {value}")
+        return [(_fill_missing_values, {'fill_values': fill_values})] * len(partitions)
+
+    # Fill strategies: Pass the neighbouring present values of every partition
+    filters = []
+    for index in range(len(partitions)):
+        previous, following = {}, {}
+        for col in columns:
+            earlier = [partial['last'][col] for partial in stats[:index] if partial['last'][col] is not None]
+            later = [partial['first'][col] for partial in stats[index + 1:] if partial['first'][col] is not None]
+            previous[col] = earlier[-1] if earlier else None
+            following[col] = later[0] if later else None
+        filters.append((_fill_with_neighbours, {'columns': columns, 'strategy': strategy, 'previous': previous,
+                                                'following': following}))
+    return filters
+
+
+def _with_date_format(partitions, filter_args):
+    """
+    Helper function to infer the date format of filter_transform_to_datetime once for the whole DataFrame, so that all
+    partitions are parsed with the same format.
+
+    Parameters:
+    partitions (list): The partitions.
+    filter_args (dict): The keyword arguments of filter_transform_to_datetime.
+
+    Returns:
+    dict: The keyword arguments, including the date format if it could be inferred.
+    """
+    column = filter_args.get('column')
+    if filter_args.get('do_columns') or filter_args.get('date_format') or column not in partitions[0].columns:
+        return filter_args
+    if pd.api.types.is_datetime64_any_dtype(partitions[0][column]):
+        return filter_args
+    sample = pd.concat([partition[column].dropna().drop_duplicates().head(DATE_SAMPLE_SIZE) for partition in partitions])
+    date_format = _infer_datetime_format(sample, dayfirst=filter_args.get('dayfirst', False))
+    return {**filter_args, 'date_format': date_format} if date_format else filter_args
+
+
+def _run_pass(pool, partitions, filters, stats_args=None):
+    """
+    Helper function to apply the row-local filters of every partition in the worker processes.
+
+    Parameters:
+    pool (multiprocessing.pool.Pool): The worker processes.
+    partitions (list): The partitions.
+    filters (list): For every partition, the ordered list of (filter function, keyword arguments) tuples.
+    stats_args (dict): Keyword arguments of _missing_value_stats, or None if no statistics are required.
+
+    Returns:
+    tuple: The list of filtered partitions and the list of their partial statistics.
+    """
+    # The partitions are passed in shared memory instead of being pickled through the pipes of the pool
+    blocks = []
+    results = None
+    try:
+        for partition in partitions:
+            blocks.append(_to_shared(partition))
+        results = pool.starmap(_run_partition, [(name, size, filters[index], stats_args)
+                                                for index, (name, size) in enumerate(blocks)])
+        blocks = []  # Unlinked by the workers
+        return [_from_shared(*block) for block, _ in results], [stats for _, stats in results]
+    finally:
+        # Unlink the blocks left behind by a failed pass
+        for name, _ in blocks + [block for block, _ in results or []]:
+            try:
+                leftover = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            leftover.close()
+            leftover.unlink()
+
+
+def apply_filters_parallel(df, filters, workers=None, min_rows=PARALLEL_MIN_ROWS):
+    """
+    Apply an ordered chain of filters to a DataFrame like transformation.apply_filters, but split into row ranges that
+    are transformed by a pool of worker processes.
+    Consecutive row-local filters (see ROW_LOCAL_FILTERS) are applied to every partition in a single pass.
+    Missing values are handled in two phases: the partitions first compute partial statistics (missing counts, value
+    counts or their first and last present values), which are reduced to the threshold check, the mode or median, or
+    the values carried across the partition boundaries, before the strategy is applied to every partition. This gives
+    the same result as the serial filter. Filters that are not row-local are applied to the reassembled DataFrame.
+
+    Parameters:
+    df (pd.DataFrame/iterator): The DataFrame. Chunked DataFrames are already bounded in memory and are filtered serially.
+    filters (list): Ordered list of (filter function, keyword arguments) tuples.
+    workers (int): The number of worker processes. Default behaviour is the number of CPUs.
+    min_rows (int): DataFrames with fewer rows are filtered serially.
+
+    Returns:
+    pd.DataFrame/iterator: The filtered DataFrame, or an iterator over the filtered chunks.
+    """
+    workers = workers or os.cpu_count() or 1
+    if not isinstance(df, pd.DataFrame) or workers < 2 or len(df) < min_rows:
+        return apply_filters(df, filters)
+    if not parallel_available():
+        logging.warning("Parallel transformation requires the pyarrow package, filtering serially")
+        return apply_filters(df, filters)
+
+    context = multiprocessing.get_context(_start_method())
+    if context.get_start_method() == 'forkserver':
+        context.set_forkserver_preload([__name__])
+    bounds = [len(df) * i // workers for i in range(workers + 1)]
+    partitions = [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+    logging.info(f"Transforming {len(df)} rows in {len(partitions)} partitions")
+
+    with context.Pool(workers) as pool:
+        pending = [[] for _ in partitions]  # The row-local filters of every partition that have not been applied yet
+        for filter_function, filter_args in filters:
+            if filter_function in ROW_LOCAL_FILTERS:
+                if filter_function is filter_transform_to_datetime:
+                    filter_args = _with_date_format(partitions, filter_args)
+                for partition_filters in pending:
+                    partition_filters.append((filter_function, filter_args))
+
+            elif (filter_function is filter_handle_missing_values and not filter_args.get('group_by')
+                  and filter_args.get('strategy', Strategy.DROP_ROW) != Strategy.INTERPOLATE):
+                columns = filter_args['column'] if isinstance(filter_args['column'], list) else [filter_args['column']]
+                stats_args = {'columns': columns, 'strategy': filter_args.get('strategy', Strategy.DROP_ROW)}
+                partitions, stats = _run_pass(pool, partitions, pending, stats_args)
+                pending = [[] for _ in partitions]
+                missing_filters = _handle_missing_values(partitions, stats, filter_args)
+                for partition_filters, missing_filter in zip(pending, missing_filters or []):
+                    partition_filters.append(missing_filter)
+
+            else:
+                if any(pending):
+                    partitions, _ = _run_pass(pool, partitions, pending)
+                df = filter_function(pd.concat(partitions), **filter_args)
+                bounds = [len(df) * i // workers for i in range(workers + 1)]
+                partitions = [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+                pending = [[] for _ in partitions]
+
+        if any(pending):
+            partitions, _ = _run_pass(pool, partitions, pending)
+        return pd.concat(partitions)
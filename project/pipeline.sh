@@ -8,9 +8,9 @@
 
 # Make sure to install the following packages to run this script successfully:
 # - pandas
-# - retry
 # - requests
 # - numpy
+# - pyarrow (only required for the Parquet and Feather output formats)
 
 # Note: Unfortunately the Data Portal providing the Chilean dataset is currently offline (14.11.2024).
 # As a result the code for this dataset has been removed from execution.
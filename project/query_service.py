@@ -0,0 +1,279 @@
+########################################################################################################################
+# Query service over the outputs of the pipeline for the analysis layer
+#
+# Answers parameterized queries (countries, date range, granularity, absolute or per 100k inhabitants) from the rollup
+# tables of the pipeline (see aggregation.build_rollups), which are loaded once and kept in memory. The results are
+# kept in an LRU cache, so that repeated queries of the analysis are answered without touching the tables again.
+# Before every query the modification time of the table is checked, and a table rewritten by the pipeline is loaded
+# again and its cached results are dropped.
+#
+# Usage from Python (e.g. analysis.ipynb):
+#   from query_service import QueryService
+#   service = QueryService('../data/')
+#   weekly = service.query(countries=['Chile', 'Mexico'], start='2021-01-01', granularity='weekly', per_capita=True)
+#
+# Usage as a local HTTP endpoint returning JSON:
+#   python3 query_service.py --port 8766
+#   curl 'http://127.0.0.1:8766/query?country=Chile&start=2021-01-01&granularity=weekly&per_capita=true'
+#   curl 'http://127.0.0.1:8766/countries'
+########################################################################################################################
+
+import argparse
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from aggregation import ROLLUP_FREQUENCIES
+from loading import FORMATS, SQLITE_DB_NAME, read_df
+from transformation import _predicate_mask
+
+# Maximum number of query results kept in the LRU cache.
+QUERY_CACHE_SIZE = 256
+
+# Name pattern of the rollup tables, see etl_pipeline.ROLLUP.
+ROLLUP_FILE_NAME = 'covid_mortality_{frequency}'
+
+
+class QueryService:
+    """
+    Cached, parameterized queries over the rollup tables of the pipeline.
+
+    Every table is read once on its first query and kept in memory. Query results are cached with least recently used
+    eviction. As the key of every cached result contains the version (modification time and size) of its table, a
+    table rewritten by the pipeline is read again on the next query and the results of the previous version are dropped.
+    The service is thread-safe, so that it can serve concurrent HTTP requests.
+    """
+
+    def __init__(self, file_path='../data/', file_format='csv', file_name=ROLLUP_FILE_NAME, cache_size=QUERY_CACHE_SIZE):
+        """
+        Parameters:
+        file_path (str): The output folder of the pipeline.
+        file_format (str): The output format of the rollup tables, see loading.FORMATS.
+        file_name (str): Name pattern of the rollup tables, with the placeholder for the granularity.
+        cache_size (int): Maximum number of cached query results.
+        """
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown output format '{file_format}', expected one of {list(FORMATS)}")
+        self.file_path = file_path
+        self.file_format = file_format
+        self.file_name = file_name
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._tables = {}  # Maps the granularity to the version and the DataFrame of its table
+        self._results = OrderedDict()  # The cached query results, the least recently used first
+        self._lock = threading.Lock()
+
+    def _source_path(self, granularity):
+        if self.file_format == 'sqlite':
+            return os.path.join(self.file_path, SQLITE_DB_NAME)
+        return os.path.join(self.file_path, self.file_name.format(frequency=granularity) + FORMATS[self.file_format][0])
+
+    def _version(self, granularity):
+        """
+        Helper function to get the version of a table, which changes whenever the pipeline rewrites it.
+
+        Parameters:
+        granularity (str): The granularity of the table, see aggregation.ROLLUP_FREQUENCIES.
+
+        Returns:
+        tuple: The modification time and the size of the output, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(self._source_path(granularity))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _table(self, granularity):
+        """
+        Helper function to get a rollup table, reading it again if the pipeline rewrote it. Must hold the lock.
+
+        Parameters:
+        granularity (str): The granularity of the table.
+
+        Returns:
+        tuple: The version and the DataFrame of the table.
+        """
+        version = self._version(granularity)
+        if version is None:
+            raise FileNotFoundError(f"No {granularity} rollup table in {self.file_path}, run etl_pipeline.py first")
+        cached = self._tables.get(granularity)
+        if cached is not None and cached[0] == version:
+            return cached
+
+        df = read_df(self.file_name.format(frequency=granularity), file_path=self.file_path,
+                     file_format=self.file_format, date_columns=['date'])
+        if df is None:
+            raise OSError(f"The {granularity} rollup table could not be read from {self.file_path}")
+        if cached is not None:
+            # Drop the results computed from the previous version of the table
+            for key in [key for key in self._results if key[0] == granularity]:
+                del self._results[key]
+            logging.info(f"The {granularity} rollup table was rewritten, reloaded {len(df)} rows")
+        else:
+            logging.info(f"Loaded the {granularity} rollup table with {len(df)} rows")
+        self._tables[granularity] = (version, df)
+        return version, df
+
+    def query(self, countries=None, start=None, end=None, granularity='daily', per_capita=False):
+        """
+        Get the deaths of the given countries and period.
+
+        Parameters:
+        countries (list): The countries to include, e.g. ['Chile', 'Mexico']. Default behaviour is all countries.
+        start: The first date to include, as a date string or pd.Timestamp. Default behaviour is no lower bound.
+        end: The last date to include. Default behaviour is no upper bound.
+        granularity (str): The period of every row: 'daily', 'weekly' or 'monthly'. Weeks and months are
+                           represented by their first day.
+        per_capita (bool): Flag indicating that the deaths per 100k inhabitants are returned instead of the
+                           absolute deaths.
+
+        Returns:
+        pd.DataFrame: The columns 'country', 'date' and 'deaths' (or 'deaths_per_100k'), one row per country and period.
+        """
+        if granularity not in ROLLUP_FREQUENCIES:
+            raise ValueError(f"Unknown granularity '{granularity}', expected one of {list(ROLLUP_FREQUENCIES)}")
+        if isinstance(countries, str):
+            countries = [countries]
+        countries = tuple(sorted(set(countries))) if countries else None
+        value_column = 'deaths_per_100k' if per_capita else 'deaths'
+
+        with self._lock:
+            version, table = self._table(granularity)
+            key = (granularity, version, countries, str(start) if start is not None else None,
+                   str(end) if end is not None else None, value_column)
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result.copy()
+
+            self.misses += 1
+            mask = _predicate_mask(table, {'country': {'values': list(countries) if countries else None},
+                                           'date': {'min': start, 'max': end}})
+            result = table.loc[mask, ['country', 'date', value_column]].reset_index(drop=True)
+            self._results[key] = result
+            if len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+            return result.copy()
+
+    def countries(self, granularity='daily'):
+        """
+        Get the countries of a rollup table.
+
+        Parameters:
+        granularity (str): The granularity of the table.
+
+        Returns:
+        list: The sorted country names.
+        """
+        with self._lock:
+            _, table = self._table(granularity)
+            return sorted(table['country'].unique().tolist())
+
+    def clear(self):
+        """
+        Drop all tables and cached results, e.g. to free their memory.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self._tables.clear()
+            self._results.clear()
+
+
+def _to_json(df):
+    """
+    Helper function to convert a query result into JSON records, with dates in ISO 8601 format.
+
+    Parameters:
+    df (pd.DataFrame): The query result.
+
+    Returns:
+    str: The JSON array.
+    """
+    return df.to_json(orient='records', date_format='iso', date_unit='s')
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of the HTTP endpoint, serving GET /query and GET /countries.
+    """
+
+    def log_message(self, format, *args):
+        logging.debug(f"Query service: {format % args}")
+
+    def _send(self, status, body):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        service = self.server.service
+        granularity = params.get('granularity', ['daily'])[0]
+        try:
+            if url.path == '/query':
+                result = service.query(countries=params.get('country'), start=params.get('start', [None])[0],
+                                       end=params.get('end', [None])[0], granularity=granularity,
+                                       per_capita=params.get('per_capita', ['false'])[0].lower() in ('1', 'true', 'yes'))
+                self._send(200, _to_json(result))
+            elif url.path == '/countries':
+                self._send(200, json.dumps(service.countries(granularity)))
+            else:
+                self._send(404, json.dumps({'error': f"Unknown path '{url.path}', expected /query or /countries"}))
+        except (ValueError, TypeError) as e:
+            self._send(400, json.dumps({'error': str(e)}))
+        except OSError as e:
+            self._send(503, json.dumps({'error': str(e)}))
+
+
+def create_server(service, host='127.0.0.1', port=8766):
+    """
+    Create the HTTP endpoint of a query service.
+
+    Parameters:
+    service (QueryService): The service answering the queries.
+    host (str): The address to listen on.
+    port (int): The port to listen on, 0 for a free port chosen by the operating system.
+
+    Returns:
+    ThreadingHTTPServer: The server, to be run with serve_forever().
+    """
+    server = ThreadingHTTPServer((host, port), _QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cached query service over the rollup tables of the ETL pipeline.")
+    parser.add_argument("--data-dir", default="../data/", help="Output folder of the pipeline (default: ../data/).")
+    parser.add_argument("--file-format", default="csv", choices=list(FORMATS),
+                        help="Output format of the rollup tables (default: csv).")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8766, help="Port to listen on (default: 8766).")
+    parser.add_argument("--cache-size", type=int, default=QUERY_CACHE_SIZE,
+                        help=f"Maximum number of cached query results (default: {QUERY_CACHE_SIZE}).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    server = create_server(QueryService(args.data_dir, args.file_format, cache_size=args.cache_size),
+                           host=args.host, port=args.port)
+    logging.info(f"Query service listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
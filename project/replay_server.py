@@ -0,0 +1,340 @@
+########################################################################################################################
+# Local replay server standing in for the data portals
+#
+# Serves the payload of every dataset under /<dataset name>, either synthetic payloads in the layout of the real
+# downloads (see test_helper.create_mock_csv_payload) or payloads recorded in the download cache by a previous run.
+# The behaviour of the portals can be simulated: latency before the first byte, bandwidth throttling, transient
+# 503 errors and connections that drop in the middle of the body. Range requests and ETags are supported, so that
+# the pipeline resumes dropped downloads and issues conditional requests just like against the real portals.
+#
+# Usage:
+#   python3 replay_server.py                                    Serve synthetic payloads on port 8765
+#   python3 replay_server.py --scale 10 --error-rate 0.1        Ten times the rows, every tenth request fails
+#   python3 replay_server.py --recorded ../cache/               Replay the payloads of the download cache
+#
+# The pipeline is pointed at the server with the printed --source-url options of etl_pipeline.py.
+# See throughput.py for the end-to-end throughput harness built on this server.
+########################################################################################################################
+
+import argparse
+import hashlib
+import logging
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from caching import CacheMissError, DownloadCache
+from test_helper import create_mock_csv_payload
+
+# Number of rows of the synthetic payloads at scale 1. Mexico and the world population are tables of states and
+# countries, which do not grow with the scale.
+SYNTHETIC_ROWS = {'chile': 50_000, 'colombia': 100_000, 'usa': 10_000, 'mexico': 33, 'world_pop': 50}
+SCALED_DATASETS = ['chile', 'colombia', 'usa']
+
+# Size of the pieces in which a throttled body is written.
+THROTTLE_CHUNK_SIZE = 64 * 1024
+
+
+def synthetic_payloads(scale=1, seed=0):
+    """
+    Generate synthetic payloads for all datasets, see test_helper.create_mock_csv_payload.
+
+    Parameters:
+    scale (float): Factor applied to the number of rows of the per-row datasets (SCALED_DATASETS).
+    seed (int): Seed of the random values.
+
+    Returns:
+    dict: Maps the dataset name to its payload.
+    """
+    return {name: create_mock_csv_payload(name, int(rows * scale) if name in SCALED_DATASETS else rows, seed=seed)
+            for name, rows in SYNTHETIC_ROWS.items()}
+
+
+def _scale_csv(payload, scale, header_lines=1):
+    """
+    Helper function to scale a recorded csv payload by repeating its data lines.
+
+    Parameters:
+    payload (bytes): The csv payload.
+    scale (float): Factor applied to the number of data lines, rounded down to whole repetitions (at least one).
+    header_lines (int): Number of lines at the start of the payload that are not repeated.
+
+    Returns:
+    bytes: The scaled payload.
+    """
+    lines = payload.split(b'\n', header_lines)
+    if len(lines) <= header_lines:
+        return payload
+    body = lines[-1] if lines[-1].endswith(b'\n') else lines[-1] + b'\n'
+    return b'\n'.join(lines[:-1]) + b'\n' + body * max(1, int(scale))
+
+
+def recorded_payloads(datasets, cache_dir='../cache/', scale=1):
+    """
+    Read the payloads of the datasets from the download cache of a previous run.
+
+    Parameters:
+    datasets (dict): Maps a dataset name to its specification, see etl_pipeline.DATASETS.
+    cache_dir (str): The directory of the download cache.
+    scale (float): Factor applied to the number of rows of the per-row datasets (SCALED_DATASETS).
+
+    Returns:
+    dict: Maps the dataset name to its payload. Datasets without a cached payload are left out.
+    """
+    cache = DownloadCache(cache_dir, offline=True)
+    payloads = {}
+    for name, spec in datasets.items():
+        try:
+            with cache.open(spec['url']) as payload_file:
+                payload = payload_file.read()
+        except CacheMissError:
+            logging.warning(f"No recorded payload for dataset '{name}' in {cache_dir}")
+            continue
+        if name in SCALED_DATASETS and not spec['extract'].get('is_zip'):
+            payload = _scale_csv(payload, scale, header_lines=spec['parse'].get('skiprows', 0) + 1)
+        payloads[name] = payload
+    return payloads
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of the ReplayServer, serving GET /<dataset name>.
+    """
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the portals
+
+    def log_message(self, format, *args):
+        logging.debug(f"Replay server: {format % args}")
+
+    def do_GET(self):
+        replay = self.server.replay
+        name = self.path.lstrip('/').split('?')[0]
+        if name not in replay.payloads:
+            self.send_error(404)
+            return
+        payload, etag = replay.payloads[name], replay.etags[name]
+        replay.count(name, 'requests')
+
+        if replay.latency:
+            time.sleep(replay.latency)
+        if replay.draw(replay.error_rate):
+            replay.count(name, 'errors')
+            self.send_response(503)
+            if replay.retry_after is not None:
+                self.send_header('Retry-After', str(replay.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        # Serve the rest of the payload if the client resumes the same version of it
+        start = 0
+        range_header = self.headers.get('Range', '')
+        if range_header.startswith('bytes=') and self.headers.get('If-Range', etag) == etag:
+            start = int(range_header[len('bytes='):].split('-')[0] or 0)
+        body = payload[start:]
+
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header('Content-Range', f'bytes {start}-{len(payload) - 1}/{len(payload)}')
+        self.send_header('Content-Type', 'application/zip' if payload[:2] == b'PK' else 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', replay.last_modified)
+        self.end_headers()
+
+        if len(body) > 1 and replay.draw(replay.drop_rate):
+            # Drop the connection in the middle of the body
+            replay.count(name, 'drops')
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        self._write_throttled(body, replay.bandwidth)
+        replay.count(name, 'bytes', len(body))
+
+    def _write_throttled(self, body, bandwidth):
+        """
+        Write the body, at most at the given bandwidth.
+
+        Parameters:
+        body (bytes): The body.
+        bandwidth (float): Maximum number of bytes per second, or None for no limit.
+
+        Returns:
+        None
+        """
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        start = time.perf_counter()
+        for offset in range(0, len(body), THROTTLE_CHUNK_SIZE):
+            self.wfile.write(body[offset:offset + THROTTLE_CHUNK_SIZE])
+            delay = (offset + THROTTLE_CHUNK_SIZE) / bandwidth - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+
+class ReplayServer:
+    """
+    Local HTTP server replaying dataset payloads in a background thread, as a reproducible stand-in for the data
+    portals. The faults are drawn from a seeded random generator, so that a run can be repeated with the same
+    sequence of errors and dropped connections.
+    """
+
+    def __init__(self, payloads, host='127.0.0.1', port=0, latency=0.0, bandwidth=None, error_rate=0.0,
+                 drop_rate=0.0, retry_after=0, seed=None):
+        """
+        Parameters:
+        payloads (dict): Maps the dataset name, served under /<name>, to its payload.
+        host (str): The address to listen on.
+        port (int): The port to listen on. Default behaviour is a free port chosen by the operating system.
+        latency (float): Seconds before every response, simulating the time to the first byte.
+        bandwidth (float): Maximum number of bytes per second of every response. Default behaviour is no limit.
+        error_rate (float): Ratio (0-1) of requests answered with 503 Service Unavailable.
+        drop_rate (float): Ratio (0-1) of responses whose connection drops after half of the body.
+        retry_after (int): Value of the Retry-After header of the 503 responses in seconds, or None to leave it out.
+        seed (int): Seed of the fault injection.
+        """
+        self.payloads = dict(payloads)
+        self.etags = {name: f'"{hashlib.sha256(payload).hexdigest()[:16]}"' for name, payload in self.payloads.items()}
+        self.last_modified = formatdate(usegmt=True)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.retry_after = retry_after
+        self.stats = {name: {'requests': 0, 'errors': 0, 'drops': 0, 'bytes': 0} for name in self.payloads}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()  # The requests are handled in concurrent threads
+        self._server = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self._server.daemon_threads = True
+        self._server.replay = self
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, name):
+        """
+        Get the URL the payload of a dataset is served under.
+
+        Parameters:
+        name (str): The name of the dataset.
+
+        Returns:
+        str: The URL.
+        """
+        return f"{self.address}/{name}"
+
+    def draw(self, rate):
+        """
+        Decide whether to inject a fault.
+
+        Parameters:
+        rate (float): The probability of the fault.
+
+        Returns:
+        bool: True if the fault is to be injected.
+        """
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def count(self, name, key, value=1):
+        """
+        Add to the statistics of a dataset.
+
+        Parameters:
+        name (str): The name of the dataset.
+        key (str): The statistic, one of 'requests', 'errors', 'drops' and 'bytes'.
+        value (int): The value to add.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            self.stats[name][key] += value
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns:
+        ReplayServer: The server itself.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        logging.info(f"Replay server serving {sorted(self.payloads)} at {self.address}")
+        return self
+
+    def serve_forever(self):
+        """
+        Serve in the current thread until interrupted.
+
+        Returns:
+        None
+        """
+        logging.info(f"Replay server serving {sorted(self.payloads)} at {self.address}")
+        self._server.serve_forever()
+
+    def stop(self):
+        """
+        Stop serving and close the socket.
+
+        Returns:
+        None
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local replay server standing in for the data portals.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765).")
+    parser.add_argument("--recorded", default=None, metavar="CACHE_DIR",
+                        help="Replay the payloads recorded in this download cache instead of synthetic payloads.")
+    parser.add_argument("--scale", type=float, default=1, help="Factor applied to the rows of Chile, Colombia and USA.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before every response.")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Maximum bytes per second of every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Ratio of requests answered with 503.")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Ratio of responses dropped after half of the body.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic payloads and the fault injection.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.recorded:
+        from etl_pipeline import DATASETS
+        payloads = recorded_payloads(DATASETS, args.recorded, scale=args.scale)
+    else:
+        payloads = synthetic_payloads(args.scale, seed=args.seed)
+
+    server = ReplayServer(payloads, host=args.host, port=args.port, latency=args.latency, bandwidth=args.bandwidth,
+                          error_rate=args.error_rate, drop_rate=args.drop_rate, seed=args.seed)
+    print("Run the pipeline against the replay server with:")
+    print("python3 etl_pipeline.py --no-cache " + " ".join(f"--source-url {name}={server.url(name)}" for name in payloads))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
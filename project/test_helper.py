@@ -1,28 +1,36 @@
+import io
+import zipfile
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
+import requests
+from datetime import datetime
 
-def create_mock_dataframe(num_rows = 1000):
+def create_mock_dataframe(num_rows = 1000, missing_ratio=0.1, seed=None):
 
-    # Generate ID column
-    ids = range(1, num_rows + 1)
+    # All columns are generated with vectorized NumPy operations, so that frames with millions of rows can be created quickly
+    rng = np.random.default_rng(seed)
 
-    # Generate date_of_death column within date range
-    start_date = datetime.strptime('01:01:2020', '%d:%m:%Y')
-    end_date = datetime.strptime('30:09:2024', '%d:%m:%Y')
+    # Generate ID column
+    ids = np.arange(1, num_rows + 1, dtype=float)
 
-    date_of_death = [(start_date + timedelta(days=random.randint(0, (end_date - start_date).days))).strftime('%d:%m:%Y')
-                     for _ in range(num_rows)]
+    # Generate date_of_death column within date range, by picking from the formatted days of the range
+    days = pd.date_range(start=datetime.strptime('01:01:2020', '%d:%m:%Y'),
+                         end=datetime.strptime('30:09:2024', '%d:%m:%Y')).strftime('%d:%m:%Y').to_numpy(dtype=object)
+    date_of_death = days[rng.integers(0, len(days), size=num_rows)]
 
     # Generate region column with random 5 letter strings
-    region = [''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=5)) for _ in range(num_rows)]
+    letters = rng.integers(ord('A'), ord('Z') + 1, size=(num_rows, 5), dtype=np.uint8)
+    region = letters.view('S5').ravel().astype(str).astype(object)
 
     # Generate gender column with 'm' or 'f'
-    gender = [random.choice(['m', 'f']) for _ in range(num_rows)]
+    gender = np.array(['m', 'f'], dtype=object)[rng.integers(0, 2, size=num_rows)]
 
     # Generate diag column with 90% 'U071' and 10% 'U000'
-    diag = ['U071' if random.random() < 0.9 else 'U000' for _ in range(num_rows)]
+    diag = np.where(rng.random(num_rows) < 0.9, 'U071', 'U000').astype(object)
+
+    # Introduce missing values in 'id' and 'region' (10% by default)
+    for values in (ids, region):
+        values[rng.choice(num_rows, size=int(round(num_rows * missing_ratio)), replace=False)] = np.nan
 
     df = pd.DataFrame({
         'id': ids,
@@ -32,9 +40,120 @@ def create_mock_dataframe(num_rows = 1000):
         'diag': diag
     })
 
-    # Introduce about 10% missing values in 'gender' and 'region'
-    for col in ['id', 'region']:
-        df.loc[df.sample(frac=0.1).index, col] = np.nan
-
     return df
 
+
+def create_mock_csv_payload(dataset, num_rows=1000, missing_ratio=0.1, seed=None):
+
+    # Raw payload in the column layout, separator and encoding of one of the datasets of the pipeline, with more
+    # columns than are read, like the real downloads. For 'mexico' and 'world_pop' the rows are states and countries.
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start='2020-03-01', end='2024-09-30')
+    dates = days[rng.integers(0, len(days), size=num_rows)]
+    ages = rng.integers(0, 100, size=num_rows)
+
+    if dataset == 'chile':
+        communes = np.array(['Santiago', 'Ñuñoa', 'Peñalolén', 'Concepción', 'Valparaíso'], dtype=object)
+        df = pd.DataFrame({
+            'ANO_DEF': dates.year,
+            'FECHA_DEF': dates.strftime('%Y-%m-%d').to_numpy(dtype=object),
+            'GLOSA_SEXO': np.array(['Hombre', 'Mujer'], dtype=object)[rng.integers(0, 2, size=num_rows)],
+            'EDAD_CANT': ages,
+            'GLOSA_COMUNA_RESIDENCIA': communes[rng.integers(0, len(communes), size=num_rows)],
+            'DIAG1': np.where(rng.random(num_rows) < 0.9, 'U071', 'U072').astype(object),
+            'GLOSA_CAPITULO_DIAG1': 'Códigos para propósitos especiales',
+        })
+        missing_column, separator, encoding = 'FECHA_DEF', ';', 'latin-1'
+    elif dataset == 'colombia':
+        departments = np.array(['Bogotá', 'Antioquia', 'Valle del Cauca', 'Atlántico', 'Nariño'], dtype=object)
+        df = pd.DataFrame({
+            'fecha reporte web': dates.strftime('%d/%m/%Y 0:00:00').to_numpy(dtype=object),
+            'ID de caso': np.arange(1, num_rows + 1),
+            'Nombre departamento': departments[rng.integers(0, len(departments), size=num_rows)],
+            'Edad': ages,
+            'Sexo': np.array(['M', 'F'], dtype=object)[rng.integers(0, 2, size=num_rows)],
+            'Recuperado': 'Fallecido',
+            'Fecha de muerte': dates.strftime('%d/%m/%Y 0:00:00').to_numpy(dtype=object),
+        })
+        missing_column, separator, encoding = 'Fecha de muerte', ',', 'utf-8'
+    elif dataset == 'usa':
+        jurisdictions = np.array(['United States', 'Alabama', 'Alaska', 'Arizona', 'New York City'], dtype=object)
+        df = pd.DataFrame({
+            'data_as_of': '09/27/2023',
+            'jurisdiction_residence': jurisdictions[rng.integers(0, len(jurisdictions), size=num_rows)],
+            'year': dates.year,
+            'group': np.array(['All', 'Sex', 'Age'], dtype=object)[rng.integers(0, 3, size=num_rows)],
+            'subgroup1': np.array(['All', 'Female', 'Male', '0-4 years'], dtype=object)[rng.integers(0, 4, size=num_rows)],
+            'data_period_start': dates.strftime('%m/%d/%Y').to_numpy(dtype=object),
+            'data_period_end': (dates + pd.Timedelta(days=6)).strftime('%m/%d/%Y').to_numpy(dtype=object),
+            'covid_deaths': rng.integers(0, 3000, size=num_rows).astype(float),
+            'crude_rate': rng.random(num_rows) * 100,
+        })
+        missing_column, separator, encoding = 'covid_deaths', ',', 'utf-8'
+    elif dataset == 'mexico':
+        # One row per state with the national total first, and one column of death counts per day
+        names = ['Nacional'] + [f'Estado {i}' for i in range(1, num_rows)]
+        day_columns = pd.date_range(start='2020-03-17', end='2023-06-23').strftime('%d-%m-%Y')
+        counts = pd.DataFrame(rng.integers(0, 500, size=(num_rows, len(day_columns))), columns=day_columns)
+        df = pd.concat([pd.DataFrame({'cve_ent': range(num_rows), 'poblacion': rng.integers(10 ** 5, 10 ** 8, size=num_rows),
+                                      'nombre': names}), counts], axis=1)
+        return df.to_csv(index=False).encode('utf-8')
+    elif dataset == 'world_pop':
+        # Population per country and year after three lines of metadata, packaged like the World Bank download
+        countries = ['Chile', 'United States', 'Colombia', 'Mexico'] + [f'Country {i}' for i in range(4, num_rows)]
+        df = pd.DataFrame({'Country Name': countries[:max(num_rows, 4)], 'Country Code': 'XXX'})
+        for year in range(2018, 2024):
+            df[str(year)] = rng.integers(10 ** 6, 10 ** 9, size=len(df))
+        metadata = '"Data Source","World Development Indicators",\n\n"Last Updated Date","2024-10-01",\n'
+        return create_mock_zip_payload(metadata + df.to_csv(index=False), csv_name='API_SP.POP.TOTL_DS2.csv')
+    else:
+        raise ValueError(f"No mock payload for dataset '{dataset}'")
+
+    # Introduce missing values in the date (or death count) column
+    missing = rng.choice(num_rows, size=int(round(num_rows * missing_ratio)), replace=False)
+    df[missing_column] = df[missing_column].astype(object)
+    df.loc[missing, missing_column] = None
+
+    return df.to_csv(index=False, sep=separator).encode(encoding)
+
+
+def create_mock_zip_payload(csv_text, csv_name='API_data.csv'):
+
+    # Package the csv data together with a metadata file, like the World Bank download
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        zip_file.writestr('Metadata_' + csv_name, 'metadata')
+        zip_file.writestr(csv_name, csv_text)
+    return buffer.getvalue()
+
+
+class MockResponse:
+    """
+    Minimal stand-in for a requests.Response, serving a fixed payload.
+    """
+
+    def __init__(self, content, status_code=200, headers=None, fail_after=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.fail_after = fail_after  # Number of bytes after which the connection drops
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+    def iter_content(self, chunk_size=1):
+        content = self.content if self.fail_after is None else self.content[:self.fail_after]
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+        if self.fail_after is not None:
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
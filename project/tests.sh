@@ -11,6 +11,10 @@
 # Validate output databases
 # Remove datasets before and after system test
 
+# Arguments are passed on to the ETL pipeline, e.g. use './tests.sh --offline' to run the system test
+# from the download cache of a previous run without network access, or './tests.sh --retransform --force'
+# to run it from the raw payloads archived by a previous run with '--archive'.
+
 # Potentially you will have to make this script executable first
 # Use 'chmod +x path_to_repo/project/tests.sh'
 # Make sure to replace 'path_to_repo' with the path to your repository.
@@ -18,14 +22,16 @@
 # Make sure to install the following packages to run this script successfully:
 # - unittest
 # - pandas
-# - retry
 # - requests
 # - numpy
 
 #######README END########
 
 # Path to database files
-OUTPUT_DATABASES=("../data/chile_covid_mortality.csv" "../data/colombia_covid_mortality.csv" "../data/usa_covid_mortality.csv" "../data/world_population_total.csv" "../data/mexico_covid_mortality.csv")
+OUTPUT_DATABASES=("../data/chile_covid_mortality.csv" "../data/colombia_covid_mortality.csv" "../data/usa_covid_mortality.csv" "../data/world_population_total.csv" "../data/mexico_covid_mortality.csv" "../data/covid_mortality_daily.csv" "../data/covid_mortality_weekly.csv" "../data/covid_mortality_monthly.csv")
+
+# Path to the state files of the pipeline, which would make the system test skip or only append datasets
+PIPELINE_STATE_FILES=("../data/run_manifest.json" "../data/high_water_marks.json" "../data/run_report.json")
 
 # Display an error message and exit
 error_display() {
@@ -46,6 +52,13 @@ cleanup_system_test() {
         fi
     done
 
+    for state_file in "${PIPELINE_STATE_FILES[@]}"; do
+        if [ -f "$state_file" ]; then
+            rm "$state_file"
+            echo "Removed pipeline state: $state_file"
+        fi
+    done
+
     echo "-------------------------------------------------------------------------"
 }
 
@@ -60,7 +73,7 @@ run_unit_tests() {
 run_pipeline() {
     echo "--------------------------------------------------------------------------"
     echo "Executing the complete ETL pipeline..."
-    python3 "etl_pipeline.py" || error_display "Pipeline execution failed."
+    python3 "etl_pipeline.py" "${PIPELINE_ARGS[@]}" || error_display "Pipeline execution failed."
 }
 
 validate_output() {
@@ -75,6 +88,8 @@ validate_output() {
     done
 }
 
+PIPELINE_ARGS=("$@")
+
 main() {
     run_unit_tests
     cleanup_system_test
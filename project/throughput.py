@@ -0,0 +1,163 @@
+########################################################################################################################
+# End-to-end throughput harness for the ETL pipeline
+#
+# Runs etl_pipeline.py against the local replay server (see replay_server.py) at several data volumes and reports the
+# end-to-end throughput and the throughput of every dataset, computed from the run report of the pipeline. The outputs
+# are written to a temporary directory, so that the outputs in /data/ are left untouched.
+#
+# Usage:
+#   python3 throughput.py                                        Synthetic payloads at 1x, 10x and 100x the rows
+#   python3 throughput.py --scales 1 10 --error-rate 0.1         Only 1x and 10x, every tenth request fails
+#   python3 throughput.py --recorded ../cache/                   Replay the payloads recorded in the download cache
+#   python3 throughput.py -- --parse-engine pyarrow --chunksize 100000
+#                                                                Pass the remaining options on to etl_pipeline.py
+#   python3 throughput.py --output throughput.json               Additionally store the results as JSON
+########################################################################################################################
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay_server import ReplayServer, recorded_payloads, synthetic_payloads
+
+DEFAULT_SCALES = [1, 10, 100]
+PIPELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etl_pipeline.py')
+
+
+def _dataset_results(report, payloads):
+    """
+    Helper function to compute the throughput of every dataset from the run report of the pipeline.
+    The time of a dataset is the sum of the wall times of its steps, from the download to the load. As the datasets
+    are processed concurrently, the times of the datasets overlap and do not add up to the end-to-end time.
+    The rows are the rows parsed, i.e. without the rows left out by the row filters pushed down into the reader.
+
+    Parameters:
+    report (dict): The run report, see instrumentation.RunReport.
+    payloads (dict): Maps the dataset name to its payload.
+
+    Returns:
+    dict: Maps the dataset name to its payload size, rows, time, throughput and whether it was loaded.
+    """
+    results = {}
+    for name, payload in payloads.items():
+        steps = [step for step in report['steps'] if step['dataset'] == name]
+        seconds = sum(step['wall_time'] for step in steps)
+        rows = max([step.get(key) or 0 for step in steps for key in ('rows_in', 'rows_out')], default=0)
+        results[name] = {
+            'bytes': len(payload),
+            'rows': rows,
+            'seconds': round(seconds, 4),
+            'mb_per_second': round(len(payload) / 1e6 / seconds, 2) if seconds else None,
+            'rows_per_second': round(rows / seconds) if seconds else None,
+            'loaded': any(step['step'] == 'load' for step in steps),
+        }
+    return results
+
+
+def run_scale(scale, pipeline_args, recorded=None, server_args=None, seed=0):
+    """
+    Run the pipeline against the replay server at one data volume.
+
+    Parameters:
+    scale (float): Factor applied to the number of rows of the per-row datasets, see replay_server.SCALED_DATASETS.
+    pipeline_args (list): Additional command line options for etl_pipeline.py.
+    recorded (str): Directory of a download cache whose payloads are replayed instead of synthetic payloads.
+    server_args (dict): Keyword arguments for ReplayServer, e.g. the latency and the error rate.
+    seed (int): Seed of the synthetic payloads and the fault injection.
+
+    Returns:
+    dict: The end-to-end results and the results per dataset.
+    """
+    if recorded:
+        from etl_pipeline import DATASETS
+        payloads = recorded_payloads(DATASETS, recorded, scale=scale)
+    else:
+        payloads = synthetic_payloads(scale, seed=seed)
+
+    with tempfile.TemporaryDirectory() as output_dir, \
+            ReplayServer(payloads, seed=seed, **(server_args or {})) as server:
+        report_path = os.path.join(output_dir, 'run_report.json')
+        command = [sys.executable, PIPELINE, '--no-cache', '--manifest', '', '--output-dir', output_dir,
+                   '--report', report_path, '--datasets', *payloads]
+        command += [f'--source-url={name}={server.url(name)}' for name in payloads]
+        command += pipeline_args
+
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=os.path.dirname(PIPELINE), capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0 or not os.path.exists(report_path):
+            raise RuntimeError(f"Pipeline run at scale {scale} failed:\n{completed.stderr[-2000:]}")
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        server_stats = server.stats
+
+    total_bytes = sum(len(payload) for payload in payloads.values())
+    datasets = _dataset_results(report, payloads)
+    for name, stats in server_stats.items():
+        datasets[name].update(requests=stats['requests'], errors=stats['errors'], drops=stats['drops'])
+    return {
+        'scale': scale,
+        'bytes': total_bytes,
+        'rows': sum(result['rows'] for result in datasets.values()),
+        'seconds': round(seconds, 3),
+        'pipeline_seconds': report['duration'],
+        'mb_per_second': round(total_bytes / 1e6 / seconds, 2),
+        'datasets': datasets,
+    }
+
+
+def print_results(result):
+    """
+    Print the end-to-end and per-dataset throughput of one data volume.
+
+    Parameters:
+    result (dict): The results, see run_scale.
+
+    Returns:
+    None
+    """
+    print(f"Scale {result['scale']}x: {result['bytes'] / 1e6:,.1f} MB and {result['rows']:,} rows in "
+          f"{result['seconds']:.2f}s end-to-end ({result['pipeline_seconds']:.2f}s pipeline), {result['mb_per_second']:,.2f} MB/s")
+    for name, dataset in result['datasets'].items():
+        status = '' if dataset['loaded'] else '  NOT LOADED'
+        print(f"  {name:<12} {dataset['bytes'] / 1e6:>10,.2f} MB {dataset['rows']:>12,} rows {dataset['seconds']:>9.2f}s "
+              f"{dataset['mb_per_second'] or 0:>10,.2f} MB/s {dataset['rows_per_second'] or 0:>14,} rows/s "
+              f"{dataset['errors']:>3} errors {dataset['drops']:>3} drops{status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end throughput of the ETL pipeline against a local replay server.",
+                                     epilog="Options after '--' are passed on to etl_pipeline.py.")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES,
+                        help="Data volumes as multiples of the rows of Chile, Colombia and USA (default: 1 10 100).")
+    parser.add_argument("--recorded", default=None, metavar="CACHE_DIR",
+                        help="Replay the payloads recorded in this download cache instead of synthetic payloads.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before every response of the server.")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Maximum bytes per second of every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Ratio of requests answered with 503.")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Ratio of responses dropped after half of the body.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic payloads and the fault injection.")
+    parser.add_argument("--output", default=None, help="Path of a JSON file the results are written to.")
+    parser.add_argument("pipeline_args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    pipeline_args = args.pipeline_args[1:] if args.pipeline_args[:1] == ['--'] else args.pipeline_args
+    server_args = {'latency': args.latency, 'bandwidth': args.bandwidth, 'error_rate': args.error_rate,
+                   'drop_rate': args.drop_rate}
+
+    results = []
+    for scale in args.scales:
+        result = run_scale(scale, pipeline_args, recorded=args.recorded, server_args=server_args, seed=args.seed)
+        print_results(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results saved to {args.output}")
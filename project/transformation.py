@@ -1,32 +1,133 @@
-import copy
+import datetime
 import logging
+import operator
+import re
 from enum import Enum, auto
+import numpy as np
 import pandas as pd
 
-def filter_drop_columns(df, white_list):
+def _copy_on_write_enabled():
     """
-    Drop columns from a DataFrame except those in the whitelist.
+    Helper function to check whether pandas copy-on-write mode is active.
+    From pandas 3.0 on it is always active, for pandas 2.x it can be enabled via enable_copy_on_write().
+
+    Returns:
+    bool: True if copy-on-write mode is active.
+    """
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except KeyError:  # Option does not exist before pandas 1.5
+        return False
+
+
+def enable_copy_on_write():
+    """
+    Enable pandas copy-on-write mode, so that the filters can work on shallow copies instead of deep copies.
+    This is a no-op for pandas 3.0 and newer, where copy-on-write is always active.
+
+    Returns:
+    None
+    """
+    if not _copy_on_write_enabled():
+        try:
+            pd.set_option('mode.copy_on_write', True)
+        except KeyError:
+            logging.warning("Copy-on-write mode is not supported by this pandas version, filters fall back to deep copies")
+
+
+def _working_copy(df, inplace):
+    """
+    Helper function to get the DataFrame a filter operates on.
+    With copy-on-write mode a shallow copy suffices, as data is only copied for the columns that are actually modified.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame passed to the filter.
+    inplace (bool): Flag indicating if the filter is to modify the DataFrame in place.
+
+    Returns:
+    pd.DataFrame: The DataFrame itself if inplace is set, otherwise a copy of it.
+    """
+    if inplace:
+        return df
+    return df.copy(deep=not _copy_on_write_enabled())
+
+
+def _date_label(label):
+    """
+    Helper function to get the date of a column name, as converted by filter_transform_to_datetime(do_columns=True).
+
+    Parameters:
+    label: The column name.
+
+    Returns:
+    datetime.date: The date, or None if the column name is not a date.
+    """
+    if isinstance(label, datetime.datetime):
+        return label.date()
+    if isinstance(label, datetime.date):
+        return label
+    return None
+
+
+def _column_mask(columns, white_list=None, date_range=None, pattern=None):
+    """
+    Helper function to resolve the column selectors of filter_drop_columns in a single pass over the columns.
+    The whitelist is looked up as a hashed set, so that the selection takes linear time even for wide tables.
+
+    Parameters:
+    columns (pd.Index): The columns of the DataFrame.
+    white_list (list): Column names to keep.
+    date_range (tuple): Start and end date (inclusive) of the date columns to keep.
+    pattern (str): Regular expression matched against the (string) column names to keep.
+
+    Returns:
+    np.ndarray: Boolean mask of the selected columns.
+    """
+    selected = np.zeros(len(columns), dtype=bool)
+    if white_list is not None:
+        selected |= columns.isin(set(white_list))
+    if date_range is not None:
+        start, end = (pd.Timestamp(bound).date() for bound in date_range)
+        dates = [_date_label(label) for label in columns]
+        selected |= np.array([date is not None and start <= date <= end for date in dates], dtype=bool)
+    if pattern is not None:
+        regex = re.compile(pattern)
+        selected |= np.array([regex.search(str(label)) is not None for label in columns], dtype=bool)
+    return selected
+
+
+def filter_drop_columns(df, white_list=None, date_range=None, pattern=None):
+    """
+    Drop columns from a DataFrame except those selected by the whitelist, the date range or the pattern.
+    A column is kept if any of the given selectors selects it. The selectors spare enumerating the columns of wide
+    tables, e.g. one column per day.
 
     Parameters:
     df (pd.DataFrame): The DataFrame to operate on.
-    white_list (list): List of columns to keep.
+    white_list (list): List of columns to keep. All of them have to exist in the DataFrame.
+    date_range (tuple): Start and end date (inclusive, as dates or date strings) of the date columns to keep, see
+                        filter_transform_to_datetime(do_columns=True).
+    pattern (str): Regular expression, the columns whose names contain a match are kept.
 
     Returns:
-    pd.DataFrame: DataFrame with only the columns in the whitelist.
+    pd.DataFrame: DataFrame with only the selected columns.
     """
 
     try:
         logging.info(f"Attempting to drop non-whitelisted columns")
 
         # Check if whitelist columns exist in DataFrame
-        missing_columns = [col for col in white_list if col not in df.columns]
-        if missing_columns:
-            raise ValueError \
-                (f"The following columns in the whitelist are missing from the DataFrame: {missing_columns}")
+        if white_list is not None:
+            existing_columns = set(df.columns)
+            missing_columns = [col for col in white_list if col not in existing_columns]
+            if missing_columns:
+                raise ValueError \
+                    (f"The following columns in the whitelist are missing from the DataFrame: {missing_columns}")
 
-        # Drop columns not in the whitelist
-        columns_to_drop = [col for col in df.columns if col not in white_list]
-        df_dropped = df.drop(columns=columns_to_drop)
+        # Drop columns not selected
+        df_dropped = df.loc[:, _column_mask(df.columns, white_list, date_range, pattern)]
 
         if len(list(df_dropped.columns)) < 15:
             logging.info(f"Successfully dropped columns. Remaining columns: {list(df_dropped.columns)}")
@@ -53,64 +154,493 @@ class Strategy(Enum):
     DROP_ROW = auto()
     MODE = auto()
     MEDIAN = auto()
+    INTERPOLATE = auto()
+
+# Maximum number of distinct values per column (and group) kept by the StreamingImputer for the MEDIAN strategy.
+# Beyond that, neighbouring values are merged, so that the median of a stream is approximated with bounded memory.
+SKETCH_SIZE = 10_000
+
+# Maximum number of rows the StreamingImputer holds back while waiting for the next present value (BFILL, INTERPOLATE).
+# Beyond that, the rows are passed on with the values available so far.
+STREAMING_MAX_HELD_ROWS = 1_000_000
 
-def filter_handle_missing_values(df, column, threshold=0, strategy=Strategy.DROP_ROW):
+
+def _edge_values(values, last=False):
     """
-    Handle missing values in a specific column of a DataFrame based on a given strategy.
+    Helper function to get the first (or last) present value of every column.
 
     Parameters:
-    df (pd.DataFrame): The DataFrame to operate on.
-    column (str): The column to handle missing values for.
-    threshold (float): Threshold of missing values (0-1) after which the strategy is applied.
-    strategy (Strategy): Strategy for handling missing values.
+    values (pd.DataFrame): The columns.
+    last (bool): Flag indicating that the last instead of the first present values are requested.
 
     Returns:
-    pd.DataFrame: DataFrame with missing values handled in the specified column.
+    dict: Maps each column with at least one present value to its first (or last) present value.
     """
+    edges = {}
+    for col in values.columns:
+        present = values[col].notna().to_numpy()
+        if present.any():
+            edges[col] = values[col].iloc[len(present) - 1 - present[::-1].argmax() if last else present.argmax()]
+    return edges
 
-    try:
-        temp_df = copy.deepcopy(df) # Avoid making in place changes to the dataframe
 
-        # Calculate the percentage of missing values in the column
-        missing_ratio = temp_df[column].isnull().mean()
+def _statistic_from_counts(counts, strategy):
+    """
+    Helper function to compute the mode or median of a column from its value counts, e.g. the merged value counts of
+    several chunks. Ties of the mode are broken by the smallest value and the median of an even number of values is the
+    mean of the two middle values, as for pd.Series.mode and pd.Series.median.
 
-        if missing_ratio > threshold:
-            logging.info \
-                (f"Column '{column}' has {missing_ratio * 100:.2f}% missing values, applying {strategy.name} strategy")
+    Parameters:
+    counts (pd.Series): The number of occurrences, indexed by value.
+    strategy (Strategy): Either MODE or MEDIAN.
 
-            if strategy == Strategy.BFILL:
-                temp_df[column] = temp_df[column].bfill().ffill()
-                logging.info(f"Applied back fill strategy to column '{column}'")
+    Returns:
+    The mode or median of the column, or NaN if there are no values.
+    """
+    counts = counts[counts > 0].sort_index()
+    if counts.empty:
+        return float('nan')
+    if strategy == Strategy.MODE:
+        return counts.index[counts.to_numpy().argmax()]
 
-            elif strategy == Strategy.FFILL:
-                temp_df[column] = temp_df[column].bfill().ffill()
-                logging.info(f"Applied forward fill strategy to column '{column}'")
+    positions = counts.cumsum()
+    total = positions.iloc[-1]
+    middle = [(total - 1) // 2, total // 2]
+    return pd.Series(counts.index[positions.searchsorted(middle, side='right')]).mean()
 
-            elif strategy == Strategy.DROP_ROW:
-                temp_df = temp_df.dropna(subset=[column])
-                logging.info(f"Dropped rows with missing values in column '{column}'")
 
-            elif strategy == Strategy.MODE:
-                mode_value = temp_df[column].mode()[0]
-                temp_df[column] = temp_df[column].fillna(mode_value)
-                logging.info(f"Applied mode imputation to column '{column}' with mode value {mode_value}")
+def _value_counts(df, col, group_by=None):
+    """
+    Helper function to count the present values of a column, optionally per group.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame.
+    col (str): The column to count the values of.
+    group_by (str): The column holding the groups, or None.
+
+    Returns:
+    pd.Series: The number of occurrences, indexed by value or by group and value.
+    """
+    if group_by is None:
+        return df[col].value_counts()
+    counts = df.groupby([group_by, col], dropna=False, observed=True).size()
+    return counts[counts.index.get_level_values(1).notna()]
 
-            elif strategy == Strategy.MEDIAN:
-                median_value = temp_df[column].median()
-                temp_df[column] = temp_df[column].fillna(median_value)
-                logging.info(f"Applied median imputation to column '{column}' with median value {median_value}")
 
+def _fill_values_from_counts(df, col, counts, strategy, group_by=None):
+    """
+    Helper function to get the values the missing values of a column are filled with, from its (merged) value counts.
+    With groups, every row gets the statistic of its group, or the statistic of the whole column for groups without
+    present values.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to fill.
+    col (str): The column to fill.
+    counts (pd.Series): The value counts as returned by _value_counts.
+    strategy (Strategy): Either MODE or MEDIAN.
+    group_by (str): The column holding the groups, or None.
+
+    Returns:
+    The fill value, or a pd.Series with the fill value of every row.
+    """
+    if group_by is None:
+        return _statistic_from_counts(counts, strategy)
+    overall = _statistic_from_counts(counts.groupby(level=1).sum(), strategy)
+    per_group = counts.groupby(level=0, dropna=False).apply(
+        lambda group: _statistic_from_counts(group.droplevel(0), strategy))
+    return df[group_by].map(per_group).fillna(overall)
+
+
+def _compact_counts(counts, size=SKETCH_SIZE):
+    """
+    Helper function to bound the memory of value counts by merging neighbouring values into one value per quantile bin.
+
+    Parameters:
+    counts (pd.Series): The number of occurrences, indexed by value.
+    size (int): The maximum number of values kept.
+
+    Returns:
+    pd.Series: The compacted value counts.
+    """
+    if len(counts) <= size:
+        return counts
+    counts = counts.sort_index()
+    bins = ((counts.cumsum() - counts) * size // counts.sum()).to_numpy()
+    values = counts.index.to_series().groupby(bins).first()
+    return pd.Series(counts.groupby(bins).sum().to_numpy(), index=pd.Index(values.to_numpy(), name=counts.index.name),
+                     name=counts.name)
+
+
+def _interpolate(df, columns, group_by=None, date_column=None, limit_direction='both', positions=None):
+    """
+    Helper function to interpolate missing values linearly, along the dates of a date column if given.
+    Rows without a date cannot be placed on the time axis and are left unchanged.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame.
+    columns (list): The numeric columns to interpolate.
+    group_by (str): The column holding the groups, which are interpolated separately, or None.
+    date_column (str): The datetime column to interpolate along, or None to interpolate along the row order.
+    limit_direction (str): 'both' to also fill leading and trailing missing values with the nearest present value,
+                           'backward' to keep the trailing missing values.
+    positions (np.ndarray): The position of every row in the row order, if the DataFrame is a selection of rows.
+
+    Returns:
+    pd.DataFrame: The interpolated columns.
+    """
+    values = df[columns].reset_index(drop=True)
+    result = values.copy()
+    if date_column:
+        usable = np.flatnonzero(df[date_column].notna().to_numpy())
+        x = df[date_column].to_numpy().astype('datetime64[ns]').astype('int64')
+    else:
+        usable = np.arange(len(df))
+        x = np.arange(len(df)) if positions is None else np.asarray(positions)
+    keys = df[group_by].to_numpy()[usable] if group_by else np.zeros(len(usable))
+
+    for indices in pd.Series(keys).groupby(keys, dropna=False).indices.values():
+        rows = usable[indices]
+        rows = rows[np.argsort(x[rows], kind='stable')]
+        group = values.iloc[rows].set_axis(x[rows]).interpolate(method='index', limit_direction=limit_direction)
+        result.iloc[rows] = group.to_numpy()
+    return result.set_axis(df.index)
+
+
+def _impute(df, columns, strategy, group_by=None, date_column=None, final=True, positions=None):
+    """
+    Helper function to impute the missing values of columns with a fill or interpolation strategy in a single pass.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame.
+    columns (list): The columns to impute.
+    strategy (Strategy): One of BFILL, FFILL and INTERPOLATE.
+    group_by (str): The column holding the groups, which are imputed separately, or None.
+    date_column (str): The datetime column to interpolate along, or None.
+    final (bool): Flag indicating that missing values without a later present value are filled as well. The
+                  StreamingImputer keeps them until the next chunk arrives.
+    positions (np.ndarray): The position of every row in the row order, see _interpolate.
+
+    Returns:
+    pd.DataFrame: The imputed columns.
+    """
+    values = df[columns]
+    if strategy == Strategy.INTERPOLATE:
+        return _interpolate(df, columns, group_by, date_column, 'both' if final else 'backward', positions)
+
+    grouped = (lambda v: v.groupby(df[group_by].to_numpy(), dropna=False, sort=False)) if group_by else (lambda v: v)
+    if strategy == Strategy.FFILL:
+        filled = grouped(values).ffill()
+        # Leading missing values have no previous value and take the first present value instead
+        return grouped(filled).bfill() if group_by else filled.fillna(_edge_values(values))
+
+    filled = grouped(values).bfill()
+    if not final:
+        return filled
+    # Trailing missing values have no next value and take the last present value instead
+    return grouped(filled).ffill() if group_by else filled.fillna(_edge_values(values, last=True))
+
+
+class StreamingImputer:
+    """
+    Imputes the missing values of a stream of DataFrame chunks, see filter_handle_missing_values.
+
+    The fill strategies and the interpolation hold back the rows whose next present value has not arrived yet and pass
+    them on once it does, keeping only the last present value of every column (and group) of the earlier chunks.
+    The rows then get the same values as if the whole DataFrame was imputed at once. The MODE and MEDIAN strategies fill
+    every chunk with the statistics of all rows seen so far, from value counts that are compacted for the median, so that
+    the early chunks are filled with approximate statistics.
+    """
+
+    def __init__(self):
+        self._rows = 0
+        self._missing = None
+        self._columns = []  # The columns the strategy is applied to, once they exceeded the threshold
+        self._counts = {}
+        self._context = None  # The rows of the last present values passed on, for the fill strategies
+        self._held = None  # The rows held back until their next present value arrives
+        self._positions = np.arange(0)  # The positions of the context and held back rows in the stream
+        self._args = None
+
+    def _update_columns(self, df, columns, threshold, strategy):
+        self._rows += len(df)
+        missing = df[columns].isnull().sum()
+        self._missing = missing if self._missing is None else self._missing.add(missing, fill_value=0)
+        for col, count in self._missing.items():
+            missing_ratio = count / self._rows if self._rows else 0
+            if missing_ratio > threshold and col not in self._columns:
+                logging.info(f"Column '{col}' has {missing_ratio * 100:.2f}% missing values in the rows seen so far, applying {strategy.name} strategy")
+                self._columns.append(col)
+
+    def _context_rows(self, window):
+        # The positions of the rows holding the last present value of every column and group
+        rows = set()
+        keys = window[self._args['group_by']].to_numpy() if self._args['group_by'] else np.zeros(len(window))
+        usable = window[self._args['date_column']].notna().to_numpy() if self._args['date_column'] else True
+        for col in self._columns:
+            present = np.flatnonzero(window[col].notna().to_numpy() & usable)
+            rows.update(pd.Series(present).groupby(keys[present], dropna=False).last().tolist())
+        return np.array(sorted(rows), dtype=int)
+
+    def impute(self, df, columns, threshold=0, strategy=Strategy.MEDIAN, group_by=None, date_column=None):
+        """
+        Impute the missing values of the next chunk.
+
+        Parameters:
+        df (pd.DataFrame): The next chunk.
+        columns (list): The columns to handle missing values for.
+        threshold (float): Threshold of missing values (0-1) after which the strategy is applied, compared to the
+                           missing values of all rows seen so far.
+        strategy (Strategy): Strategy for handling missing values, except DROP_ROW which needs no state.
+        group_by (str): The column holding the groups, which are imputed separately, or None.
+        date_column (str): The datetime column to interpolate along, or None.
+
+        Returns:
+        pd.DataFrame: The imputed rows that can be passed on, which may include held back rows of earlier chunks.
+        """
+        self._args = {'strategy': strategy, 'group_by': group_by, 'date_column': date_column}
+        self._update_columns(df, columns, threshold, strategy)
+        if not self._columns:
+            return df
+
+        if strategy in (Strategy.MODE, Strategy.MEDIAN):
+            temp_df = df.copy(deep=False)
+            for col in self._columns:
+                # A column whose statistic cannot be computed, e.g. the median of strings, is left as it is, as for
+                # the whole DataFrame, without affecting the other columns
+                try:
+                    counts = _value_counts(df, col, group_by)
+                    if col in self._counts:
+                        counts = pd.concat([self._counts[col], counts]).groupby(level=list(range(counts.index.nlevels)),
+                                                                                dropna=False).sum()
+                    if strategy == Strategy.MEDIAN:
+                        counts = (_compact_counts(counts) if group_by is None else
+                                  counts.groupby(level=0, dropna=False, group_keys=False).apply(_compact_counts))
+                    self._counts[col] = counts
+                    temp_df[col] = temp_df[col].fillna(_fill_values_from_counts(df, col, counts, strategy, group_by))
+                except Exception as e:
+                    logging.error(f"Unexpected error while handling missing values in column '{col}' with strategy '{strategy.name}': {e}")
             return temp_df
-        else:
-            logging.info \
-                (f"Column '{column}' has {missing_ratio * 100:.2f}% missing values, which is lower than the threshold of {threshold * 100:.2f}%. Not applying a strategy.")
+
+        parts = [part for part in (self._context, self._held) if part is not None]
+        context_rows = len(self._context) if self._context is not None else 0
+        window = pd.concat(parts + [df]) if parts else df
+        start = self._rows - len(df)
+        positions = np.concatenate([self._positions, np.arange(start, self._rows)])
+        imputed = _impute(window, self._columns, strategy, group_by, date_column, final=False, positions=positions)
+
+        # Rows with a missing value that could not be imputed yet are held back, together with all following rows
+        unresolved = imputed.isna().any(axis=1).to_numpy(copy=True)
+        if date_column and strategy == Strategy.INTERPOLATE:
+            unresolved &= window[date_column].notna().to_numpy()
+        unresolved[:context_rows] = False
+        end = unresolved.argmax() if unresolved.any() else len(window)
+        if len(window) - end > STREAMING_MAX_HELD_ROWS:
+            logging.warning(f"More than {STREAMING_MAX_HELD_ROWS} rows are waiting for a present value, passing them on without imputing")
+            end = len(window)
+
+        result = window.iloc[context_rows:end].copy(deep=False)
+        result[self._columns] = imputed.iloc[context_rows:end]
+        self._held = window.iloc[end:] if end < len(window) else None
+        context = self._context_rows(window.iloc[:end])
+        self._context = window.iloc[context]
+        self._positions = np.concatenate([positions[context], positions[end:]])
+        return result
+
+    def flush(self):
+        """
+        Impute the rows held back at the end of the stream, which have no later present value.
+
+        Returns:
+        pd.DataFrame: The imputed rows, or None if no rows are held back.
+        """
+        held, self._held = self._held, None
+        if held is None:
+            return None
+        context_rows = len(self._context) if self._context is not None else 0
+        window = pd.concat([self._context, held]) if context_rows else held
+        imputed = _impute(window, self._columns, self._args['strategy'], self._args['group_by'],
+                          self._args['date_column'], positions=self._positions)
+        result = held.copy(deep=False)
+        result[self._columns] = imputed.iloc[context_rows:]
+        return result
+
+
+def filter_handle_missing_values(df, column, threshold=0, strategy=Strategy.DROP_ROW, inplace=False, group_by=None,
+                                 date_column=None, imputer=None):
+    """
+    Handle missing values in specific columns of a DataFrame based on a given strategy.
+    If multiple columns are given, the missing values of all of them are resolved in a single pass over the DataFrame.
+    FFILL carries the previous present value forward and BFILL the next present value backward. Missing values at
+    the start (FFILL) or end (BFILL) of a column have no such value and take the nearest present value instead.
+    INTERPOLATE interpolates linearly between the neighbouring present values, along the dates of date_column if given.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to operate on.
+    column (str/list): The column or list of columns to handle missing values for.
+    threshold (float): Threshold of missing values (0-1) after which the strategy is applied.
+    strategy (Strategy): Strategy for handling missing values.
+    inplace (bool): Flag indicating if the DataFrame is to be modified in place instead of returning a modified copy.
+    group_by (str): The column holding the groups that are imputed separately, e.g. the median per region. Rows of
+                    groups without present values are imputed with the statistic of the whole column (MODE, MEDIAN).
+    date_column (str): The datetime column the INTERPOLATE strategy interpolates along. Default behaviour is to
+                       interpolate along the row order.
+    imputer (StreamingImputer): The state of the imputation of a stream of chunks, see apply_filters. Default
+                                behaviour is to impute the DataFrame on its own.
+
+    Returns:
+    pd.DataFrame: DataFrame with missing values handled in the specified columns.
+    """
+
+    try:
+        # If column is not a list, convert it to a list
+        columns = column if isinstance(column, list) else [column]
+
+        if imputer is not None and strategy != Strategy.DROP_ROW:
+            return imputer.impute(df, columns, threshold=threshold, strategy=strategy, group_by=group_by,
+                                  date_column=date_column)
+
+        # Calculate the percentage of missing values in all columns at once
+        missing_ratios = df[columns].isnull().mean()
+
+        columns_to_handle = []
+        for col, missing_ratio in missing_ratios.items():
+            if missing_ratio > threshold:
+                logging.info \
+                    (f"Column '{col}' has {missing_ratio * 100:.2f}% missing values, applying {strategy.name} strategy")
+                columns_to_handle.append(col)
+            else:
+                logging.info \
+                    (f"Column '{col}' has {missing_ratio * 100:.2f}% missing values, which is lower than the threshold of {threshold * 100:.2f}%. Not applying a strategy.")
+
+        if not columns_to_handle:
             return df
 
+        temp_df = _working_copy(df, inplace) # Avoid making in place changes to the dataframe, unless requested
+
+        if strategy in (Strategy.BFILL, Strategy.FFILL, Strategy.INTERPOLATE):
+            temp_df[columns_to_handle] = _impute(temp_df, columns_to_handle, strategy, group_by, date_column)
+            names = {Strategy.BFILL: 'back fill', Strategy.FFILL: 'forward fill', Strategy.INTERPOLATE: 'interpolation'}
+            logging.info(f"Applied {names[strategy]} strategy to columns {columns_to_handle}")
+
+        elif strategy == Strategy.DROP_ROW:
+            temp_df.dropna(subset=columns_to_handle, inplace=True)
+            logging.info(f"Dropped rows with missing values in columns {columns_to_handle}")
+
+        elif strategy in (Strategy.MODE, Strategy.MEDIAN) and group_by is not None:
+            for col in columns_to_handle:
+                try:
+                    counts = _value_counts(temp_df, col, group_by)
+                    temp_df[col] = temp_df[col].fillna(_fill_values_from_counts(temp_df, col, counts, strategy, group_by))
+                    logging.info(f"Applied {strategy.name.lower()} imputation per '{group_by}' to column '{col}'")
+                except Exception as e:
+                    logging.error \
+                        (f"Unexpected error while handling missing values in column '{col}' with strategy '{strategy.name}': {e}")
+
+        elif strategy in (Strategy.MODE, Strategy.MEDIAN):
+            # Compute the statistic of all columns in one call where possible, then fill all columns with a single fillna call
+            try:
+                if strategy == Strategy.MODE:
+                    statistics = temp_df[columns_to_handle].mode().iloc[0]
+                else:
+                    statistics = temp_df[columns_to_handle].median()
+                fill_values = statistics.dropna().to_dict()
+            except Exception:
+                # Columns of different types, e.g. dates and strings, are handled one by one
+                fill_values = {}
+                for col in columns_to_handle:
+                    try:
+                        if strategy == Strategy.MODE:
+                            fill_values[col] = temp_df[col].mode()[0]
+                        else:
+                            fill_values[col] = temp_df[col].median()
+                    except Exception as e:
+                        logging.error \
+                            (f"Unexpected error while handling missing values in column '{col}' with strategy '{strategy.name}': {e}")
+            temp_df.fillna(value=fill_values, inplace=True)
+            for col, value in fill_values.items():
+                logging.info(f"Applied {strategy.name.lower()} imputation to column '{col}' with {strategy.name.lower()} value {value}")
+
+        return temp_df
+
     except Exception as e:
         logging.error \
             (f"Unexpected error while handling missing values in column '{column}' with strategy '{strategy.name}': {e}")
         return df
 
+# Conditions of a row predicate, see filter_rows_by_predicates
+PREDICATE_CONDITIONS = ('values', 'min', 'max', 'after', 'before', 'notna')
+
+# Comparison of the range conditions, all of them are False for missing values
+_RANGE_CONDITIONS = {'min': operator.ge, 'max': operator.le, 'after': operator.gt, 'before': operator.lt}
+
+
+def _predicate_mask(df, predicates):
+    """
+    Helper function to evaluate the row predicates of several columns into one boolean mask.
+    Every condition is evaluated as a vectorized comparison and combined into the mask, so that the DataFrame is only
+    indexed once for all conditions instead of once per condition.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to evaluate the predicates on.
+    predicates (dict): Maps a column name to its conditions, see filter_rows_by_predicates.
+
+    Returns:
+    np.ndarray: Boolean mask of the rows that satisfy all predicates.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column_name, conditions in predicates.items():
+        if column_name not in df.columns:
+            raise ValueError(f"Column '{column_name}' does not exist in the DataFrame.")
+        unknown = set(conditions) - set(PREDICATE_CONDITIONS)
+        if unknown:
+            raise ValueError(f"Unknown conditions {sorted(unknown)} for column '{column_name}', expected {PREDICATE_CONDITIONS}")
+
+        values = df[column_name]
+        if conditions.get('notna'):
+            mask &= values.notna().to_numpy(dtype=bool)
+        if conditions.get('values') is not None:
+            allowed = conditions['values'] if isinstance(conditions['values'], list) else [conditions['values']]
+            mask &= values.isin(allowed).to_numpy(dtype=bool)
+        for condition, compare in _RANGE_CONDITIONS.items():
+            if conditions.get(condition) is not None:
+                bound = conditions[condition]
+                if pd.api.types.is_datetime64_any_dtype(values.dtype):
+                    bound = pd.Timestamp(bound)  # Date windows can be given as date strings
+                mask &= compare(values, bound).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+def filter_rows_by_predicates(df, predicates):
+    """
+    Keep only the rows that satisfy a combined predicate over several columns.
+    All conditions are evaluated into a single boolean mask (see _predicate_mask), so that filtering by several
+    columns produces one new DataFrame instead of one per condition.
+
+    Each column maps to a dict of conditions, all of which have to hold:
+    - values: The value or list of values to keep, as for filter_rows_by_values.
+    - min, max: Inclusive bounds, e.g. for counts.
+    - after, before: Exclusive bounds, e.g. a date window (dates can be given as strings for datetime columns).
+    - notna: If True, rows with a missing value are dropped.
+    Rows with a missing value never satisfy the values and bound conditions.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to filter.
+    predicates (dict): Maps a column name to its conditions, e.g. {'DIAG1': {'values': ['U071', 'U072']},
+                       'FECHA_DEF': {'after': '2020-01-01', 'notna': True}}.
+
+    Returns:
+    pd.DataFrame: DataFrame with only the rows satisfying all predicates.
+    """
+
+    try:
+        mask = _predicate_mask(df, predicates)
+        logging.info(f"Filtering rows by the predicates {predicates}. Number of rows dropped: {len(df) - int(mask.sum())}")
+        return df[mask]
+    except Exception as e:
+        logging.error(f"Unexpected error while filtering rows by the predicates {predicates}: {e}")
+        return df
+
+
 def filter_rows_by_values(df, column_name, column_values):
     """
     Filter rows in a DataFrame based on column values and drop all rows where values do not match the given values.
@@ -135,7 +665,7 @@ def filter_rows_by_values(df, column_name, column_values):
             column_values = [column_values]
 
         # Create a mask for the matching rows
-        mask = df[column_name].isin(column_values)
+        mask = _predicate_mask(df, {column_name: {'values': column_values}})
         affected_rows = len(df) - mask.sum()  # Calculate the number of rows that do not match
 
         # Filter the DataFrame
@@ -148,32 +678,114 @@ def filter_rows_by_values(df, column_name, column_values):
         logging.error(f"Unexpected error while filtering rows by '{column_name}' with value '{column_values}': {e}")
         return df
 
-def _try_convert_to_datetime(column_name):
+
+def filter_rows_after(df, column_name, high_water_mark):
     """
-    Helper function to check whether a column name can be converted to a datetime object.
-    Returns a date object, if a conversion is possible, otherwise returns the column name.
+    Keep only the rows whose date lies after a high-water mark, e.g. the latest date already loaded by a previous run.
+    Rows without a date cannot be placed relative to the mark and are dropped as well.
 
     Parameters:
-    column_name (str): The column name to be checked for conversion into a datetime object.
+    df (pd.DataFrame): The DataFrame to filter.
+    column_name (str): The name of the datetime column to compare, see filter_transform_to_datetime.
+    high_water_mark: The date after which rows are kept, as a pd.Timestamp or a date string. None keeps all rows.
 
     Returns:
-    pd.DataTime/str: A date object, if a conversion is possible, otherwise returns the column name.
+    pd.DataFrame: DataFrame with only the rows after the high-water mark.
     """
-    try:
-        return pd.to_datetime(column_name, dayfirst=True, errors='raise').date()
-    except ValueError:
-        return column_name
 
+    if high_water_mark is None:
+        return df
+
+    # Unlike the other filters, errors are not logged and swallowed here: silently keeping all rows would
+    # append rows that have already been loaded.
+    if column_name not in df.columns:
+        raise ValueError(f"Column '{column_name}' does not exist in the DataFrame.")
+    if not pd.api.types.is_datetime64_any_dtype(df[column_name]):
+        raise TypeError(f"Column '{column_name}' has to be converted into datetime format before filtering by date")
 
-def filter_transform_to_datetime(df, column=None, do_columns=False):
+    mask = df[column_name] > pd.Timestamp(high_water_mark)
+    logging.info(f"Column '{column_name}': Keeping {mask.sum()} of {len(df)} rows after {high_water_mark}")
+    return df[mask]
+
+# Candidate formats for the date inference, covering the formats used by the data portals.
+# Month-first formats are listed before day-first formats, the order is reversed for dayfirst=True.
+DATE_FORMATS = [
+    '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y/%m/%d',
+    '%m/%d/%Y', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p',
+    '%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %I:%M:%S %p', '%d-%m-%Y', '%d.%m.%Y', '%d:%m:%Y',
+]
+
+# Number of distinct values the date format is inferred from.
+DATE_SAMPLE_SIZE = 1000
+
+
+def _infer_datetime_format(values, dayfirst=False):
+    """
+    Helper function to infer the date format of a column from a sample of its distinct values.
+    The candidate format that parses the most sampled values is chosen.
+
+    Parameters:
+    values (pd.Series): The date values in string format.
+    dayfirst (bool): Flag indicating that ambiguous dates like 01/02/2020 are to be read with the day first.
+
+    Returns:
+    str: The inferred format, or None if no candidate format parses any of the sampled values.
+    """
+    sample = pd.Series(values.dropna().unique()[:DATE_SAMPLE_SIZE]).astype(str).str.strip()
+    if sample.empty:
+        return None
+
+    day_first_formats = [f for f in DATE_FORMATS if f.startswith('%d')]
+    other_formats = [f for f in DATE_FORMATS if not f.startswith('%d')]
+    candidates = day_first_formats + other_formats if dayfirst else other_formats + day_first_formats
+
+    best_format, best_count = None, 0
+    for date_format in candidates:
+        count = pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum()
+        if count > best_count:
+            best_format, best_count = date_format, count
+            if count == len(sample):
+                break
+    return best_format
+
+
+def _convert_column_names_to_dates(columns, date_format=None):
+    """
+    Helper function to convert all column names that represent a date into date objects in one vectorized call.
+
+    Parameters:
+    columns (pd.Index): The column names to be checked for conversion into date objects.
+    date_format (str): The strftime format of the date column names. Default behaviour is to infer the format.
+
+    Returns:
+    dict: Maps each column name that could be converted to its date object.
+    """
+    names = pd.Series(columns.astype(str), index=columns)
+    if date_format is None:
+        date_format = _infer_datetime_format(names, dayfirst=True)
+        if date_format is None:
+            return {}
+
+    parsed = pd.to_datetime(names, format=date_format, errors='coerce', cache=True).dropna()
+    return dict(zip(parsed.index, parsed.dt.date))
+
+
+def filter_transform_to_datetime(df, column=None, do_columns=False, inplace=False, date_format=None, dayfirst=False,
+                                 normalize=True):
     """
     Transform a column in various formats to a uniform datetime datatype.
     Alternatively transform column names to datetime datatype.
+    The date format is inferred once from a sample of the column, unless it is given explicitly, so that the whole
+    column is converted by the vectorized parser instead of parsing every value individually.
 
     Parameters:
     df (pd.DataFrame): The DataFrame containing the date column.
     column (str): The column name containing date values in various formats.
     doColumns (bool): If true, all column names that represent a date will be transformed to uniform datetime objects
+    inplace (bool): Flag indicating if the DataFrame is to be modified in place instead of returning a modified copy.
+    date_format (str): The strftime format of the date values (or date column names), e.g. '%d/%m/%Y'. Default behaviour is to infer the format.
+    dayfirst (bool): Flag indicating that ambiguous dates like 01/02/2020 are to be read with the day first when inferring the format.
+    normalize (bool): Flag indicating if the time component is to be dropped, keeping only the day.
 
     Returns:
     pd.DataFrame: DataFrame with the date column transformed to datetime.
@@ -181,22 +793,35 @@ def filter_transform_to_datetime(df, column=None, do_columns=False):
 
     try:
 
-        temp_df = copy.deepcopy(df) # Avoid making in place changes to the dataframe
+        temp_df = _working_copy(df, inplace) # Avoid making in place changes to the dataframe, unless requested
         if do_columns:
 
             # Transform columns that can be parsed as datetime objects
-            new_columns = {col: _try_convert_to_datetime(col) for col in temp_df.columns}
+            new_columns = _convert_column_names_to_dates(temp_df.columns, date_format=date_format)
             temp_df.rename(columns=new_columns, inplace=True)
             logging.info(f"Successfully transformed {len(new_columns)} column names to datetime")
         elif column is not None:
             logging.info(f"Transforming column '{column}' to datetime")
 
-            # Suppress unnecessary warning here
-            import warnings
-            warnings.filterwarnings("ignore", category=UserWarning)
-            temp_df[column] = pd.to_datetime(temp_df[column], errors='coerce').dt.date
-
-            temp_df[column] = pd.to_datetime(temp_df[column], errors='coerce').dt.date
+            if pd.api.types.is_datetime64_any_dtype(temp_df[column]):
+                converted = temp_df[column]
+            else:
+                if date_format is None:
+                    date_format = _infer_datetime_format(temp_df[column], dayfirst=dayfirst)
+
+                if date_format is not None:
+                    logging.info(f"Parsing column '{column}' with date format '{date_format}'")
+                    converted = pd.to_datetime(temp_df[column], format=date_format, errors='coerce', cache=True)
+                else:
+                    logging.warning(f"Could not infer a date format for column '{column}', parsing values individually")
+                    converted = pd.to_datetime(temp_df[column], dayfirst=dayfirst, errors='coerce', cache=True)
+
+                # Values that were present, but could not be parsed, are now missing
+                failures = int((converted.isna() & temp_df[column].notna()).sum())
+                if failures:
+                    logging.warning(f"{failures} values of column '{column}' could not be parsed as dates")
+
+            temp_df[column] = converted.dt.normalize() if normalize else converted
             logging.info(f"Successfully transformed column '{column}' to datetime")
         else:
             logging.error("Please provide an existing column name")
@@ -204,4 +829,175 @@ def filter_transform_to_datetime(df, column=None, do_columns=False):
         logging.error(f"Unexpected error while transforming column '{column}' to datetime: {e}")
         return df
 
-    return temp_df
\ No newline at end of file
+    return temp_df
+
+def filter_melt_date_columns(df, date_name='date', value_name='value'):
+    """
+    Melt a wide table with one column per date (as produced by filter_transform_to_datetime with do_columns=True)
+    into a long table with one row per date, which is cheaper to filter and store.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame with date objects as column names.
+    date_name (str): The name of the resulting date column.
+    value_name (str): The name of the resulting value column.
+
+    Returns:
+    pd.DataFrame: DataFrame with the remaining columns as identifiers, followed by the date and value columns.
+    """
+
+    try:
+        date_columns = [col for col in df.columns if isinstance(col, (datetime.date, pd.Timestamp))]
+        id_columns = [col for col in df.columns if col not in set(date_columns)]
+        if not date_columns:
+            logging.error("The DataFrame does not contain any date columns to melt")
+            return df
+
+        melted_df = df.melt(id_vars=id_columns, value_vars=date_columns, var_name=date_name, value_name=value_name)
+        melted_df[date_name] = pd.to_datetime(melted_df[date_name])
+        logging.info(f"Successfully melted {len(date_columns)} date columns into {len(melted_df)} rows")
+        return melted_df
+    except Exception as e:
+        logging.error(f"Unexpected error while melting the date columns: {e}")
+        return df
+
+
+# Share of distinct values up to which a string column is converted to the category dtype.
+CATEGORY_RATIO = 0.5
+
+def _optimized_dtype(series, to_category, to_integer):
+    """
+    Helper function to find the most memory-efficient dtype for a column, without losing information.
+
+    Parameters:
+    series (pd.Series): The column.
+    to_category (bool): Flag indicating if the column is to be converted to the category dtype, if it holds strings.
+    to_integer (bool): Flag indicating if the column is to be converted to a nullable integer dtype, if it holds whole numbers.
+
+    Returns:
+    pd.Series: The converted column, or None if its dtype is already optimal.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype) \
+            or pd.api.types.is_datetime64_any_dtype(dtype):
+        return None
+
+    if pd.api.types.is_string_dtype(dtype) or dtype == object:
+        return series.astype('category') if to_category else None
+
+    if pd.api.types.is_float_dtype(dtype):
+        values = series.dropna()
+        # Whole numbers with gaps, e.g. counts with missing values, become nullable integers
+        if to_integer and len(values) > 0 and (values == values.round()).all() and values.abs().max() < 2 ** 53:
+            series = series.astype('Int64')
+        else:
+            if dtype == 'float32':
+                return None
+            as_float32 = series.astype('float32')
+            return as_float32 if as_float32.astype(dtype).equals(series) else None
+
+    if pd.api.types.is_integer_dtype(series.dtype):
+        downcast = pd.to_numeric(series, downcast='integer')
+        return downcast if downcast.dtype != dtype else None
+    return None
+
+
+def filter_optimize_dtypes(df, categorical_columns=None, integer_columns=None, category_ratio=CATEGORY_RATIO,
+                           inplace=False):
+    """
+    Convert the columns of a DataFrame to memory-efficient dtypes, without losing information:
+    - Strings with few distinct values, like diagnosis codes or groups, become categories.
+    - Integers are downcast to the smallest integer dtype holding all values.
+    - Floats holding only whole numbers, e.g. counts with gaps left by filter_handle_missing_values, become nullable
+      integers. Other floats become float32 if this does not change any value.
+    The memory saved is logged. Parquet, Feather and SQLite preserve the optimized dtypes when the DataFrame is loaded.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to optimize.
+    categorical_columns (list): The string columns to convert to categories. Default behaviour is to convert every string
+                                column with at most category_ratio distinct values per row.
+    integer_columns (list): The float columns to convert to nullable integers. Default behaviour is to convert every float
+                            column holding only whole numbers.
+                            Give both kinds of columns explicitly for chunked datasets, so that all chunks get the same dtypes.
+    category_ratio (float): The maximum share (0-1) of distinct values for a string column to become a category.
+    inplace (bool): Flag indicating if the DataFrame is to be modified in place instead of returning a modified copy.
+
+    Returns:
+    pd.DataFrame: DataFrame with optimized dtypes.
+    """
+
+    try:
+        temp_df = _working_copy(df, inplace) # Avoid making in place changes to the dataframe, unless requested
+        memory_before = temp_df.memory_usage(deep=True).sum()
+
+        converted = {}
+        for col in temp_df.columns:
+            series = temp_df[col]
+            if categorical_columns is not None:
+                to_category = col in categorical_columns
+            else:
+                to_category = len(series) > 0 and series.nunique() <= category_ratio * len(series)
+            to_integer = integer_columns is None or col in integer_columns
+            optimized = _optimized_dtype(series, to_category, to_integer)
+            if optimized is not None:
+                temp_df[col] = optimized
+                converted[col] = f"{series.dtype} -> {optimized.dtype}"
+
+        memory_after = temp_df.memory_usage(deep=True).sum()
+        saved = 1 - memory_after / memory_before if memory_before else 0
+        if len(converted) < 15:
+            logging.info(f"Optimized the dtypes of {len(converted)} columns {converted}")
+        else:
+            logging.info(f"Optimized the dtypes of {len(converted)} columns")
+        logging.info(f"Memory usage reduced from {memory_before / 1e6:.2f} MB to {memory_after / 1e6:.2f} MB "
+                     f"({saved:.0%} saved)")
+        return temp_df
+    except Exception as e:
+        logging.error(f"Unexpected error while optimizing the dtypes: {e}")
+        return df
+
+
+def _apply_filters_to_chunks(chunks, filters):
+    """
+    Helper function to apply a filter chain to every chunk of a chunked DataFrame.
+    The rows held back by streaming imputers are passed through the remaining filters at the end of the stream.
+
+    Parameters:
+    chunks (iterator): The DataFrame chunks.
+    filters (list): Ordered list of (filter function, keyword arguments) tuples.
+
+    Returns:
+    iterator: The filtered chunks.
+    """
+    for chunk in chunks:
+        yield apply_filters(chunk, filters)
+
+    for position, (_, filter_args) in enumerate(filters):
+        imputer = filter_args.get('imputer')
+        rest = imputer.flush() if imputer is not None else None
+        if rest is not None:
+            yield apply_filters(rest, filters[position + 1:])
+
+
+def apply_filters(df, filters):
+    """
+    Apply an ordered chain of filters to a DataFrame, or lazily to every chunk of a chunked DataFrame.
+
+    Parameters:
+    df (pd.DataFrame/iterator): The DataFrame, or an iterator over DataFrame chunks as produced by extraction.extract_into_df.
+    filters (list): Ordered list of (filter function, keyword arguments) tuples, e.g. (filter_drop_columns, {'white_list': ['date']}).
+
+    Returns:
+    pd.DataFrame/iterator: The filtered DataFrame, or an iterator over the filtered chunks.
+    """
+
+    if not isinstance(df, pd.DataFrame):
+        # Missing values are imputed across the chunks, with one imputer per filter and stream
+        filters = [(filter_function, {**filter_args, 'imputer': StreamingImputer()})
+                   if getattr(filter_function, '__wrapped__', filter_function) is filter_handle_missing_values
+                   and filter_args.get('strategy', Strategy.DROP_ROW) != Strategy.DROP_ROW
+                   else (filter_function, filter_args) for filter_function, filter_args in filters]
+        return _apply_filters_to_chunks(df, filters)
+
+    for filter_function, filter_args in filters:
+        df = filter_function(df, **filter_args)
+    return df
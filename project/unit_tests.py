@@ -1,6 +1,26 @@
+import io
+import os
+import pstats
+import sqlite3
+import tempfile
+import tracemalloc
 import unittest
+from unittest import mock
 
+import extraction
+from aggregation import *
+from archive import ArchiveMissError, RawArchive
+from caching import DownloadCache
+from incremental import HighWaterMarks
+from loading import SQLITE_DB_NAME, append_df, load_chunks, load_df, load_df_to_sqlite, read_df
+from manifest import RunManifest, hash_config, hash_payload
+from instrumentation import RunReport
+from orchestration import Task, TaskStatus, run_dag
+from parallel import apply_filters_parallel, parallel_available
+from query_service import QueryService
+from replay_server import ReplayServer
 from transformation import *
+from validation import ValidationError, Validator, validate_df
 from test_helper import *
 
 
@@ -22,6 +42,41 @@ class MyTestCase(unittest.TestCase):
         # Assert that the date_of_death column is now a datetime object
         self.assertTrue(pd.api.types.is_datetime64_any_dtype(transformed_df['date_of_death']))
 
+    def test_create_mock_dataframe(self):
+        df = create_mock_dataframe(200, missing_ratio=0.25, seed=1)
+
+        # The generator is reproducible and introduces exactly the requested share of missing values
+        pd.testing.assert_frame_equal(df, create_mock_dataframe(200, missing_ratio=0.25, seed=1))
+        self.assertEqual(df['id'].isna().sum(), 50)
+        self.assertEqual(df['region'].isna().sum(), 50)
+        self.assertTrue(df['region'].dropna().str.fullmatch('[A-Z]{5}').all())
+
+    def test_filter_transform_to_datetime_format(self):
+        df = pd.DataFrame({'date': ['25/03/2021', '01/04/2021', 'unknown', None]})
+
+        # The day-first format is inferred from the values and unparseable values are reported
+        with self.assertLogs(level='WARNING') as logs:
+            transformed_df = filter_transform_to_datetime(df, column='date')
+        self.assertIn("1 values of column 'date' could not be parsed", logs.output[0])
+        self.assertEqual(transformed_df['date'].iloc[1], pd.Timestamp('2021-04-01'))
+
+        # An explicit format takes precedence over the inference
+        transformed_df = filter_transform_to_datetime(df, column='date', date_format='%m/%d/%Y')
+        self.assertEqual(transformed_df['date'].iloc[1], pd.Timestamp('2021-01-04'))
+
+    def test_filter_transform_to_datetime_columns(self):
+        df = pd.DataFrame({'nombre': ['Nacional'], '17-03-2020': [1], '18-03-2020': [2]})
+
+        # All date column names are converted, the remaining column names are kept
+        transformed_df = filter_transform_to_datetime(df, do_columns=True)
+        self.assertEqual(list(transformed_df.columns),
+                         ['nombre', pd.Timestamp('2020-03-17').date(), pd.Timestamp('2020-03-18').date()])
+
+        # Melting the date columns results in one row per date
+        melted_df = filter_melt_date_columns(transformed_df, value_name='deaths')
+        self.assertEqual(list(melted_df.columns), ['nombre', 'date', 'deaths'])
+        self.assertEqual(melted_df['deaths'].tolist(), [1, 2])
+
     def test_filter_rows_by_values(self):
 
         # Check the number of rows before filtering
@@ -33,6 +88,21 @@ class MyTestCase(unittest.TestCase):
         # Assert that there are about 90% of the rows left (with a margin of 5%, due to randomness in mock dataset creation)
         self.assertAlmostEqual(len(transformed_df), np.floor(self.num_rows * 0.9), delta=self.num_rows * 0.05)
 
+    def test_filter_rows_by_predicates(self):
+        df = filter_transform_to_datetime(self.df, column='date_of_death', date_format='%d:%m:%Y')
+        predicates = {'diag': {'values': 'U071'}, 'id': {'notna': True, 'max': 500},
+                      'date_of_death': {'after': '2021-01-01', 'before': '2022-01-01'}}
+        transformed_df = filter_rows_by_predicates(df, predicates)
+
+        # The combined predicate selects the same rows as the single conditions one after the other
+        expected = df[(df['diag'] == 'U071') & (df['id'] <= 500) & (df['date_of_death'] > '2021-01-01')
+                      & (df['date_of_death'] < '2022-01-01')]
+        self.assertGreater(len(expected), 0)
+        pd.testing.assert_frame_equal(transformed_df, expected)
+
+        # Unknown conditions leave the DataFrame unchanged
+        self.assertEqual(len(filter_rows_by_predicates(df, {'diag': {'equals': 'U071'}})), len(df))
+
     def test_filter_handle_missing_values(self):
 
         # Check that the number of missing values before filtering is greater than 0
@@ -47,6 +117,70 @@ class MyTestCase(unittest.TestCase):
             transformed_df = filter_handle_missing_values(self.df, 'id', strategy=strategy)
             self.assertEqual(transformed_df['id'].isnull().sum(), 0)
 
+    def test_filter_handle_missing_values_multiple_columns(self):
+        df = create_mock_dataframe(self.num_rows)
+
+        # Both columns are handled in a single call, without modifying the original DataFrame
+        transformed_df = filter_handle_missing_values(df, ['id', 'region'], strategy=Strategy.DROP_ROW)
+        self.assertEqual(transformed_df[['id', 'region']].isnull().sum().sum(), 0)
+        self.assertGreater(df[['id', 'region']].isnull().sum().sum(), 0)
+
+        # In place, the passed DataFrame itself is modified
+        filter_handle_missing_values(df, ['id', 'region'], strategy=Strategy.MODE, inplace=True)
+        self.assertEqual(df[['id', 'region']].isnull().sum().sum(), 0)
+
+    def test_filter_handle_missing_values_strategies(self):
+        df = pd.DataFrame({'date': pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-05', '2020-01-06', '2020-01-07']),
+                           'region': ['a', 'b', 'a', 'b', 'a'],
+                           'deaths': [np.nan, 2.0, np.nan, 4.0, 8.0]})
+
+        # Forward and back fill carry the values in their direction, the edges take the nearest present value
+        self.assertEqual(filter_handle_missing_values(df, 'deaths', strategy=Strategy.FFILL)['deaths'].tolist(), [2, 2, 2, 4, 8])
+        self.assertEqual(filter_handle_missing_values(df, 'deaths', strategy=Strategy.BFILL)['deaths'].tolist(), [2, 2, 4, 4, 8])
+
+        # The interpolation takes the gaps between the dates into account
+        interpolated_df = filter_handle_missing_values(df, 'deaths', strategy=Strategy.INTERPOLATE, date_column='date')
+        self.assertEqual(interpolated_df['deaths'].tolist(), [2, 2, 3.5, 4, 8])
+
+        # Grouped imputation uses the statistic of the row's group
+        grouped_df = filter_handle_missing_values(df, 'deaths', strategy=Strategy.MEDIAN, group_by='region')
+        self.assertEqual(grouped_df['deaths'].tolist(), [8, 2, 8, 4, 8])
+
+    def test_streaming_imputer(self):
+        df = create_mock_dataframe(self.num_rows, missing_ratio=0.3, seed=4)
+
+        # Imputing chunk by chunk gives the same result as imputing the whole DataFrame, also across the chunk boundaries
+        for strategy in (Strategy.FFILL, Strategy.BFILL, Strategy.INTERPOLATE):
+            filters = [(filter_handle_missing_values, {'column': 'id', 'strategy': strategy, 'group_by': 'gender'})]
+            chunks = apply_filters((df.iloc[i:i + 64] for i in range(0, len(df), 64)), filters)
+            pd.testing.assert_frame_equal(pd.concat(list(chunks)), apply_filters(df, filters))
+
+    def test_streaming_imputer_non_numeric_median(self):
+        df = pd.DataFrame({'date': pd.to_datetime(['2021-01-01', None] * 50),
+                           'recovered': (['Recuperado', 'Fallecido', None, 'Recuperado'] * 25)})
+
+        # A column without a median does not keep the other columns of the later chunks from being imputed
+        filters = [(filter_handle_missing_values, {'column': ['date', 'recovered'], 'strategy': Strategy.MEDIAN})]
+        chunks = apply_filters((df.iloc[i:i + 16] for i in range(0, len(df), 16)), filters)
+        chunked_df = pd.concat(list(chunks))
+        pd.testing.assert_frame_equal(chunked_df, apply_filters(df, filters))
+        self.assertEqual(chunked_df['date'].isna().sum(), 0)
+
+    def test_filter_optimize_dtypes(self):
+        df = create_mock_dataframe(self.num_rows, seed=2)
+        df['deaths'] = np.where(df['id'].isna(), np.nan, 3.0)
+
+        # Low-cardinality strings become categories, whole numbers with gaps become nullable integers
+        optimized_df = filter_optimize_dtypes(df)
+        self.assertIsInstance(optimized_df['diag'].dtype, pd.CategoricalDtype)
+        self.assertEqual(str(optimized_df['deaths'].dtype), 'Int8')
+        self.assertEqual(str(optimized_df['region'].dtype), str(df['region'].dtype))  # Mostly distinct values
+        self.assertLess(optimized_df.memory_usage(deep=True).sum(), df.memory_usage(deep=True).sum())
+
+        # No values are changed
+        self.assertEqual(optimized_df['deaths'].isna().sum(), df['deaths'].isna().sum())
+        self.assertEqual(optimized_df['diag'].astype(str).tolist(), df['diag'].astype(str).tolist())
+
     def test_filter_drop_columns(self):
 
         # Check that the number of columns is correct before dropping
@@ -60,5 +194,456 @@ class MyTestCase(unittest.TestCase):
         self.assertIn('diag', transformed_df.columns)
         self.assertIn('date_of_death', transformed_df.columns)
 
+    def test_filter_drop_columns_selectors(self):
+        # Column names as converted by filter_transform_to_datetime(do_columns=True)
+        dates = pd.date_range('2020-03-01', periods=3).date.tolist()
+        df = pd.DataFrame(np.ones((2, 6)), columns=['nombre', 'poblacion', 'cve_ent'] + dates)
+
+        # The columns selected by any of the selectors are kept, in the order of the DataFrame
+        transformed_df = filter_drop_columns(df, ['nombre'], date_range=('2020-03-02', '2020-03-03'), pattern='^cve_')
+        self.assertEqual(list(transformed_df.columns), ['nombre', 'cve_ent'] + dates[1:])
+
+class ParallelTestCase(unittest.TestCase):
+
+    @unittest.skipUnless(parallel_available(), "requires the pyarrow package")
+    def test_apply_filters_parallel(self):
+        df = create_mock_dataframe(3000, missing_ratio=0.3, seed=3)
+
+        # The global strategies give the same result as the serial filters, also across the partition boundaries
+        for strategy in (Strategy.MEDIAN, Strategy.MODE, Strategy.BFILL, Strategy.DROP_ROW):
+            filters = [
+                (filter_rows_by_values, {'column_name': 'gender', 'column_values': 'm'}),
+                (filter_transform_to_datetime, {'column': 'date_of_death', 'inplace': True}),
+                (filter_handle_missing_values, {'column': ['id', 'region'], 'strategy': strategy, 'inplace': True}),
+                (filter_optimize_dtypes, {}),
+                (filter_drop_columns, {'white_list': ['id', 'region', 'date_of_death']}),
+            ]
+            parallel_df = apply_filters_parallel(df, filters, workers=3, min_rows=0)
+            pd.testing.assert_frame_equal(parallel_df, apply_filters(df, filters))
+
+class LoadingTestCase(unittest.TestCase):
+
+    def test_load_df_parquet(self):
+        df = pd.DataFrame({'date': pd.to_datetime(['2020-03-17', '2020-03-18']), 'deaths': [1, 2]})
+        with tempfile.TemporaryDirectory() as data_dir:
+            load_df(df, 'mortality', file_path=data_dir, file_format='parquet', compression='zstd')
+
+            # The file is renamed into place, no temporary files are left behind, and the dtypes are preserved
+            self.assertEqual(os.listdir(data_dir), ['mortality.parquet'])
+            loaded_df = pd.read_parquet(os.path.join(data_dir, 'mortality.parquet'))
+            self.assertTrue(pd.api.types.is_datetime64_any_dtype(loaded_df['date']))
+            self.assertEqual(loaded_df['deaths'].tolist(), [1, 2])
+
+            # The output gets the same permissions as a file created by open(), not the owner-only ones of mkstemp
+            with open(os.path.join(data_dir, 'reference'), 'w'):
+                pass
+            self.assertEqual(os.stat(os.path.join(data_dir, 'mortality.parquet')).st_mode,
+                             os.stat(os.path.join(data_dir, 'reference')).st_mode)
+
+    def test_load_chunks(self):
+        csv_text = "country,deaths,unused\n" + "".join(f"{'Chile' if i % 2 else 'Peru'},{i},x\n" for i in range(10))
+        chunks = extraction.extract_into_df(io.BytesIO(csv_text.encode('utf-8')), usecols=['country', 'deaths'],
+                                            row_filters={'country': 'Chile'}, chunksize=3)
+        with tempfile.TemporaryDirectory() as data_dir:
+            load_chunks(chunks, 'mortality', file_path=data_dir)
+
+            # Only the selected columns and rows of all chunks end up in the output, with a single header line
+            loaded_df = pd.read_csv(os.path.join(data_dir, 'mortality.csv'))
+            self.assertEqual(list(loaded_df.columns), ['country', 'deaths'])
+            self.assertEqual(loaded_df['deaths'].tolist(), [1, 3, 5, 7, 9])
+
+    def test_load_csv_gzip(self):
+        df = pd.DataFrame({'date': ['2020-03-17', '2020-03-18', '2020-03-19'], 'deaths': [1, 2, 3]})
+        with tempfile.TemporaryDirectory() as data_dir:
+            load_chunks([df.iloc[:2], df.iloc[2:]], 'mortality', file_path=data_dir, file_format='csv.gz')
+            self.assertTrue(append_df(df.iloc[:1], 'mortality', file_path=data_dir, file_format='csv.gz'))
+
+            # Chunks and appended rows become gzip members of their own, which are read back as one file
+            self.assertEqual(os.listdir(data_dir), ['mortality.csv.gz'])
+            self.assertEqual(read_df('mortality', file_path=data_dir, file_format='csv.gz')['deaths'].tolist(), [1, 2, 3, 1])
+
+    def test_load_df_to_sqlite_upsert(self):
+        df = pd.DataFrame({'country': ['Chile', 'Mexico'], 'date': pd.to_datetime(['2020-03-17', '2020-03-18']),
+                           'deaths': [1, 2]})
+        update_df = pd.DataFrame({'country': ['Mexico', 'Colombia'], 'date': pd.to_datetime(['2020-03-18', '2020-03-19']),
+                                  'deaths': [5, 3]})
+        with tempfile.TemporaryDirectory() as data_dir:
+            db_path = os.path.join(data_dir, 'test.sqlite')
+            load_df_to_sqlite(df, 'mortality', db_path=db_path, if_exists='upsert', key_columns=['country'],
+                              index_columns=['date'])
+            load_df_to_sqlite(update_df, 'mortality', db_path=db_path, if_exists='upsert', key_columns=['country'],
+                              index_columns=['date'], batch_size=1)
+
+            with sqlite3.connect(db_path) as connection:
+                rows = connection.execute('SELECT country, date, deaths FROM mortality ORDER BY country').fetchall()
+            self.assertEqual(rows, [('Chile', '2020-03-17', 1), ('Colombia', '2020-03-19', 3), ('Mexico', '2020-03-18', 5)])
+
+    def test_load_chunks_sqlite_atomic(self):
+        df = pd.DataFrame({'country': ['Chile', 'Mexico', 'Peru'], 'deaths': [1, 2, 3]})
+
+        def failing_chunks():
+            yield df.iloc[:2]
+            raise ValueError("Parsing failed")
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            load_chunks([df.iloc[:1], df.iloc[1:]], 'mortality', file_path=data_dir, file_format='sqlite')
+
+            # An existing table is refused as a whole, and a failing chunk rolls back the replacement of the table
+            self.assertFalse(load_chunks([df.iloc[2:]], 'mortality', file_path=data_dir, file_format='sqlite'))
+            self.assertFalse(load_chunks(failing_chunks(), 'mortality', file_path=data_dir, file_format='sqlite',
+                                         overwrite=True))
+            with sqlite3.connect(os.path.join(data_dir, SQLITE_DB_NAME)) as connection:
+                rows = connection.execute('SELECT deaths FROM mortality').fetchall()
+            self.assertEqual(rows, [(1,), (2,), (3,)])
+
+    def test_append_df_incremental(self):
+        df = pd.DataFrame({'date': pd.to_datetime(['2020-03-17', '2020-03-18']), 'deaths': [1, 2]})
+        new_df = pd.DataFrame({'deaths': [3, 4, 5], 'date': pd.to_datetime(['2020-03-18', '2020-03-19', None])})
+        with tempfile.TemporaryDirectory() as data_dir:
+            csv_path = os.path.join(data_dir, 'mortality.csv')
+            marks = HighWaterMarks(os.path.join(data_dir, 'marks.json'))
+            load_df(df, 'mortality', file_path=data_dir)
+            marks.set('mortality', df['date'].max())
+
+            # Only the rows after the high-water mark are appended, in the column order of the existing file
+            new_rows = filter_rows_after(new_df, 'date', HighWaterMarks(marks.state_path).get('mortality'))
+            self.assertTrue(append_df(new_rows, 'mortality', file_path=data_dir))
+            self.assertEqual(pd.read_csv(csv_path)['deaths'].tolist(), [1, 2, 4])
+
+            # A failing append leaves the file unchanged
+            size = os.path.getsize(csv_path)
+            with mock.patch.object(pd.DataFrame, 'to_csv', side_effect=OSError('Disk full')):
+                self.assertFalse(append_df(new_rows, 'mortality', file_path=data_dir))
+            self.assertEqual(os.path.getsize(csv_path), size)
+
+    def test_run_manifest(self):
+        spec = {'url': 'http://example.org', 'filters': [(filter_drop_columns, {'columns': ['a']})]}
+        payload_hash = hash_payload(io.BytesIO(b"a,b\n1,2\n"))
+        self.assertEqual(payload_hash, hash_payload("a,b\n1,2\n"))
+        with tempfile.TemporaryDirectory() as data_dir:
+            manifest = RunManifest(os.path.join(data_dir, 'manifest.json'))
+            manifest.stage('mortality', payload_hash, hash_config(spec))
+            # Nothing is recorded before the output is saved
+            self.assertFalse(manifest.unchanged('mortality', payload_hash, hash_config(spec)))
+            manifest.commit('mortality')
+
+            manifest = RunManifest(manifest.path)
+            self.assertTrue(manifest.unchanged('mortality', payload_hash, hash_config(spec)))
+            # The download options do not matter, but the filters do
+            self.assertTrue(manifest.unchanged('mortality', payload_hash, hash_config({**spec, 'url': 'http://mirror.org'})))
+            self.assertFalse(manifest.unchanged('mortality', payload_hash, hash_config({**spec, 'filters': []})))
+            self.assertFalse(manifest.unchanged('mortality', hash_payload("a,b\n1,3\n"), hash_config(spec)))
+
+
+class AggregationTestCase(unittest.TestCase):
+
+    def test_build_rollups(self):
+        registry = pd.DataFrame({'date': pd.to_datetime(['2020-12-30', '2020-12-30', '2021-01-05', '2024-02-01'])})
+        periods = pd.DataFrame({'date': pd.to_datetime(['2020-12-28', '2020-12-28']), 'group': ['All', 'Age'],
+                                'deaths': [7, 3]})
+        population = population_by_year(pd.DataFrame({'Country Name': ['Chile', 'Peru'], '2020': [100_000, 50_000],
+                                                      '2021': [200_000, 50_000]}))
+
+        # Registries are counted per row, partial counts of chunks are summed up and death counts are summed per date
+        chile = combine_counts([daily_counts(registry.iloc[:1], 'date'), daily_counts(registry.iloc[1:], 'date')])
+        daily = merge_daily_counts(None, 'Chile', chile)
+        daily = merge_daily_counts(daily, 'Peru', daily_counts(periods, 'date', 'deaths', row_filters={'group': 'All'}))
+        self.assertEqual(daily['deaths'].tolist(), [2, 1, 1, 7])
+
+        # Appending adds to the counts of a country, replacing overwrites them
+        appended = merge_daily_counts(daily, 'Peru', daily_counts(periods, 'date', 'deaths'), append=True)
+        self.assertEqual(appended.loc[appended['country'] == 'Peru', 'deaths'].tolist(), [17])
+
+        rollups = build_rollups(daily, population)
+        weekly = rollups['weekly']
+        self.assertEqual(weekly['date'].tolist(), pd.to_datetime(['2020-12-28', '2021-01-04', '2024-01-29', '2020-12-28']).tolist())
+        # Rates use the population of the year of the period, or of the nearest year covered by the population table
+        self.assertEqual(weekly['deaths_per_100k'].tolist(), [2.0, 0.5, 0.5, 14.0])
+        self.assertEqual(rollups['monthly']['deaths'].tolist(), [2, 1, 1, 7])
+
+    def test_daily_counts_periods(self):
+        # Monthly totals are spread over the days of their month in whole deaths, the first days get the remainder
+        periods = pd.DataFrame({'start': pd.to_datetime(['2021-02-01', '2021-03-01']),
+                                'end': pd.to_datetime(['2021-02-28', '2021-03-31']), 'deaths': [30, 62]})
+        counts = daily_counts(periods, 'start', 'deaths', end_column='end')
+        self.assertEqual(len(counts), 59)
+        self.assertEqual(counts.loc['2021-02-01':'2021-02-03'].tolist(), [2, 2, 1])
+        self.assertEqual(counts.loc['2021-03-01':'2021-03-31'].unique().tolist(), [2])
+
+        # The weekly rollup no longer attributes the deaths of a month to its first week, the monthly one is exact
+        rollups = build_rollups(merge_daily_counts(None, 'Chile', counts))
+        self.assertEqual(rollups['monthly']['deaths'].tolist(), [30, 62])
+        self.assertEqual(rollups['weekly']['deaths'].iloc[:2].tolist(), [9, 7])
+
+
+class QueryServiceTestCase(unittest.TestCase):
+
+    def test_query_service(self):
+        daily = pd.DataFrame({'country': ['Chile', 'Chile', 'Peru'], 'date': pd.to_datetime(['2021-01-01', '2021-01-02', '2021-01-01']),
+                              'deaths': [5, 7, 2], 'population': [100_000] * 3, 'deaths_per_100k': [5.0, 7.0, 2.0]})
+        with tempfile.TemporaryDirectory() as data_dir:
+            load_df(daily, 'covid_mortality_daily', file_path=data_dir)
+            service = QueryService(data_dir)
+
+            result = service.query(countries='Chile', start='2021-01-02')
+            self.assertEqual(result.columns.tolist(), ['country', 'date', 'deaths'])
+            self.assertEqual(result['deaths'].tolist(), [7])
+            self.assertEqual(service.query(end='2021-01-01', per_capita=True)['deaths_per_100k'].tolist(), [5.0, 2.0])
+
+            # Repeated queries are answered from the cache, independently of the order of the countries
+            service.query(countries=['Peru', 'Chile'])
+            service.query(countries=['Chile', 'Peru'])
+            self.assertEqual((service.hits, service.misses), (1, 3))
+
+            # Rewriting the table invalidates the cached results
+            load_df(daily.assign(deaths=[1, 1, 1]), 'covid_mortality_daily', file_path=data_dir, overwrite=True)
+            os.utime(os.path.join(data_dir, 'covid_mortality_daily.csv'), ns=(0, 0))
+            self.assertEqual(service.query(countries=['Chile', 'Peru'])['deaths'].tolist(), [1, 1, 1])
+            self.assertEqual(service.countries(), ['Chile', 'Peru'])
+
+            with self.assertRaises(ValueError):
+                service.query(granularity='yearly')
+            with self.assertRaises(FileNotFoundError):
+                service.query(granularity='weekly')
+
+
+class ValidationTestCase(unittest.TestCase):
+
+    def test_validate_df(self):
+        df = pd.DataFrame({'date': pd.to_datetime(['2019-12-31', '2020-05-01', '2020-05-02', None]),
+                           'diag': ['U071', 'U071', 'X999', 'U072']})
+        schema = {'columns': {'date': {'dtype': 'datetime', 'nullable': False, 'min': '2020-01-01'},
+                              'diag': {'dtype': 'string', 'allowed': ['U071', 'U072']}},
+                  'rows': {'min': 1}}
+
+        # By default, any violation fails the validation
+        with self.assertRaises(ValidationError):
+            validate_df(df, schema)
+
+        # Quarantined rows are removed and keep the checks they failed
+        valid_df, quarantined, report = validate_df(df, {**schema, 'on_error': 'quarantine'})
+        self.assertEqual(len(valid_df), 1)
+        self.assertEqual(quarantined['violations'].tolist(), ['date.min', 'diag.allowed', 'date.nullable'])
+        self.assertEqual(report['violations'], {'date.nullable': 1, 'date.min': 1, 'diag.allowed': 1})
+        self.assertFalse(report['passed'])
+
+        # Chunks are validated one by one, the row count bounds are checked at the end
+        validator = Validator({**schema, 'rows': {'max': 2}, 'on_error': 'report'})
+        for chunk in (df.iloc[:2], df.iloc[2:]):
+            validator.validate(chunk)
+        report = validator.finish()
+        self.assertEqual((report['rows'], report['valid_rows']), (4, 1))
+        self.assertEqual(report['errors'], ['4 rows, expected at most 2'])
+
+        # Column-level errors cannot be quarantined
+        with self.assertRaises(ValidationError):
+            validate_df(df.astype({'date': str}), {**schema, 'on_error': 'quarantine'})
+
+class ExtractionTestCase(unittest.TestCase):
+
+    def test_extract_dataset_stream_zip(self):
+        payload = create_mock_zip_payload("a,b\n1,2\n3,4\n")
+        with mock.patch.object(extraction.requests.Session, "get", return_value=MockResponse(payload)):
+            data = extraction.extract_dataset("http://example.org", is_zip=True, stream=True)
+        df = extraction.extract_into_df(data)
+
+        self.assertEqual(len(df), 2)
+        self.assertEqual(list(df.columns), ["a", "b"])
+
+    def test_extract_into_df_pyarrow(self):
+        payload = create_mock_csv_payload('chile', 500, missing_ratio=0.1, seed=0)
+        parse_args = {"separator": ";", "encoding": "latin-1", "usecols": ["FECHA_DEF", "DIAG1", "GLOSA_COMUNA_RESIDENCIA"],
+                      "dtype": {"DIAG1": "category"}, "date_columns": ["FECHA_DEF"], "row_filters": {"DIAG1": "U071"}}
+        expected = extraction.extract_into_df(io.BytesIO(payload), **parse_args)
+        df = extraction.extract_into_df(io.BytesIO(payload), engine="pyarrow", **parse_args)
+
+        # The text columns are Arrow-backed, the dates and categories are converted as for the C parser
+        self.assertIsInstance(df["GLOSA_COMUNA_RESIDENCIA"].dtype, pd.ArrowDtype)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["FECHA_DEF"]))
+        self.assertIsInstance(df["DIAG1"].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(df.astype(str), expected[df.columns].reset_index(drop=True).astype(str))
+
+        # Chunks hold the requested number of rows, except for the last one
+        chunks = list(extraction.extract_into_df(io.BytesIO(payload), engine="pyarrow", chunksize=100, **parse_args))
+        self.assertTrue(all(len(chunk) == 100 for chunk in chunks[:-1]))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(df))
+
+    def test_extract_dataset_conditional_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DownloadCache(cache_dir)
+            first = MockResponse(b"a,b\n1,2\n", headers={"ETag": '"v1"'})
+            with mock.patch.object(extraction.requests.Session, "get", return_value=first):
+                extraction.extract_dataset("http://example.org", cache=cache)
+
+            # The second request must be conditional and is answered with 304 Not Modified
+            with mock.patch.object(extraction.requests.Session, "get", return_value=MockResponse(b"", status_code=304)) as get:
+                data = extraction.extract_dataset("http://example.org", cache=cache)
+            self.assertEqual(get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+            self.assertEqual(data, "a,b\n1,2\n")
+
+            # In offline mode the payload is served without any request
+            offline_cache = DownloadCache(cache_dir, offline=True)
+            with mock.patch.object(extraction.requests.Session, "get") as get:
+                data = extraction.extract_dataset("http://example.org", cache=offline_cache)
+            get.assert_not_called()
+            self.assertEqual(data, "a,b\n1,2\n")
+
+    def test_extract_dataset_resume(self):
+        # The connection drops after three bytes, the rest is then requested with a range request
+        responses = [MockResponse(b"a,b\n1,2\n", headers={"ETag": '"v1"'}, fail_after=3),
+                     MockResponse(b"\n1,2\n", status_code=206),
+                     ]
+        url = "http://example.org/resume"
+        with mock.patch.object(extraction.requests.Session, "get", side_effect=responses) as get, \
+                mock.patch.object(extraction.time, "sleep"):
+            data = extraction.extract_dataset(url)
+
+        self.assertEqual(data, "a,b\n1,2\n")
+        self.assertEqual(get.call_args.kwargs["headers"], {"Range": "bytes=3-", "If-Range": '"v1"',
+                                                           "Accept-Encoding": "identity"})
+        self.assertEqual(extraction.get_download_report()[url], {"retries": 1, "resumes": 1, "bytes": 8})
+
+    def test_extract_dataset_restart_encoded(self):
+        # The bytes received from a gzip-encoded response are decoded, so they are no offset for a range request
+        # and the download is restarted. The same applies to weak ETags, which If-Range does not allow.
+        for headers in ({"ETag": '"v1"', "Content-Encoding": "gzip"}, {"ETag": 'W/"v1"'}):
+            responses = [MockResponse(b"a,b\n1,2\n", headers=headers, fail_after=3),
+                         MockResponse(b"a,b\n1,2\n", headers=headers)]
+            url = "http://example.org/encoded"
+            with mock.patch.object(extraction.requests.Session, "get", side_effect=responses) as get, \
+                    mock.patch.object(extraction.time, "sleep"):
+                data = extraction.extract_dataset(url)
+
+            self.assertEqual(data, "a,b\n1,2\n")
+            self.assertEqual(get.call_args.kwargs["headers"], {})
+            self.assertEqual(extraction.get_download_report()[url], {"retries": 1, "resumes": 0, "bytes": 11})
+
+    def test_replay_server(self):
+        payload = create_mock_csv_payload('usa', 100, seed=0)
+        with ReplayServer({'usa': payload}, error_rate=1.0) as server:
+            # Transient errors ask the client to retry immediately
+            response = extraction.requests.get(server.url('usa'))
+            self.assertEqual((response.status_code, response.headers['Retry-After']), (503, '0'))
+
+            server.error_rate = 0.0
+            with extraction.extract_dataset(server.url('usa'), stream=True) as data:
+                self.assertEqual(data.read(), payload)
+
+            # Interrupted downloads can be resumed with a range request
+            etag = extraction.requests.get(server.url('usa')).headers['ETag']
+            response = extraction.requests.get(server.url('usa'), headers={'Range': 'bytes=10-', 'If-Range': etag})
+            self.assertEqual((response.status_code, response.content), (206, payload[10:]))
+            self.assertEqual(server.stats['usa']['errors'], 1)
+
+    def test_download_cache_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DownloadCache(cache_dir, max_size=10)
+            cache.store("http://example.org/old", [b"123456"])
+            cache.store("http://example.org/new", [b"789012"])
+
+            # The least recently used payload is evicted once the cache exceeds its size limit
+            self.assertIsNone(cache.get("http://example.org/old"))
+            self.assertIsNotNone(cache.get("http://example.org/new"))
+
+    def test_raw_archive(self):
+        payload = create_mock_csv_payload('usa', 100, seed=0)
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archive = RawArchive(archive_dir, codec='gzip', keep_versions=2, threads=2)
+            first = archive.store('usa', payload.decode('utf-8'))
+            self.assertEqual(first['sha256'], hash_payload(io.BytesIO(payload)))
+
+            # An unchanged payload is not archived again, and file objects are rewound so that they can be parsed
+            data = io.BytesIO(payload)
+            self.assertEqual(archive.store('usa', data)['version'], 1)
+            self.assertEqual(data.tell(), 0)
+
+            # Only the latest versions are kept
+            archive.store('usa', io.BytesIO(payload[:50]))
+            archive.store('usa', io.BytesIO(payload[:60]))
+            self.assertEqual([entry['version'] for entry in archive.versions('usa')], [2, 3])
+            self.assertEqual(archive.open('usa', version=2), payload[:50].decode('utf-8'))
+            with archive.open('usa', stream=True) as archived:
+                self.assertEqual(archived.read(), payload[:60])
+
+            # Re-transforming picks the latest version archived on or before the given day
+            with self.assertRaises(ArchiveMissError):
+                RawArchive(archive_dir, retransform=True, as_of='2020-01-01').open('usa')
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def test_run_report(self):
+        report = RunReport()
+        filters = report.wrap_filters('mock', [(filter_rows_by_values, {'column_name': 'diag', 'column_values': 'U071'})])
+
+        # A filter applied to several chunks is accumulated into one record
+        df = create_mock_dataframe(100)
+        for chunk in (df.iloc[:50], df.iloc[50:]):
+            apply_filters(chunk, filters)
+
+        record = report.to_dict()['steps'][0]
+        self.assertEqual(record['step'], 'transform.0.filter_rows_by_values')
+        self.assertEqual(record['calls'], 2)
+        self.assertEqual(record['rows_in'], 100)
+        self.assertEqual(record['rows_out'], (df['diag'] == 'U071').sum())
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            report.write(os.path.join(data_dir, 'run_report.json'))
+            self.assertTrue(os.path.exists(os.path.join(data_dir, 'run_report.json')))
+
+    def test_run_report_nested_profile(self):
+        report = RunReport(profile=True)
+        inner = report.wrap('mock', 'inner', filter_rows_by_values)
+        df = create_mock_dataframe(10)
+
+        def outer(df):
+            # The calls after a nested step are still profiled
+            inner(df, 'diag', 'U071')
+            return filter_drop_columns(inner(df, 'diag', 'U071'), ['diag'])
+
+        try:
+            report.measure('mock', 'outer', outer, df)
+            with tempfile.TemporaryDirectory() as data_dir:
+                report.write(os.path.join(data_dir, 'run_report.json'))
+                stats = pstats.Stats(os.path.join(data_dir, 'run_report.prof')).stats
+        finally:
+            tracemalloc.stop()
+        calls = {function[2]: stat[1] for function, stat in stats.items()}
+        self.assertEqual(calls['filter_rows_by_values'], 2)
+        self.assertEqual(calls['filter_drop_columns'], 1)
+
+class OrchestrationTestCase(unittest.TestCase):
+
+    def test_run_dag(self):
+        loaded = []
+        summaries = []
+
+        def fail():
+            raise ConnectionError("Portal offline")
+
+        tasks = [
+            Task('a.extract', lambda: 1),
+            Task('a.transform', lambda value: value + 1, depends_on=['a.extract']),
+            Task('a.load', loaded.append, depends_on=['a.transform']),
+            Task('b.extract', fail, retries=1, retry_delay=0),
+            Task('b.load', loaded.append, depends_on=['b.extract']),
+            Task('summary', lambda *results: summaries.append(results), depends_on=['a.transform', 'b.load'],
+                 tolerate_failures=True),
+        ]
+        status = run_dag(tasks, max_workers=2)
+
+        # The results are passed along the dependencies, a failing task only skips its own dependents
+        self.assertEqual(loaded, [2])
+        self.assertEqual(status['a.load'], TaskStatus.SUCCEEDED)
+        self.assertEqual(status['b.extract'], TaskStatus.FAILED)
+        self.assertEqual(status['b.load'], TaskStatus.SKIPPED)
+
+        # A task tolerating failures still runs, with None for the results of the failed or skipped tasks
+        self.assertEqual(summaries, [(2, None)])
+
+    def test_run_dag_cycle(self):
+        tasks = [Task('a', lambda value: value, depends_on=['b']), Task('b', lambda value: value, depends_on=['a'])]
+        with self.assertRaises(ValueError):
+            run_dag(tasks)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,228 @@
+import logging
+import numpy as np
+import pandas as pd
+
+class ValidationError(ValueError):
+    """
+    Raised if a DataFrame violates its schema and the violations cannot be, or are not to be, quarantined
+    """
+
+
+# Modes of handling rows that violate the schema
+ON_ERROR_MODES = ('fail', 'quarantine', 'report')
+
+# The type names of a schema and the pandas dtypes they accept
+DTYPES = {
+    'datetime': pd.api.types.is_datetime64_any_dtype,
+    'numeric': lambda dtype: pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype),
+    'integer': pd.api.types.is_integer_dtype,
+    'string': lambda dtype: (pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype)
+                             or isinstance(dtype, pd.CategoricalDtype)),
+}
+
+def _bound(value, dtype):
+    """
+    Helper function to convert a range bound of a schema to the type of the column it is compared with.
+
+    Parameters:
+    value: The bound, e.g. a date string for datetime columns.
+    dtype: The dtype of the column.
+
+    Returns:
+    The converted bound.
+    """
+    return pd.Timestamp(value) if pd.api.types.is_datetime64_any_dtype(dtype) else value
+
+
+def check_schema(df, schema):
+    """
+    Check a DataFrame against a declarative schema in a single vectorized pass.
+    The column-level checks (presence and type of the columns) are evaluated once, while the row-level checks
+    (missing values, value ranges and allowed values) of all columns are evaluated as boolean arrays that are combined
+    into one violation matrix, so that every row is checked without re-scanning the DataFrame for every check.
+
+    The schema is a dict with the keys:
+    - columns: Maps a column name to its checks, each optional: 'dtype' (see DTYPES), 'nullable' (bool),
+               'min' and 'max' (inclusive bounds, dates as strings) and 'allowed' (list of allowed values).
+    - nullable: Default nullability of all columns, including the columns not listed. Default behaviour is True.
+    - rows: Bounds of the number of rows as a dict with the keys 'min' and 'max', see Validator.finish.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame to check.
+    schema (dict): The schema.
+
+    Returns:
+    tuple: The names of the row-level checks, the violation matrix with one boolean column per check and one row per
+           row of the DataFrame, and the list of column-level errors.
+    """
+    columns = schema.get('columns', {})
+    default_nullable = schema.get('nullable', True)
+    errors = []
+
+    for col, checks in columns.items():
+        if col not in df.columns:
+            errors.append(f"Column '{col}' is missing")
+        elif 'dtype' in checks and not DTYPES[checks['dtype']](df[col].dtype):
+            errors.append(f"Column '{col}' has dtype {df[col].dtype}, expected {checks['dtype']}")
+
+    names, violations = [], []
+
+    # Missing values of all non-nullable columns in one call
+    non_nullable = [col for col in df.columns if not columns.get(col, {}).get('nullable', default_nullable)]
+    if non_nullable:
+        names += [f"{col}.nullable" for col in non_nullable]
+        violations.append(df[non_nullable].isna().to_numpy())
+
+    for col, checks in columns.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if checks.get('min') is not None:
+            names.append(f"{col}.min")
+            violations.append((values < _bound(checks['min'], values.dtype)).to_numpy(dtype=bool, na_value=False))
+        if checks.get('max') is not None:
+            names.append(f"{col}.max")
+            violations.append((values > _bound(checks['max'], values.dtype)).to_numpy(dtype=bool, na_value=False))
+        if checks.get('allowed') is not None:
+            names.append(f"{col}.allowed")
+            violations.append((~values.isin(checks['allowed']) & values.notna()).to_numpy(dtype=bool))
+
+    matrix = (np.column_stack([v.reshape(len(df), -1) for v in violations]) if violations
+              else np.zeros((len(df), 0), dtype=bool))
+    return names, matrix, errors
+
+
+class Validator:
+    """
+    Validates a DataFrame, or every chunk of a chunked DataFrame, against a declarative schema (see check_schema)
+    and collects a machine-readable quality report.
+
+    Depending on the mode, rows that violate the schema make the validation fail ('fail'), are removed from the
+    DataFrame and kept for a separate quarantine output ('quarantine'), or are only reported ('report').
+    Column-level errors and row counts outside of the bounds cannot be quarantined and fail the validation in both the
+    'fail' and 'quarantine' modes.
+    """
+
+    def __init__(self, schema, dataset=None):
+        """
+        Parameters:
+        schema (dict): The schema, see check_schema. The key 'on_error' selects the mode (default: 'fail').
+        dataset (str): The name of the dataset, used in messages.
+        """
+        self.schema = schema
+        self.dataset = dataset
+        self.on_error = schema.get('on_error', 'fail')
+        if self.on_error not in ON_ERROR_MODES:
+            raise ValueError(f"Unknown on_error mode '{self.on_error}', expected one of {ON_ERROR_MODES}")
+        self.rows = 0
+        self.valid_rows = 0
+        self.output_rows = 0  # The rows passed on, i.e. without the quarantined rows
+        self.violations = {}
+        self.errors = []
+        self._quarantined = []
+
+    def _fail(self, message):
+        raise ValidationError(f"Dataset '{self.dataset}': {message}")
+
+    def validate(self, df):
+        """
+        Validate the next DataFrame (or chunk).
+
+        Parameters:
+        df (pd.DataFrame): The DataFrame.
+
+        Returns:
+        pd.DataFrame: The DataFrame without the quarantined rows.
+        """
+        names, matrix, errors = check_schema(df, self.schema)
+        for error in errors:
+            if error not in self.errors:
+                self.errors.append(error)
+        if errors and self.on_error != 'report':
+            self._fail("; ".join(errors))
+
+        invalid = matrix.any(axis=1)
+        for name, count in zip(names, matrix.sum(axis=0)):
+            if count:
+                self.violations[name] = self.violations.get(name, 0) + int(count)
+        self.rows += len(df)
+        invalid_rows = int(invalid.sum())
+
+        if invalid_rows and self.on_error == 'fail':
+            self._fail(f"{invalid_rows} rows violate the schema: {self.violations}")
+        if invalid_rows and self.on_error == 'quarantine':
+            # Keep the failed checks of every quarantined row
+            failed = np.where(matrix[invalid], np.array([name + ',' for name in names], dtype=object), '')
+            quarantined = df[invalid].copy()
+            quarantined['violations'] = [checks.rstrip(',') for checks in failed.sum(axis=1)]
+            self._quarantined.append(quarantined)
+            df = df[~invalid]
+        self.valid_rows += len(df) if self.on_error == 'quarantine' else len(df) - invalid_rows
+        self.output_rows += len(df)
+        return df
+
+    def finish(self):
+        """
+        Check the bounds of the number of rows passed on, once all rows are validated.
+
+        Returns:
+        dict: The quality report, see report.
+        """
+        bounds = self.schema.get('rows') or {}
+        rows = self.output_rows
+        if bounds.get('min') is not None and rows < bounds['min']:
+            self.errors.append(f"{rows} rows, expected at least {bounds['min']}")
+        if bounds.get('max') is not None and rows > bounds['max']:
+            self.errors.append(f"{rows} rows, expected at most {bounds['max']}")
+
+        report = self.report()
+        level = logging.INFO if report['passed'] else logging.WARNING
+        logging.log(level, f"Dataset '{self.dataset}': {report['valid_rows']} of {report['rows']} rows are valid, "
+                           f"violations: {report['violations']}, errors: {report['errors']}")
+        if self.errors and self.on_error != 'report':
+            self._fail("; ".join(self.errors))
+        return report
+
+    def quarantined(self):
+        """
+        Get the rows removed in the 'quarantine' mode.
+
+        Returns:
+        pd.DataFrame: The quarantined rows with the additional column 'violations' listing the failed checks.
+        """
+        return pd.concat(self._quarantined) if self._quarantined else pd.DataFrame(columns=['violations'])
+
+    def report(self):
+        """
+        Get the quality report as a JSON serializable dict.
+
+        Returns:
+        dict: The number of validated, valid and quarantined rows, the number of violations per check
+              (e.g. 'DIAG1.allowed'), the column-level and row count errors and whether the validation passed.
+        """
+        return {
+            'rows': self.rows,
+            'valid_rows': self.valid_rows,
+            'quarantined_rows': sum(len(part) for part in self._quarantined),
+            'violations': dict(self.violations),
+            'errors': list(self.errors),
+            'passed': not self.errors and not self.violations,
+        }
+
+
+def validate_df(df, schema, dataset=None):
+    """
+    Validate a DataFrame against a declarative schema, see Validator.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame.
+    schema (dict): The schema, see check_schema.
+    dataset (str): The name of the dataset, used in messages.
+
+    Returns:
+    tuple: The DataFrame without the quarantined rows, the quarantined rows and the quality report.
+    """
+    validator = Validator(schema, dataset)
+    df = validator.validate(df)
+    report = validator.finish()
+    return df, validator.quarantined(), report